@@ -0,0 +1,66 @@
+"""
+Throughput of the token-aware chunker against the word-based chunkers.
+
+    python benchmarks/bench_chunking.py --mb 5 --max-tokens 256 --overlap 32
+
+Reports MB/s, number of chunks, and how many chunks exceed the token budget
+(measured with the same tokenizer the token chunker uses).
+"""
+import argparse
+import time
+
+from common import print_table
+from corpus import synthetic_text
+
+from text_processing import lines_chunking, paragraphs_chunking
+from token_chunking import ApproximateTokenizer, load_tokenizer, token_chunking
+
+
+def run(text, tokenizer, max_tokens, overlap, max_words):
+    chunkers = {
+        f"lines_chunking({max_words} words)": lambda: lines_chunking(text, max_words=max_words),
+        f"paragraphs_chunking({max_words} words)": lambda: paragraphs_chunking(text, max_words=max_words),
+        f"token_chunking({max_tokens} tokens, {overlap} overlap)": lambda: token_chunking(
+            text, tokenizer, max_tokens=max_tokens, overlap_tokens=overlap
+        ),
+    }
+    mb = len(text.encode("utf-8")) / 1024**2
+    rows = []
+    for name, chunker in chunkers.items():
+        try:
+            start = time.perf_counter()
+            chunks = chunker()
+            elapsed = time.perf_counter() - start
+        except LookupError:
+            print(f"Skipping {name}: NLTK punkt data is not available")
+            continue
+        counts = [tokenizer.count(chunk) for chunk in chunks]
+        rows.append({
+            "chunker": name,
+            "seconds": elapsed,
+            "MB/s": mb / elapsed,
+            "chunks": len(chunks),
+            "max_tokens": max(counts),
+            "over_budget": sum(count > max_tokens for count in counts),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=2.0, help="Size of the synthetic text")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--max-words", type=int, default=200)
+    parser.add_argument("--approximate", action="store_true", help="Use the approximate tokenizer")
+    args = parser.parse_args()
+
+    tokenizer = ApproximateTokenizer() if args.approximate else load_tokenizer()
+    print(f"Tokenizer: {type(tokenizer).__name__}")
+    text = synthetic_text(int(args.mb * 1024**2))
+    rows = run(text, tokenizer, args.max_tokens, args.overlap, args.max_words)
+    print_table(rows, ["chunker", "seconds", "MB/s", "chunks", "max_tokens", "over_budget"])
+
+
+if __name__ == "__main__":
+    main()
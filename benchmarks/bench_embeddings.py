@@ -0,0 +1,108 @@
+"""
+Compare embedding backends on CPU: docs/sec, peak RSS and cosine agreement
+with the PyTorch Sentence Transformer.
+
+    python src/onnx_embedding.py --output models/all-MiniLM-L6-v2-onnx
+    python benchmarks/bench_embeddings.py --docs 2000 --threads 1 4
+
+Each backend runs in a fresh process, so RSS covers only that backend's
+runtime and model. Agreement is the mean / minimum cosine similarity of each
+document's vector to the PyTorch one (1.0 = identical).
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+
+from common import SRC_DIR, print_table
+from bench_chunking import synthetic_text
+
+
+def make_documents(n_docs, seed=0):
+    paragraphs = [p.replace("\n", " ") for p in synthetic_text(n_docs * 600, seed=seed).split("\n\n")]
+    return (paragraphs * (n_docs // len(paragraphs) + 1))[:n_docs]
+
+
+def _rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_backend(backend, model, onnx_dir, threads, documents, batch_size, queue):
+    import sys
+    sys.path.insert(0, SRC_DIR)
+    try:
+        baseline = _rss_mb()
+        if backend == "torch":
+            import torch
+            from chromadb.utils import embedding_functions
+            if threads:
+                torch.set_num_threads(threads)
+            embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model)
+        else:
+            from onnx_embedding import OnnxEmbeddingFunction
+            embedding_func = OnnxEmbeddingFunction(
+                onnx_dir, quantized=backend == "onnx-int8", num_threads=threads, batch_size=batch_size
+            )
+        embedding_func(documents[:batch_size])  # warm-up
+
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(documents), batch_size):
+            vectors.extend(embedding_func(documents[i:i + batch_size]))
+        elapsed = time.perf_counter() - start
+        queue.put({
+            "docs_per_sec": len(documents) / elapsed,
+            "rss_mb": _rss_mb() - baseline,
+            "vectors": np.asarray(vectors, dtype=np.float32),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_backend(backend, model, onnx_dir, threads, documents, batch_size):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_run_backend, args=(backend, model, onnx_dir, threads, documents, batch_size, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="0 = library default")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", default="models/all-MiniLM-L6-v2-onnx")
+    args = parser.parse_args()
+
+    documents = make_documents(args.docs)
+    rows, reference = [], None
+    for backend in args.backends:
+        for threads in args.threads:
+            result = run_backend(backend, args.model, args.onnx_dir, threads or None, documents, args.batch_size)
+            row = {"backend": backend, "threads": threads or "default"}
+            if "error" in result:
+                print(f"{backend}: {result['error']}")
+                continue
+            vectors = result.pop("vectors")
+            if backend == "torch" and reference is None:
+                reference = vectors
+            if reference is not None:
+                agreement = np.sum(vectors * reference, axis=1)
+                row.update({"cos_mean": float(agreement.mean()), "cos_min": float(agreement.min())})
+            rows.append({**row, **result})
+
+    print_table(rows, ["backend", "threads", "docs_per_sec", "rss_mb", "cos_mean", "cos_min"])
+
+
+if __name__ == "__main__":
+    main()
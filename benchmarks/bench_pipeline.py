@@ -0,0 +1,273 @@
+"""
+Benchmark the ingestion and retrieval stages on a synthetic TXT/PDF corpus.
+
+    python benchmarks/bench_pipeline.py --files 20 --kb 200 --queries 200 --json baseline.json
+    python benchmarks/bench_pipeline.py --files 20 --kb 200 --queries 200 --json new.json --compare baseline.json
+
+Stages are timed separately: extraction, chunking, embedding, insert, index
+sync, query embedding and query. The pipelined `ingest_file` path the app
+uses is timed as a whole. Each stage reports throughput, p50/p95 latency
+per call and peak RSS, as the median of `--repeat` runs. With `--compare`,
+stages whose throughput or p95 got worse, or whose peak memory grew, by more
+than `--threshold` are flagged and the exit status is 1. On shared or noisy
+machines, raise `--repeat` before tightening the threshold.
+
+Runs offline by default: vectors come from a hashing embedder. Use
+`--embedder app` to time the app's embedding model (see EMBEDDING_BACKEND).
+The corpus is deterministic (see corpus.py), so runs on different branches
+measure the same input.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+import zlib
+
+import numpy as np
+
+from common import peak_rss_bytes, percentiles, print_table, reset_peak_rss, time_calls
+from corpus import generate_corpus, corpus_queries
+
+import chromadb
+from collections_setup import CHUNKING, EMBEDDING_BATCH_SIZE, ingest_file, iter_text_chunks, _batched
+from extraction import iter_file_text
+from retrievers import build_retriever
+from runpod_setup import retrieve_chunks
+from sparse_index import BM25Index, tokenize
+
+# Metrics where a higher value is worse, and the one where lower is worse
+HIGHER_IS_WORSE = ("p95_ms", "peak_rss_mb")
+LOWER_IS_WORSE = ("throughput",)
+
+
+class HashingEmbedding:
+    """
+    Offline stand-in for the embedding model: hashed bag of words, normalized.
+    Cheap, so the other stages dominate; not meant to measure embedding speed.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for term in tokenize(text):
+                bucket = zlib.crc32(term.encode("utf-8"))
+                vectors[row, bucket % self.dim] += 1.0 if bucket & 1 << 31 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors / np.maximum(norms, 1e-12))
+
+
+def load_embedder(name):
+    if name == "hash":
+        return HashingEmbedding()
+    from collections_setup import load_chromadb
+    return load_chromadb("all-MiniLM-L6-v2")[1]
+
+
+def measure(func, inputs, units):
+    """
+    Call `func` on each input; `units` is the amount of work done in total
+    (e.g. MB or chunks), for the throughput. Returns (results, stats).
+    """
+    reset_peak_rss()
+    results, durations = time_calls(func, [(item,) for item in inputs])
+    seconds = sum(durations)
+    stats = {
+        "calls": len(durations),
+        "seconds": seconds,
+        "throughput": units / seconds if seconds > 0 else 0.0,
+        **percentiles(durations),
+        "peak_rss_mb": peak_rss_bytes() / 1024**2,
+    }
+    return results, stats
+
+
+def new_collection(client):
+    return client.create_collection(
+        name=f"bench-{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}, embedding_function=None
+    )
+
+
+def run(corpus, queries, embedding_func, batch_size=EMBEDDING_BATCH_SIZE, k=5, retriever_backend="chroma",
+        hybrid=True):
+    """
+    Time each stage on `corpus` (a list of (name, file type, bytes)) and `queries`.
+    Returns {stage: stats}; throughput is MB/s for extraction, chunking and
+    ingest_file, and items (chunks or queries) per second elsewhere.
+    """
+    stages = {}
+    mb = sum(len(data) for _, _, data in corpus) / 1024**2
+    # Load the chunking tokenizer before timing anything
+    list(iter_text_chunks(["Warm-up."]))
+
+    pages, stages["extract"] = measure(
+        lambda item: list(iter_file_text(item[2], item[1])), corpus, mb
+    )
+    texts_mb = sum(len(page.encode("utf-8")) for file_pages in pages for page in file_pages) / 1024**2
+    chunks, stages["chunk"] = measure(lambda file_pages: list(iter_text_chunks(file_pages)), pages, texts_mb)
+
+    records = [
+        (f"{name}#{part}", chunk, {"source": name, "part": part})
+        for (name, _, _), file_chunks in zip(corpus, chunks)
+        for part, chunk in enumerate(file_chunks)
+    ]
+    batches = list(_batched(records, batch_size))
+    embeddings, stages["embed"] = measure(
+        lambda batch: embedding_func([chunk for _, chunk, _ in batch]), batches, len(records)
+    )
+
+    client = chromadb.EphemeralClient()
+    collection = new_collection(client)
+    sparse_index = BM25Index() if hybrid else None
+
+    def insert(item):
+        batch, vectors = item
+        ids = [chunk_id for chunk_id, _, _ in batch]
+        documents = [chunk for _, chunk, _ in batch]
+        collection.add(ids=ids, documents=documents, embeddings=vectors,
+                       metadatas=[metadata for _, _, metadata in batch])
+        if sparse_index is not None:
+            sparse_index.add(ids, documents)
+
+    _, stages["insert"] = measure(insert, list(zip(batches, embeddings)), len(records))
+
+    retriever = build_retriever(collection, embedding_func, backend=retriever_backend)
+    _, stages["index_sync"] = measure(retriever.sync, [collection], len(records))
+
+    query_embeddings, stages["query_embed"] = measure(lambda query: embedding_func([query])[0], queries, len(queries))
+    _, stages["query"] = measure(
+        lambda item: retrieve_chunks(retriever, query=item[0], nresults=k, query_embedding=item[1],
+                                     sparse_index=sparse_index),
+        list(zip(queries, query_embeddings)), len(queries),
+    )
+
+    # The app's path: extraction, chunking, embedding and insert pipelined per file
+    pipeline_collection = new_collection(client)
+    _, stages["ingest_file"] = measure(
+        lambda item: ingest_file(pipeline_collection, embedding_func, item[0], item[2], item[1],
+                                 sparse_index=BM25Index() if hybrid else None),
+        corpus, mb,
+    )
+
+    for name, stats in stages.items():
+        stats["unit"] = "MB/s" if name in ("extract", "chunk", "ingest_file") else "items/s"
+    return stages
+
+
+def median_stages(runs):
+    """
+    Per-stage median of each metric over repeated runs.
+    """
+    return {
+        stage: {
+            metric: (float(np.median([run[stage][metric] for run in runs]))
+                     if isinstance(value, float) else value)
+            for metric, value in stats.items()
+        }
+        for stage, stats in runs[0].items()
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(current, baseline, threshold, min_seconds=0.05):
+    """
+    Relative change of each stage metric against `baseline`.
+    Returns (rows, regressions); a regression is a change for the worse beyond `threshold`.
+    Stages that take less than `min_seconds` in both runs are too noisy to compare.
+    """
+    rows, regressions = [], []
+    for stage, stats in current.items():
+        old = baseline.get(stage)
+        if old is None or max(stats["seconds"], old["seconds"]) < min_seconds:
+            continue
+        for metric in LOWER_IS_WORSE + HIGHER_IS_WORSE:
+            if not old.get(metric):
+                continue
+            change = stats[metric] / old[metric] - 1
+            worse = -change if metric in LOWER_IS_WORSE else change
+            row = {"stage": stage, "metric": metric, "baseline": old[metric], "current": stats[metric],
+                   "change": f"{change:+.1%}", "regression": worse > threshold}
+            rows.append(row)
+            if row["regression"]:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--kb", type=int, default=100, help="Text per file, in KB")
+    parser.add_argument("--kinds", nargs="+", choices=["txt", "pdf"], default=["txt", "pdf"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Report the median of this many runs")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--embedder", choices=["hash", "app"], default="hash")
+    parser.add_argument("--retriever", choices=["chroma", "numpy", "hnsw"], default="chroma")
+    parser.add_argument("--no-hybrid", action="store_true", help="Vector search only")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Relative change flagged as a regression")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.files, args.kb, tuple(args.kinds), args.seed)
+    queries = corpus_queries(args.queries, args.files, args.kb, args.seed)
+    embedding_func = load_embedder(args.embedder)
+    stages = median_stages([
+        run(corpus, queries, embedding_func, batch_size=args.batch_size, k=args.k,
+            retriever_backend=args.retriever, hybrid=not args.no_hybrid)
+        for _ in range(max(1, args.repeat))
+    ])
+
+    print_table(
+        [{"stage": name, **stats} for name, stats in stages.items()],
+        ["stage", "calls", "seconds", "throughput", "unit", "p50_ms", "p95_ms", "peak_rss_mb"],
+    )
+
+    results = {
+        "environment": environment(),
+        "config": {**vars(args), "chunking": CHUNKING},
+        "stages": stages,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["config"].get("files") != args.files or baseline["config"].get("kb") != args.kb:
+            print("Warning: the baseline was run on a different corpus size")
+        rows, regressions = compare(stages, baseline["stages"], args.threshold)
+        print()
+        print_table(rows, ["stage", "metric", "baseline", "current", "change", "regression"])
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare retriever backends (Chroma, NumPy exact, HNSW) on latency and recall@k.
+
+    python benchmarks/bench_retrievers.py --sizes 1000 10000 50000 --k 5
+
+Vectors are synthetic (clustered Gaussian, normalized) so the benchmark runs
+offline; recall@k is measured against the exact NumPy results.
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from common import percentiles, print_table, time_calls
+
+import chromadb
+from retrievers import ChromaRetriever, HNSWIndex, NumpyIndex
+
+
+def synthetic_vectors(n, dim, rng, clusters=64):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_chroma(ids, vectors, documents, metadatas):
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        name=f"bench-{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}, embedding_function=None
+    )
+    for i in range(0, len(ids), 5000):
+        collection.add(
+            ids=ids[i:i + 5000],
+            embeddings=vectors[i:i + 5000],
+            documents=documents[i:i + 5000],
+            metadatas=metadatas[i:i + 5000],
+        )
+    return ChromaRetriever(collection)
+
+
+def run(sizes, dim, k, n_queries, hnsw_params, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for size in sizes:
+        vectors = synthetic_vectors(size, dim, rng)
+        queries = synthetic_vectors(n_queries, dim, rng)
+        ids = [f"doc{i}" for i in range(size)]
+        documents = [f"document {i}" for i in range(size)]
+        metadatas = [{"source": "bench", "part": i} for i in range(size)]
+
+        backends = {}
+        start = time.perf_counter()
+        exact = NumpyIndex(embedding_func=None)
+        exact.add(ids, vectors, documents, metadatas)
+        backends["numpy"] = (exact, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        backends["chroma"] = (build_chroma(ids, vectors, documents, metadatas), time.perf_counter() - start)
+
+        for M, ef in hnsw_params:
+            try:
+                start = time.perf_counter()
+                index = HNSWIndex(embedding_func=None, M=M, ef=ef)
+                index.add(ids, vectors, documents, metadatas)
+                backends[f"hnsw(M={M},ef={ef})"] = (index, time.perf_counter() - start)
+            except ImportError as e:
+                print(e)
+                break
+
+        args = [(None, query, k) for query in queries]
+        truth, _ = time_calls(exact.query, args)
+        truth_ids = [{chunk["id"] for chunk in result} for result in truth]
+
+        for name, (backend, build_time) in backends.items():
+            results, durations = time_calls(backend.query, args)
+            recall = np.mean([
+                len(expected & {chunk["id"] for chunk in result}) / k
+                for expected, result in zip(truth_ids, results)
+            ])
+            rows.append({
+                "size": size,
+                "backend": name,
+                "build_s": build_time,
+                **percentiles(durations),
+                f"recall@{k}": float(recall),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hnsw", nargs="+", default=["16:50", "16:200", "32:200"],
+                        help="HNSW M:ef pairs to benchmark")
+    args = parser.parse_args()
+
+    hnsw_params = [tuple(int(v) for v in pair.split(":")) for pair in args.hnsw]
+    rows = run(args.sizes, args.dim, args.k, args.queries, hnsw_params)
+    print_table(rows, ["size", "backend", "build_s", "p50_ms", "p95_ms", "mean_ms", f"recall@{args.k}"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Build time, memory and query latency of the BM25 sparse index.
+
+    python benchmarks/bench_sparse.py --sizes 10000 100000 --queries 200
+
+Chunks are synthetic (see corpus.synthetic_text); queries mix common
+words with exact codes such as "E-4012" or "config.yaml", which the dense
+retriever tends to miss.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from common import percentiles, print_table, time_calls
+from corpus import WORDS
+
+from sparse_index import BM25Index
+
+
+def synthetic_chunks(n, rng, words_per_chunk=120):
+    """
+    `n` chunks, each tagged with a unique error code so exact-match recall can be checked.
+    """
+    chunks = []
+    for i in range(n):
+        words = [rng.choice(WORDS) for _ in range(words_per_chunk)]
+        words.insert(rng.randrange(len(words)), f"ERR-{i:06d}")
+        chunks.append(" ".join(words))
+    return chunks
+
+
+def build_index(ids, chunks, batch_size=1000):
+    index = BM25Index()
+    for i in range(0, len(ids), batch_size):
+        index.add(ids[i:i + batch_size], chunks[i:i + batch_size])
+    return index
+
+
+def run(sizes, n_queries, k, measure_memory=True, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for size in sizes:
+        chunks = synthetic_chunks(size, rng)
+        ids = [f"doc{i}" for i in range(size)]
+
+        start = time.perf_counter()
+        index = build_index(ids, chunks)
+        build_time = time.perf_counter() - start
+
+        # tracemalloc slows allocation-heavy code down a lot, so memory is measured on a second build
+        memory = None
+        if measure_memory:
+            tracemalloc.start()
+            measured = build_index(ids, chunks)
+            memory = tracemalloc.get_traced_memory()[0] / 1024**2
+            tracemalloc.stop()
+            del measured
+
+        targets = [rng.randrange(size) for _ in range(n_queries)]
+        queries = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} ERR-{target:06d}" for target in targets]
+        results, durations = time_calls(index.query, [(query, k) for query in queries])
+        hits = sum(any(chunk_id == f"doc{target}" for chunk_id, _ in result) for target, result in zip(targets, results))
+
+        start = time.perf_counter()
+        index.delete(ids[: size // 3])
+        delete_time = time.perf_counter() - start
+
+        rows.append({
+            "chunks": size,
+            "build_s": build_time,
+            "chunks/s": size / build_time,
+            "index_mb": memory,
+            **percentiles(durations),
+            f"exact_hit@{k}": hits / n_queries,
+            "delete_1/3_s": delete_time,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc build")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.queries, args.k, measure_memory=not args.no_memory)
+    print_table(rows, ["chunks", "build_s", "chunks/s", "index_mb", "p50_ms", "p95_ms", "mean_ms",
+                       f"exact_hit@{args.k}", "delete_1/3_s"])
+
+
+if __name__ == "__main__":
+    main()
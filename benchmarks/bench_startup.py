@@ -0,0 +1,103 @@
+"""
+Profile app start-up: module import time (`python -X importtime`) and,
+optionally, the background embedding model / Chroma initialization.
+
+    python benchmarks/bench_startup.py --max-import-ms 1500
+    python benchmarks/bench_startup.py --with-model --json startup.json
+
+Exits with status 1 if importing the app modules takes longer than
+`--max-import-ms`, so it can guard against start-up regressions.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from common import SRC_DIR
+
+# What `streamlit run src/run.py` imports before rendering the page
+APP_MODULES = ["run", "utils", "mylogging", "collections_setup", "runpod_setup", "answer_cache"]
+
+
+def profile_imports(modules, repeats=3):
+    """
+    Import the modules in a fresh interpreter with -X importtime.
+    Returns the fastest total wall time (ms) and the per-module cumulative
+    times (ms) of that run.
+    """
+    best = None
+    for _ in range(repeats):
+        code = "import time; t = time.perf_counter(); " + "; ".join(
+            f"import {module}" for module in modules
+        ) + "; print((time.perf_counter() - t) * 1000)"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True,
+        )
+        total_ms = float(result.stdout.strip().splitlines()[-1])
+        if best is None or total_ms < best[0]:
+            best = (total_ms, parse_importtime(result.stderr))
+    return best
+
+
+def parse_importtime(report, max_depth=2):
+    """
+    Parse `-X importtime` output into {module: cumulative ms}.
+    Nested imports are indented by two spaces per level; only the first
+    `max_depth` levels are kept (the app modules and what they pull in).
+    """
+    cumulative = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            cumulative[name.strip()] = int(cumulative_us) / 1000
+    return cumulative
+
+
+def profile_model_load(embedding_model):
+    """
+    Time the background initialization path used by run.py.
+    """
+    sys.path.insert(0, SRC_DIR)
+    from collections_setup import load_chromadb
+
+    start = time.perf_counter()
+    load_chromadb(embedding_model)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if app imports exceed this")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to show")
+    parser.add_argument("--with-model", action="store_true", help="Also time embedding model + client creation")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    total_ms, cumulative = profile_imports(APP_MODULES)
+    print(f"App imports: {total_ms:.0f} ms")
+    print("Slowest imports (cumulative):")
+    for name, ms in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    results = {"import_ms": total_ms, "imports": cumulative}
+    if args.with_model:
+        results["model_load_ms"] = profile_model_load(args.model)
+        print(f"Embedding model + client: {results['model_load_ms']:.0f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_import_ms is not None and total_ms > args.max_import_ms:
+        print(f"FAIL: app imports took {total_ms:.0f} ms (threshold {args.max_import_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Profile the generation worker's start-up (model path resolution, tokenizer
+and weight loading, first forward pass, warm-up generate) on CPU.
+
+    python benchmarks/bench_worker_startup.py --max-seconds 30
+    python benchmarks/bench_worker_startup.py --model /models/Mistral-7B-Instruct-v0.1-GPTQ --json startup.json
+
+Without `--model`, a tiny randomly initialised Llama model is created in a
+temporary directory, so the start-up code path can be tracked for
+regressions without a GPU or a download. Exits with status 1 if start-up
+takes longer than `--max-seconds`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import print_table
+
+WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_dockerfile")
+
+TINY_VOCAB = (
+    "<unk> <s> </s> [INST] [/INST] context question what is this document about ? a short warm-up . : "
+    "you are helpful assistant that answers questions based on the provided use only information given "
+    "in to answer if doesn't contain enough say so clearly"
+).split()
+
+
+def make_tiny_model(path):
+    """
+    Save a 2-layer Llama model and a word-level tokenizer that covers the warm-up prompt.
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    vocab = {word: i for i, word in enumerate(TINY_VOCAB)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 1)])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>", unk_token="<unk>"
+    )
+    config = LlamaConfig(
+        vocab_size=len(vocab), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, bos_token_id=1, eos_token_id=2,
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def profile_worker_startup(model_path, warmup_iterations, warmup_max_tokens):
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "startup.json")
+        subprocess.run(
+            [
+                sys.executable, "startup.py",
+                "--warmup-iterations", str(warmup_iterations),
+                "--warmup-max-tokens", str(warmup_max_tokens),
+                "--json", report_path,
+            ],
+            cwd=WORKER_DIR, env={**os.environ, "MODEL_PATH": model_path},
+            capture_output=True, text=True, check=True,
+        )
+        with open(report_path) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Model directory or hub name (default: a tiny random model)")
+    parser.add_argument("--warmup-iterations", type=int, default=1)
+    parser.add_argument("--warmup-max-tokens", type=int, default=16)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if start-up exceeds this")
+    parser.add_argument("--json", help="Write the startup report to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if model_path is None:
+            model_path = os.path.join(tmp, "tiny-llama")
+            make_tiny_model(model_path)
+        report = profile_worker_startup(model_path, args.warmup_iterations, args.warmup_max_tokens)
+
+    print_table(report["steps"], ["step", "seconds"])
+    print(f"Total: {report['total_seconds']:.2f}s on {report['device']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_seconds is not None and report["total_seconds"] > args.max_seconds:
+        print(f"Worker start-up took {report['total_seconds']:.2f}s (limit {args.max_seconds:.2f}s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
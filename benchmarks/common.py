@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Benchmarks import the app modules the same way run.py does (flat, from src/)
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def percentiles(samples):
+    """
+    p50/p95/mean of a list of durations in seconds, reported in milliseconds.
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def time_calls(func, args_list):
+    """
+    Call `func` once per argument tuple and return (results, durations).
+    """
+    results, durations = [], []
+    for args in args_list:
+        start = time.perf_counter()
+        results.append(func(*args))
+        durations.append(time.perf_counter() - start)
+    return results, durations
+
+
+def print_table(rows, columns):
+    """
+    Print a list of dicts as an aligned text table.
+    """
+    widths = {c: max(len(c), *(len(_format(row.get(c))) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(_format(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def reset_peak_rss():
+    """
+    Reset the process's peak RSS so the next `peak_rss_bytes` covers only
+    what follows. Linux only; returns False where the peak cannot be reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process since start (or the last reset).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,107 @@
+"""
+Deterministic synthetic corpus for the benchmarks: plain text and PDF files
+of configurable size, plus queries drawn from their sentences.
+
+    python benchmarks/corpus.py --out /tmp/corpus --files 20 --kb 200 --kinds txt pdf
+
+The same seed always produces the same bytes, so results of different runs
+(and branches) measure the same input.
+"""
+import argparse
+import os
+import random
+import re
+
+import fitz
+
+WORDS = (
+    "retrieval augmented generation model context query document chunk token "
+    "embedding vector index latency throughput memory cache batch stream worker "
+    "error code E-4012 part PN-88731 table value config.yaml 3.14159"
+).split()
+
+FILE_TYPES = {"txt": "text/plain", "pdf": "application/pdf"}
+
+
+def synthetic_text(n_bytes, seed=0):
+    """
+    Deterministic text of roughly `n_bytes`, with short and long paragraphs.
+    """
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < n_bytes:
+        n_sentences = rng.choice([1, 2, 3, 5, 8, 30])
+        sentences = []
+        for _ in range(n_sentences):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(5, 30))]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", "!"]))
+        # Wrap paragraphs over several lines, as PDF extraction does
+        text = " ".join(sentences)
+        lines = [text[i:i + 80] for i in range(0, len(text), 80)]
+        paragraphs.append("\n".join(lines))
+        size += len(text) + 2
+    return "\n\n".join(paragraphs)
+
+
+def make_pdf(text, lines_per_page=60):
+    """
+    Lay `text` out on A4 pages and return the PDF bytes.
+    """
+    lines = text.split("\n")
+    with fitz.open() as pdf:
+        for start in range(0, len(lines), lines_per_page):
+            page = pdf.new_page()
+            page.insert_text((40, 40), "\n".join(lines[start:start + lines_per_page]), fontsize=9)
+        # Fixed metadata keeps the output byte-identical across runs
+        pdf.set_metadata({"creationDate": "D:20240101000000", "modDate": "D:20240101000000"})
+        return pdf.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def generate_corpus(n_files, file_kb, kinds=("txt", "pdf"), seed=0):
+    """
+    `n_files` files of about `file_kb` KB of text each, alternating between `kinds`.
+    Returns a list of (name, file type, bytes).
+    """
+    corpus = []
+    for i in range(n_files):
+        kind = kinds[i % len(kinds)]
+        text = synthetic_text(file_kb * 1024, seed=seed * 100003 + i)
+        data = text.encode("utf-8") if kind == "txt" else make_pdf(text)
+        corpus.append((f"doc{i:04d}.{kind}", FILE_TYPES[kind], data))
+    return corpus
+
+
+def corpus_queries(n_queries, n_files, file_kb, seed=0):
+    """
+    Questions made of sentences taken from the corpus files, so every query
+    has at least one chunk that answers it.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        i = rng.randrange(n_files)
+        # Undo the line wrapping, which splits words
+        text = synthetic_text(file_kb * 1024, seed=seed * 100003 + i).replace("\n\n", " ").replace("\n", "")
+        sentences = [s for s in re.split(r"(?<=[.?!]) ", text) if len(s.split()) >= 5]
+        queries.append(rng.choice(sentences))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Directory to write the files to")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--kb", type=int, default=100, help="Text per file, in KB")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(FILE_TYPES), default=["txt", "pdf"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name, _, data in generate_corpus(args.files, args.kb, tuple(args.kinds), args.seed):
+        with open(os.path.join(args.out, name), "wb") as f:
+            f.write(data)
+    print(f"Wrote {args.files} files to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Retrieval quality and latency over a golden question set, per configuration.
+
+    python benchmarks/eval_retrieval.py --k 1 3 5 10 --sim-th none 0.2 --chunking tokens:128 tokens:256 words:200
+    python benchmarks/eval_retrieval.py --golden golden/set.json --embedders all-MiniLM-L6-v2 onnx:models/minilm-onnx
+    python benchmarks/eval_retrieval.py --write-golden /tmp/golden   # synthetic set, as a template
+
+Documents are indexed with the app's ingestion path (`ingest_file`) and
+questions answered through `retrieve_chunks`, so the results reflect what
+the app retrieves. For every combination of embedder, chunking, hybrid
+retrieval, `n_results` (k) and similarity threshold it reports:
+- recall@k: share of questions with a relevant chunk among the first k
+- MRR: mean reciprocal rank of the first relevant chunk (0 if none in the k)
+- p50/p95 latency of embedding the question and retrieving
+- answer hit rate and end-to-end latency (retrieval, context packing and a
+  mock generator standing in for RunPod), so everything runs offline.
+
+A golden set is a JSON file:
+
+    {"documents": ["docs/manual.pdf", "docs/faq.txt"],
+     "questions": [{"question": "...", "sources": ["manual.pdf"], "evidence": "...", "answer": "..."}]}
+
+Document paths are relative to the JSON file. A chunk is relevant when it
+comes from one of `sources` and contains `evidence` (either may be omitted,
+case and whitespace are ignored). `answer` is what the generated text should
+contain. Without `--golden`, a synthetic set of made-up product facts is used.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+from common import percentiles, print_table
+from corpus import FILE_TYPES, make_pdf, synthetic_text
+from bench_pipeline import HashingEmbedding
+
+import chromadb
+from collections_setup import ingest_file
+from context_packing import pack_context
+from retrievers import build_retriever
+from runpod_setup import JobResult, generate_answer, get_contextual_input, retrieve_chunks, PROMPT_TEMPLATE_TOKENS
+from sparse_index import BM25Index
+from token_chunking import context_token_budget, load_tokenizer
+
+ATTRIBUTES = {
+    "warranty period": lambda rng: f"{rng.choice([6, 12, 18, 24, 36, 48])} months",
+    "operating voltage": lambda rng: f"{rng.choice([5, 12, 24, 48, 110, 230])} volts",
+    "maximum load": lambda rng: f"{rng.randint(2, 90) * 10} kilograms",
+    "release year": lambda rng: str(rng.randint(1995, 2024)),
+    "support hotline": lambda rng: f"+44 20 {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+}
+SYLLABLES = "ka lo mi ver tra zon pel ix qua dor fen ru sa bel tor vin".split()
+
+
+class MockGenerator:
+    """
+    Offline stand-in for the RunPod client: answers with the context sentence
+    sharing the most words with the question, after a simulated latency of
+    `latency_ms` plus `ms_per_token` per output token.
+    """
+
+    def __init__(self, latency_ms=0.0, ms_per_token=0.0):
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+
+    def generate(self, prompt, max_tokens=150, temperature=0.7, timeout=300):
+        start = time.perf_counter()
+        question_words = set(re.findall(r"\w+", prompt["question"].lower()))
+        sentences = re.split(r"(?<=[.?!])\s+", prompt.get("context", ""))
+        response = max(sentences, key=lambda s: len(question_words & set(re.findall(r"\w+", s.lower()))), default="")
+        response = " ".join(response.split()[:max_tokens])
+        time.sleep((self.latency_ms + self.ms_per_token * len(response.split())) / 1000)
+        elapsed = time.perf_counter() - start
+        return JobResult(
+            job_id=uuid.uuid4().hex, status="COMPLETED", output={"response": response},
+            queue_time=0.0, execution_time=elapsed, total_time=elapsed,
+        )
+
+
+def _pseudo_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+
+def synthetic_golden_set(n_docs=8, facts_per_doc=6, file_kb=20, seed=0):
+    """
+    Documents about made-up products, each stating a few facts amid filler
+    text, with one question per fact. Returns (documents, questions) where
+    documents are (name, file type, bytes).
+    """
+    rng = random.Random(seed)
+    documents, questions = [], []
+    for i in range(n_docs):
+        kind = "pdf" if i % 2 else "txt"
+        name = f"product_sheet_{i:02d}.{kind}"
+        paragraphs = synthetic_text(file_kb * 1024, seed=seed * 100003 + i).split("\n\n")
+        for _ in range(facts_per_doc):
+            product = _pseudo_word(rng)
+            attribute = rng.choice(sorted(ATTRIBUTES))
+            value = ATTRIBUTES[attribute](rng)
+            fact = f"The {attribute} of the {product} is {value}."
+            paragraphs.insert(rng.randrange(len(paragraphs) + 1), fact)
+            questions.append({
+                "question": f"What is the {attribute} of the {product}?",
+                "sources": [name],
+                "evidence": fact,
+                "answer": value,
+            })
+        text = "\n\n".join(paragraphs)
+        data = text.encode("utf-8") if kind == "txt" else make_pdf(text)
+        documents.append((name, FILE_TYPES[kind], data))
+    return documents, questions
+
+
+def load_golden_set(path):
+    """
+    Read a golden set file; returns (documents, questions) like `synthetic_golden_set`.
+    """
+    with open(path) as f:
+        golden = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    documents = []
+    for document in golden["documents"]:
+        extension = os.path.splitext(document)[1].lstrip(".").lower()
+        with open(os.path.join(base, document), "rb") as f:
+            documents.append((os.path.basename(document), FILE_TYPES.get(extension, "text/plain"), f.read()))
+    return documents, golden["questions"]
+
+
+def write_golden_set(directory, documents, questions):
+    os.makedirs(os.path.join(directory, "docs"), exist_ok=True)
+    for name, _, data in documents:
+        with open(os.path.join(directory, "docs", name), "wb") as f:
+            f.write(data)
+    with open(os.path.join(directory, "golden.json"), "w") as f:
+        json.dump({"documents": [f"docs/{name}" for name, _, _ in documents], "questions": questions}, f, indent=2)
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def is_relevant(chunk, item):
+    sources = item.get("sources")
+    if sources and chunk["metadata"].get("source") not in sources:
+        return False
+    evidence = item.get("evidence")
+    return not evidence or _normalize(evidence) in _normalize(chunk["document"])
+
+
+def load_embedder(name):
+    """
+    "hash" (offline hashing embedder), "onnx:DIR" / "onnx-int8:DIR", or a
+    Sentence Transformer model name.
+    """
+    if name == "hash":
+        return HashingEmbedding()
+    if name.startswith(("onnx:", "onnx-int8:")):
+        from onnx_embedding import OnnxEmbeddingFunction
+        backend, model_dir = name.split(":", 1)
+        return OnnxEmbeddingFunction(model_dir, quantized=backend == "onnx-int8")
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=name)
+
+
+def parse_chunking(spec):
+    """
+    "words:200" or "tokens:256" -> iter_text_chunks options.
+    """
+    chunking, size = spec.split(":")
+    if chunking == "tokens":
+        return {"chunking": "tokens", "max_tokens": int(size)}
+    return {"chunking": "words", "max_words": int(size)}
+
+
+def build_index(documents, embedding_func, chunk_options, retriever_backend="chroma"):
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        name=f"eval-{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"}, embedding_function=None
+    )
+    sparse_index = BM25Index()
+    for name, file_type, data in documents:
+        ingest_file(collection, embedding_func, name, data, file_type, sparse_index=sparse_index,
+                    chunk_options=chunk_options)
+    retriever = build_retriever(collection, embedding_func, backend=retriever_backend)
+    retriever.sync(collection)
+    return retriever, sparse_index
+
+
+def evaluate(retriever, sparse_index, embedding_func, questions, k, sim_th, generator, max_tokens=200):
+    """
+    Metrics of one configuration over all questions.
+    """
+    tokenizer = load_tokenizer()
+    reciprocal_ranks, hits, answer_hits = [], 0, 0
+    retrieval_times, end_to_end_times = [], []
+    for item in questions:
+        start = time.perf_counter()
+        query_embedding = embedding_func([item["question"]])[0]
+        chunks = retrieve_chunks(
+            retriever, query=item["question"], nresults=k, sim_th=sim_th,
+            query_embedding=query_embedding, sparse_index=sparse_index,
+        )
+        retrieval_times.append(time.perf_counter() - start)
+
+        rank = next((i for i, chunk in enumerate(chunks, start=1) if is_relevant(chunk, item)), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        budget = context_token_budget(item["question"], max_tokens, tokenizer, reserved_tokens=PROMPT_TEMPLATE_TOKENS)
+        packed = pack_context(chunks, budget, tokenizer)
+        answer = generate_answer(get_contextual_input(item["question"], packed.text), max_tokens=max_tokens,
+                                 client=generator)
+        end_to_end_times.append(time.perf_counter() - start)
+        answer_hits += bool(item.get("answer")) and _normalize(item["answer"]) in _normalize(answer)
+
+    retrieval = percentiles(retrieval_times)
+    end_to_end = percentiles(end_to_end_times)
+    return {
+        "recall": hits / len(questions),
+        "mrr": sum(reciprocal_ranks) / len(questions),
+        "answer_hit": answer_hits / len(questions),
+        "p50_ms": retrieval["p50_ms"],
+        "p95_ms": retrieval["p95_ms"],
+        "e2e_p50_ms": end_to_end["p50_ms"],
+        "e2e_p95_ms": end_to_end["p95_ms"],
+    }
+
+
+def run(documents, questions, embedders, chunkings, ks, sim_ths, hybrid_modes, generator, retriever_backend="chroma"):
+    rows = []
+    for embedder_name in embedders:
+        embedding_func = load_embedder(embedder_name)
+        for chunking in chunkings:
+            start = time.perf_counter()
+            try:
+                retriever, sparse_index = build_index(
+                    documents, embedding_func, parse_chunking(chunking), retriever_backend
+                )
+            except LookupError:
+                print(f"Skipping {chunking}: NLTK punkt data is not available")
+                continue
+            index_seconds = time.perf_counter() - start
+            for hybrid, k, sim_th in itertools.product(hybrid_modes, ks, sim_ths):
+                metrics = evaluate(
+                    retriever, sparse_index if hybrid else None, embedding_func, questions, k, sim_th, generator
+                )
+                rows.append({
+                    "embedder": embedder_name, "chunking": chunking, "hybrid": hybrid, "k": k, "sim_th": sim_th,
+                    "chunks": retriever.count(), "index_s": index_seconds, **metrics,
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--golden", help="Golden set JSON (default: synthetic product facts)")
+    parser.add_argument("--write-golden", help="Write the synthetic golden set to this directory and exit")
+    parser.add_argument("--docs", type=int, default=8, help="Synthetic set: number of documents")
+    parser.add_argument("--facts", type=int, default=6, help="Synthetic set: questions per document")
+    parser.add_argument("--kb", type=int, default=20, help="Synthetic set: filler text per document, in KB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedders", nargs="+", default=["hash"])
+    parser.add_argument("--chunking", nargs="+", default=["tokens:256"], help="e.g. words:200 tokens:256")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10], help="n_results values")
+    parser.add_argument("--sim-th", nargs="+", default=["none"], help="Similarity thresholds; 'none' disables")
+    parser.add_argument("--hybrid", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--retriever", choices=["chroma", "numpy", "hnsw"], default="chroma")
+    parser.add_argument("--mock-latency-ms", type=float, default=0.0, help="Mock generator fixed latency")
+    parser.add_argument("--mock-ms-per-token", type=float, default=0.0, help="Mock generator per-token latency")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    if args.golden:
+        documents, questions = load_golden_set(args.golden)
+    else:
+        documents, questions = synthetic_golden_set(args.docs, args.facts, args.kb, args.seed)
+    if args.write_golden:
+        write_golden_set(args.write_golden, documents, questions)
+        print(f"Wrote {len(documents)} documents and {len(questions)} questions to {args.write_golden}")
+        return
+
+    sim_ths = [None if value == "none" else float(value) for value in args.sim_th]
+    hybrid_modes = {"on": [True], "off": [False], "both": [False, True]}[args.hybrid]
+    rows = run(
+        documents, questions, args.embedders, args.chunking, args.k, sim_ths, hybrid_modes,
+        MockGenerator(args.mock_latency_ms, args.mock_ms_per_token), retriever_backend=args.retriever,
+    )
+
+    print(f"{len(documents)} documents, {len(questions)} questions")
+    print_table(rows, ["embedder", "chunking", "hybrid", "k", "sim_th", "chunks", "recall", "mrr", "answer_hit",
+                       "p50_ms", "p95_ms", "e2e_p50_ms", "e2e_p95_ms"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Load-test the question path: concurrent sessions embed the question,
+retrieve, pack the context and generate through the RunPod client, as the
+app does, against a mock endpoint (see mock_runpod.py) or a real one.
+
+    python benchmarks/load_test.py --sessions 8 --questions 20 --profile realistic
+    python benchmarks/load_test.py --sessions 16 --mode generate --profile cold --cold-start-s 5
+    python benchmarks/load_test.py --endpoint http://localhost:8000 --sessions 32   # a running mock_runpod.py
+
+Each session gets its own tenant collection (as a browser session does),
+filled with the synthetic corpus through `ingest_file` before the clock
+starts. Sessions then ask `--questions` questions each, `--think-time`
+seconds apart, sharing one pooled RunPodClient. Reports throughput
+(questions and generated tokens per second), p50/p95/p99 latency of
+retrieval, time to first token and the whole question, the error count,
+and the per-stage breakdown recorded by the tracer, worker timings included.
+Without `--endpoint`, a mock endpoint with the given profile is started in
+this process.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from bench_pipeline import environment
+from common import print_table
+from corpus import corpus_queries, generate_corpus
+from eval_retrieval import load_embedder
+from mock_runpod import add_profile_args, profile_from_args, start_server
+
+import chromadb
+from collections_setup import ingest_file
+from context_packing import pack_context
+from runpod_setup import (
+    RunPodClient, HEADERS, PROMPT_TEMPLATE_TOKENS, get_contextual_input, record_worker_timings, retrieve_chunks,
+    stream_answer,
+)
+from tenant_store import TenantStore
+from token_chunking import context_token_budget, load_tokenizer
+from tracing import get_tracer
+
+# As in run.py
+CONTEXT_CANDIDATES = 20
+
+
+@dataclass
+class QuestionResult:
+    session: int
+    retrieval_s: float = None
+    time_to_first_token_s: float = None
+    total_s: float = None
+    output_tokens: int = 0
+    error: str = None
+
+
+def build_sessions(store, n_sessions, corpus):
+    """
+    One tenant per session, each holding its own copy of the corpus.
+    """
+    tenants = []
+    for session in range(n_sessions):
+        tenant = store.get(f"load-{session}")
+        for name, file_type, data in corpus:
+            ingest_file(tenant.collection, store.embedding_func, name, data, file_type,
+                        sparse_index=tenant.sparse_index, usage=tenant.usage)
+        tenant.retriever.sync(tenant.collection)
+        tenants.append(tenant)
+    return tenants
+
+
+def ask(session, tenant, embedding_func, client, question, mode, max_tokens, temperature):
+    """
+    One question through the app's path; failures are recorded, not raised.
+    """
+    result = QuestionResult(session=session)
+    start = time.perf_counter()
+    try:
+        query_embedding = embedding_func([question])[0]
+        candidates = retrieve_chunks(
+            tenant.retriever, query=question, nresults=CONTEXT_CANDIDATES, query_embedding=query_embedding,
+            sparse_index=tenant.sparse_index,
+        )
+        tokenizer = load_tokenizer()
+        budget = context_token_budget(question, max_tokens, tokenizer, reserved_tokens=PROMPT_TEMPLATE_TOKENS)
+        packed = pack_context(candidates, budget, tokenizer)
+        result.retrieval_s = time.perf_counter() - start
+
+        job_input = get_contextual_input(question, packed.text)
+        if mode == "stream":
+            token_stream = stream_answer(job_input, max_tokens=max_tokens, temperature=temperature, client=client)
+            for _ in token_stream:
+                pass
+            if token_stream.time_to_first_token is not None:
+                result.time_to_first_token_s = result.retrieval_s + token_stream.time_to_first_token
+            result.output_tokens = token_stream.stats.get("output_tokens", 0)
+        else:
+            # What generate_answer does, keeping the JobResult for its token count
+            job_result = client.generate(job_input, max_tokens=max_tokens, temperature=temperature)
+            record_worker_timings(job_result.output)
+            result.output_tokens = job_result.output.get("output_tokens", 0)
+    except RuntimeError as e:
+        result.error = str(e)
+    result.total_s = time.perf_counter() - start
+    return result
+
+
+def run_session(session, tenant, embedding_func, client, questions, mode, max_tokens, temperature, think_time):
+    results = []
+    for i, question in enumerate(questions):
+        if i:
+            time.sleep(think_time)
+        results.append(ask(session, tenant, embedding_func, client, question, mode, max_tokens, temperature))
+    return results
+
+
+def tail_latency(samples):
+    """
+    p50/p95/p99/max of durations in seconds, in milliseconds.
+    """
+    values = np.asarray([value for value in samples if value is not None], dtype=np.float64) * 1000
+    if not len(values):
+        return {"count": 0}
+    return {
+        "count": int(len(values)),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def report(results, wall_s):
+    ok = [result for result in results if result.error is None]
+    return {
+        "questions": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": wall_s,
+        "questions_per_s": len(ok) / wall_s if wall_s > 0 else 0.0,
+        "tokens_per_s": sum(result.output_tokens for result in ok) / wall_s if wall_s > 0 else 0.0,
+        "latency": {
+            "retrieval": tail_latency([result.retrieval_s for result in ok]),
+            "time_to_first_token": tail_latency([result.time_to_first_token_s for result in ok]),
+            "question": tail_latency([result.total_s for result in ok]),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a session's questions")
+    parser.add_argument("--mode", choices=["stream", "generate"], default="stream",
+                        help="Stream the answer (as the app) or wait for the whole of it")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--files", type=int, default=4, help="Corpus files per session")
+    parser.add_argument("--kb", type=int, default=50, help="Text per file, in KB")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", default="hash", help="hash, onnx:DIR or a Sentence Transformer name")
+    parser.add_argument("--retriever", choices=["chroma", "numpy", "hnsw"], default="chroma")
+    parser.add_argument("--endpoint", help="Endpoint base URL (default: start a mock endpoint in this process)")
+    parser.add_argument("--json", help="Write the results to this file")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    server = endpoint = None
+    if args.endpoint:
+        endpoint_url = args.endpoint
+    else:
+        profile = profile_from_args(args)
+        server, endpoint = start_server(profile, seed=args.seed)
+        endpoint_url = f"http://127.0.0.1:{server.server_port}"
+        print(f"Mock endpoint ({args.profile}): {profile}")
+
+    embedding_func = load_embedder(args.embedder)
+    store = TenantStore(chromadb.EphemeralClient(), embedding_func, collection_prefix="load",
+                        retriever_backend=args.retriever, max_tenants=args.sessions)
+    corpus = generate_corpus(args.files, args.kb, seed=args.seed)
+    start = time.perf_counter()
+    tenants = build_sessions(store, args.sessions, corpus)
+    print(f"Indexed {args.files} files for each of {args.sessions} sessions in {time.perf_counter() - start:.1f}s")
+
+    client = RunPodClient(endpoint=endpoint_url, headers=HEADERS, pool_size=args.sessions)
+    tracer = get_tracer()
+    tracer.reset()
+    try:
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            start = time.perf_counter()
+            futures = [
+                executor.submit(
+                    run_session, session, tenant, embedding_func, client,
+                    corpus_queries(args.questions, args.files, args.kb, seed=args.seed * 1000 + session),
+                    args.mode, args.max_tokens, args.temperature, args.think_time,
+                )
+                for session, tenant in enumerate(tenants)
+            ]
+            results = [result for future in futures for result in future.result()]
+            wall_s = time.perf_counter() - start
+    finally:
+        client.close()
+        if server is not None:
+            server.shutdown()
+            endpoint.shutdown()
+
+    summary = report(results, wall_s)
+    print(f"\n{summary['questions']} questions, {summary['errors']} errors in {wall_s:.1f}s: "
+          f"{summary['questions_per_s']:.2f} questions/s, {summary['tokens_per_s']:.0f} tokens/s")
+    print_table(
+        [{"latency": name, **stats} for name, stats in summary["latency"].items()],
+        ["latency", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"],
+    )
+    stages = tracer.summary()
+    print()
+    print_table([{"stage": name, **stats} for name, stats in stages.items()],
+                ["stage", "count", "p50_ms", "p95_ms", "max_ms"])
+    errors = sorted({result.error for result in results if result.error})
+    for error in errors[:5]:
+        print(f"Error: {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "environment": environment(),
+                "config": vars(args),
+                "summary": summary,
+                "stages": stages,
+                "results": [asdict(result) for result in results],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
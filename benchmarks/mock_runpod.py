@@ -0,0 +1,474 @@
+"""
+Local stand-in for the RunPod serverless endpoint, to load-test the app and
+the client without GPUs.
+
+    python benchmarks/mock_runpod.py --port 8000 --profile realistic
+    RUNPOD_ENDPOINT=http://localhost:8000 streamlit run src/run.py
+
+Serves the routes RunPodClient uses: POST /run and /runsync, GET
+/status/{id} and /stream/{id}, POST /cancel/{id}, plus GET /health. Jobs
+take the worker's input and produce its output (see
+model_dockerfile/schema.py): a full response dict, or `{"token": ...}`
+pieces followed by a stats dict when the input has `"stream": true`.
+POST /v1/completions and /v1/chat/completions answer in the OpenAI format
+(non-streaming), for tools that speak that API.
+
+Generated text is taken from the job's context, starting at the sentence
+sharing the most words with the question, and is always `max_tokens` words
+long, one word per token. A profile sets how long it takes:
+- `workers` jobs run at once; the others wait in the queue (delayTime)
+- `latency_ms` before the first token, then `tokens_per_s` per job
+- `cold_start_s` on a worker's first job, and again after `idle_timeout_s` idle
+- `error_rate` of jobs fail part-way (the worker yields `{"error": ...}`)
+- `http_error_rate` of requests are answered 503, which the client retries
+Pick a preset with `--profile` and override any field with its flag.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_dockerfile")
+if WORKER_DIR not in sys.path:
+    sys.path.insert(0, WORKER_DIR)
+
+from prompting import prompt_parts
+from schema import MODEL_NAME, job_params, response_payload, stream_stats_payload
+
+# Prompts are truncated to this many tokens, as on the worker
+MAX_INPUT_LENGTH = 2048
+
+# RunPod job states
+IN_QUEUE, IN_PROGRESS, COMPLETED, FAILED, CANCELLED = "IN_QUEUE", "IN_PROGRESS", "COMPLETED", "FAILED", "CANCELLED"
+FINAL_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class Profile:
+    workers: int = 4
+    latency_ms: float = 50.0
+    tokens_per_s: float = 50.0
+    jitter: float = 0.1
+    cold_start_s: float = 0.0
+    idle_timeout_s: float = 60.0
+    error_rate: float = 0.0
+    http_error_rate: float = 0.0
+
+
+PROFILES = {
+    # No simulated time at all: measures the client and the app side only
+    "instant": Profile(latency_ms=0.0, tokens_per_s=0.0, jitter=0.0),
+    "fast": Profile(workers=8, latency_ms=20.0, tokens_per_s=200.0),
+    # Roughly one 4-bit Mistral 7B worker per GPU, two GPUs
+    "realistic": Profile(workers=2, latency_ms=150.0, tokens_per_s=30.0, jitter=0.2),
+    "cold": Profile(workers=2, latency_ms=150.0, tokens_per_s=30.0, jitter=0.2, cold_start_s=20.0,
+                    idle_timeout_s=5.0),
+    "flaky": Profile(latency_ms=100.0, tokens_per_s=50.0, error_rate=0.05, http_error_rate=0.05),
+}
+
+
+@dataclass
+class MockJob:
+    input: dict
+    job_id: str = field(default_factory=lambda: f"mock-{uuid.uuid4().hex}")
+    status: str = IN_QUEUE
+    items: list = field(default_factory=list)
+    streamed: int = 0
+    error: str = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float = None
+    finished_at: float = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def status_payload(self):
+        """
+        The /status (and /runsync) payload; times are in milliseconds, as RunPod reports them.
+        """
+        payload = {"id": self.job_id, "status": self.status}
+        if self.started_at is not None:
+            payload["delayTime"] = int((self.started_at - self.submitted_at) * 1000)
+        if self.finished_at is not None:
+            payload["executionTime"] = int((self.finished_at - self.started_at) * 1000)
+            payload["output"] = list(self.items)
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+def count_tokens(text):
+    """
+    Rough token count: words and punctuation marks.
+    """
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def answer_words(inputs, n_words):
+    """
+    `n_words` words of the job's context (or prompt), starting at the sentence
+    sharing the most words with the question, wrapping around if needed.
+    """
+    text = inputs.get("context") or inputs.get("prompt") or ""
+    question_words = set(re.findall(r"\w+", (inputs.get("question") or "").lower()))
+    sentences = re.split(r"(?<=[.?!])\s+", text)
+    best = max(range(len(sentences)),
+               key=lambda i: len(question_words & set(re.findall(r"\w+", sentences[i].lower()))))
+    words = " ".join(sentences[best:] + sentences[:best]).split() or ["..."]
+    return [words[i % len(words)] for i in range(n_words)]
+
+
+class MockEndpoint:
+    """
+    Jobs of the mock endpoint, run on a pool of `profile.workers` threads.
+    Finished jobs are forgotten beyond the `max_jobs` most recent ones.
+    """
+
+    def __init__(self, profile, seed=None, max_jobs=10000):
+        self.profile = profile
+        self.max_jobs = max_jobs
+        self._rng = random.Random(seed)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, profile.workers), thread_name_prefix="mock-worker")
+        self._worker_state = threading.local()
+        self._jobs = OrderedDict()
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _jittered(self, value):
+        return value * (1 + self.profile.jitter * (2 * self._random() - 1))
+
+    def reject_request(self):
+        """
+        Whether to answer this HTTP request with a 503, per `http_error_rate`.
+        """
+        return self._random() < self.profile.http_error_rate
+
+    def submit(self, job_input):
+        job = MockJob(input=job_input)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.status not in FINAL_STATUSES:
+            job.cancelled.set()
+            if job.status == IN_QUEUE:
+                self._finish(job, CANCELLED)
+        return job
+
+    def next_stream_items(self, job):
+        """
+        Items yielded since the previous /stream call for this job.
+        """
+        with self._lock:
+            items = job.items[job.streamed:]
+            job.streamed += len(items)
+        return items
+
+    def health(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        running = statuses.count(IN_PROGRESS)
+        return {
+            "jobs": {
+                "completed": statuses.count(COMPLETED),
+                "failed": statuses.count(FAILED),
+                "inProgress": running,
+                "inQueue": statuses.count(IN_QUEUE),
+                "retried": 0,
+            },
+            "workers": {"idle": max(0, self.profile.workers - running), "running": running},
+        }
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINAL_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status):
+        with self._lock:
+            if job.status in FINAL_STATUSES:
+                return
+            job.status = status
+            if job.started_at is None:
+                job.started_at = time.monotonic()
+            job.finished_at = time.monotonic()
+        job.done.set()
+
+    def _cold_start(self):
+        # Each pool thread stands for one worker, warm until idle for idle_timeout_s
+        now = time.monotonic()
+        last_active = getattr(self._worker_state, "last_active", None)
+        self._worker_state.last_active = now
+        if last_active is None or now - last_active > self.profile.idle_timeout_s:
+            return self.profile.cold_start_s
+        return 0.0
+
+    def _emit(self, job, item):
+        with self._lock:
+            job.items.append(item)
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != IN_QUEUE:
+                return
+            job.status = IN_PROGRESS
+            job.started_at = time.monotonic()
+        try:
+            self._generate(job)
+            self._finish(job, CANCELLED if job.cancelled.is_set() else COMPLETED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+        finally:
+            self._worker_state.last_active = time.monotonic()
+
+    def _generate(self, job):
+        """
+        Simulate the worker's handler for one job, yielding the same items.
+        """
+        start = time.perf_counter()
+        job.cancelled.wait(self._cold_start())
+        try:
+            params = job_params(job.input)
+        except ValueError as e:
+            self._emit(job, {"error": str(e)})
+            return
+        prefix, suffix = prompt_parts(job.input)
+        prefix_tokens = count_tokens(prefix) + 1
+        input_tokens = min(prefix_tokens + count_tokens(suffix), MAX_INPUT_LENGTH)
+        with self._lock:
+            tokens_saved = prefix_tokens if prefix in self._prefixes else 0
+            self._prefixes.add(prefix)
+        encode_time = time.perf_counter() - start
+
+        words = answer_words(job.input, max(0, int(params["max_tokens"])))
+        fail_at = int(self._random() * len(words)) if self._random() < self.profile.error_rate else None
+        token_interval = 1 / self._jittered(self.profile.tokens_per_s) if self.profile.tokens_per_s > 0 else 0.0
+
+        generate_start = time.perf_counter()
+        if job.cancelled.wait(self._jittered(self.profile.latency_ms) / 1000):
+            return
+        time_to_first_token = None
+        for i, word in enumerate(words):
+            if i == fail_at:
+                self._emit(job, {"error": "Injected failure (mock error_rate)"})
+                return
+            if i and job.cancelled.wait(token_interval):
+                return
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - generate_start
+            if params["stream"]:
+                self._emit(job, {"token": word if i == 0 else f" {word}"})
+        generation_time = time.perf_counter() - generate_start
+
+        stats = {
+            "input_tokens": input_tokens,
+            "output_tokens": len(words),
+            "prefill_tokens": input_tokens - tokens_saved,
+            "prefill_tokens_saved": tokens_saved,
+            "prefix_cache_s": 0.0,
+        }
+        if params["stream"]:
+            stats.update(queue_s=job.started_at - job.submitted_at, time_to_first_token_s=time_to_first_token or 0.0,
+                         generation_time_s=generation_time)
+            self._emit(job, stream_stats_payload(stats, "mock", encode_time, time.perf_counter() - start))
+        else:
+            result = {**stats, "response": " ".join(words), "batch_size": 1,
+                      "queue_s": job.started_at - job.submitted_at, "generate_s": generation_time}
+            self._emit(job, response_payload(result, "mock", encode_time, time.perf_counter() - start))
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancelled.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def openai_completion(endpoint, body, chat=False):
+    """
+    Run an OpenAI-style (chat) completion request as a job and answer in that format.
+    """
+    if chat:
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+    else:
+        prompt = body.get("prompt", "")
+    job = endpoint.submit({"prompt": prompt, "max_tokens": body.get("max_tokens", 16),
+                           "temperature": body.get("temperature", 0.7)})
+    job.done.wait()
+    output = job.items[-1] if job.items else {"error": job.error or job.status}
+    if "error" in output:
+        return 500, {"error": {"message": output["error"], "type": "server_error"}}
+
+    choice = {"index": 0, "finish_reason": "length"}
+    if chat:
+        choice["message"] = {"role": "assistant", "content": output["response"]}
+    else:
+        choice["text"] = output["response"]
+    return 200, {
+        "id": job.job_id,
+        "object": "chat.completion" if chat else "text_completion",
+        "created": int(time.time()),
+        "model": body.get("model", MODEL_NAME),
+        "choices": [choice],
+        "usage": {
+            "prompt_tokens": output["input_tokens"],
+            "completion_tokens": output["output_tokens"],
+            "total_tokens": output["input_tokens"] + output["output_tokens"],
+        },
+    }
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    endpoint = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method):
+        url = urlparse(self.path)
+        # The base URL may carry a path (e.g. /v2/<endpoint id>); only the last segments matter
+        parts = [part for part in url.path.split("/") if part]
+        if self.endpoint.reject_request():
+            return 503, {"error": "Injected gateway error (mock http_error_rate)"}
+
+        if method == "GET" and parts[-1:] == ["health"]:
+            return 200, self.endpoint.health()
+        if method == "POST" and parts[-2:] == ["v1", "completions"]:
+            return openai_completion(self.endpoint, self._body())
+        if method == "POST" and parts[-3:] == ["v1", "chat", "completions"]:
+            return openai_completion(self.endpoint, self._body(), chat=True)
+        if method == "POST" and parts[-1:] in (["run"], ["runsync"]):
+            job_input = self._body().get("input")
+            if not isinstance(job_input, dict):
+                return 400, {"error": "Request body must have an 'input' object"}
+            job = self.endpoint.submit(job_input)
+            if parts[-1] == "run":
+                return 200, {"id": job.job_id, "status": job.status}
+            # RunPod's /runsync waits up to ?wait= milliseconds, then returns the job's current status
+            wait_ms = float(parse_qs(url.query).get("wait", ["90000"])[0])
+            job.done.wait(wait_ms / 1000)
+            return 200, job.status_payload()
+
+        if len(parts) >= 2 and parts[-2] in ("status", "stream", "cancel"):
+            action, job_id = parts[-2:]
+            job = self.endpoint.cancel(job_id) if (method, action) == ("POST", "cancel") else self.endpoint.get(job_id)
+            if job is None:
+                return 404, {"error": f"Job {job_id} not found"}
+            if method == "GET" and action == "stream":
+                payload = {"id": job.job_id, "status": job.status}
+                # Read the status first, so items yielded before a final status are never missed
+                payload["stream"] = [{"output": item} for item in self.endpoint.next_stream_items(job)]
+                if job.error is not None:
+                    payload["error"] = job.error
+                return 200, payload
+            if (method, action) in (("GET", "status"), ("POST", "cancel")):
+                return 200, job.status_payload()
+        return 404, {"error": f"No route for {method} {url.path}"}
+
+    def _handle(self, method):
+        try:
+            code, payload = self._route(method)
+        except json.JSONDecodeError as e:
+            code, payload = 400, {"error": f"Invalid JSON body: {e}"}
+        self._send(code, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+def start_server(profile, host="127.0.0.1", port=0, seed=None, verbose=False):
+    """
+    Serve a mock endpoint on a background thread. Returns (server, endpoint);
+    the base URL is `f"http://{host}:{server.server_port}"`.
+    Stop it with `server.shutdown()` and `endpoint.shutdown()`.
+    """
+    endpoint = MockEndpoint(profile, seed=seed)
+    handler = type("Handler", (MockRequestHandler,), {"endpoint": endpoint, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-runpod", daemon=True).start()
+    return server, endpoint
+
+
+def add_profile_args(parser):
+    """
+    `--profile` plus one flag per Profile field, overriding the preset.
+    """
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    for profile_field in dataclasses.fields(Profile):
+        parser.add_argument(f"--{profile_field.name.replace('_', '-')}", type=profile_field.type, default=None,
+                            dest=f"profile_{profile_field.name}")
+
+
+def profile_from_args(args):
+    overrides = {
+        profile_field.name: getattr(args, f"profile_{profile_field.name}")
+        for profile_field in dataclasses.fields(Profile)
+        if getattr(args, f"profile_{profile_field.name}") is not None
+    }
+    return dataclasses.replace(PROFILES[args.profile], **overrides)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=None, help="Seed for jitter and error injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    profile = profile_from_args(args)
+    server, endpoint = start_server(profile, args.host, args.port, seed=args.seed, verbose=args.verbose)
+    print(f"Mock RunPod endpoint on http://{args.host}:{server.server_port} ({args.profile}: {profile})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        endpoint.shutdown()
+
+
+if __name__ == "__main__":
+    main()
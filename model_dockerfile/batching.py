@@ -0,0 +1,233 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import torch
+from transformers import (
+    LogitsProcessor, LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper,
+)
+
+logger = logging.getLogger(__name__)
+
+REPETITION_PENALTY = 1.1
+
+
+@dataclass
+class GenerationRequest:
+    """A single job's tokenized prompt and sampling parameters"""
+    input_ids: list
+    # Leading tokens shared with other requests (see prompting.encode_prompt)
+    prefix_length: int = 0
+    max_tokens: int = 100
+    temperature: float = 0.7
+    top_p: float = 0.95
+    top_k: int = 40
+    # perf_counter() when the request was queued, to report its queue time
+    submitted_at: float = None
+
+    def sampling_key(self):
+        """Jobs can only share a generate call if they sample the same way"""
+        return (float(self.temperature), float(self.top_p), int(self.top_k))
+
+
+class PaddedRepetitionPenalty(LogitsProcessor):
+    """
+    The repetition penalty of `generate`, counting only the tokens of each row
+    that are not padding. Padding with EOS would otherwise penalize EOS in
+    every padded row, which then ends differently than generated on its own.
+    """
+
+    def __init__(self, penalty, prompt_mask):
+        self.penalty = penalty
+        self.prompt_mask = prompt_mask
+
+    def __call__(self, input_ids, scores):
+        generated = input_ids.shape[1] - self.prompt_mask.shape[1]
+        mask = torch.nn.functional.pad(self.prompt_mask.long(), (0, generated), value=1)
+        seen = torch.zeros_like(scores, dtype=torch.long).scatter_add_(1, input_ids, mask) > 0
+        penalized = torch.where(scores < 0, scores * self.penalty, scores / self.penalty)
+        return torch.where(seen, penalized, scores)
+
+
+def sampling_processors(request, attention_mask):
+    """
+    The logits processors `generate` builds for the repetition penalty and the
+    request's sampling parameters, in the same order, with the penalty masked.
+    """
+    processors = [PaddedRepetitionPenalty(REPETITION_PENALTY, attention_mask)]
+    if request.temperature != 1.0:
+        processors.append(TemperatureLogitsWarper(request.temperature))
+    if request.top_k:
+        processors.append(TopKLogitsWarper(request.top_k))
+    if request.top_p < 1.0:
+        processors.append(TopPLogitsWarper(request.top_p))
+    return LogitsProcessorList(processors)
+
+
+class BatchScheduler:
+    """
+    Coalesce concurrent generation requests into padded batches.
+    Jobs arriving within `batch_window_ms` of the first queued job (or until
+    `max_batch_size` jobs are waiting) are left-padded into one tensor and
+    generated together on a single background thread.
+    A request generated on its own reuses the cached KV of its prompt prefix
+    when a `prefix_cache` is given (left padding would shift the prefix in a batch).
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=8, batch_window_ms=25, max_input_length=2048,
+                 prefix_cache=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.batch_window = max(0.0, batch_window_ms / 1000)
+        self.max_input_length = max_input_length
+        self.prefix_cache = prefix_cache
+
+        # Decoder-only models must be padded on the left so that every
+        # sequence's last prompt token sits right before the generated ones
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the background batching thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the batching thread once the current batch has finished"""
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, request):
+        """Queue a request and return a Future resolved with its result dict"""
+        future = Future()
+        request.submitted_at = time.perf_counter()
+        self._queue.put((request, future))
+        return future
+
+    def _collect(self):
+        """Block for the first job, then gather more until the window closes or the batch is full"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Group by sampling parameters, preserving arrival order
+            groups = {}
+            for request, future in batch:
+                groups.setdefault(request.sampling_key(), []).append((request, future))
+
+            for items in groups.values():
+                requests_, futures = zip(*items)
+                try:
+                    results = self.generate_batch(list(requests_))
+                except Exception as e:
+                    logger.error(f"Batch generation failed: {e}")
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+
+    def generate_batch(self, requests):
+        """
+        Generate all requests in a single padded `model.generate` call.
+        All requests must share the same sampling parameters.
+        """
+        tokenizer = self.tokenizer
+        first = requests[0]
+        batch_start = time.perf_counter()
+
+        encoded = tokenizer.pad(
+            {"input_ids": [r.input_ids[:self.max_input_length] for r in requests]},
+            padding=True,
+            return_tensors="pt"
+        )
+        input_ids = encoded["input_ids"].to(self.model.device)
+        attention_mask = encoded["attention_mask"].to(self.model.device)
+
+        past_key_values, tokens_saved = None, 0
+        start = time.perf_counter()
+        if self.prefix_cache is not None and len(requests) == 1:
+            past_key_values, tokens_saved = self.prefix_cache.lookup(
+                first.input_ids[:self.max_input_length], first.prefix_length
+            )
+        prefix_cache_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max(r.max_tokens for r in requests),
+                do_sample=True,
+                # Applied by sampling_processors instead, ahead of the sampling warpers
+                temperature=1.0,
+                top_p=1.0,
+                top_k=0,
+                logits_processor=sampling_processors(first, attention_mask),
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id
+            )
+        elapsed = time.perf_counter() - start
+        logger.info(f"Generated batch of {len(requests)} in {elapsed:.2f}s")
+
+        prompt_width = input_ids.shape[1]
+        results = []
+        for i, request in enumerate(requests):
+            new_tokens = outputs[i, prompt_width:][:request.max_tokens].tolist()
+
+            # Sequences that finish early are padded up to the longest one
+            output_tokens = len(new_tokens)
+            if tokenizer.eos_token_id in new_tokens:
+                output_tokens = new_tokens.index(tokenizer.eos_token_id) + 1
+
+            response = tokenizer.decode(new_tokens[:output_tokens], skip_special_tokens=True)
+            input_tokens = int(attention_mask[i].sum())
+            results.append({
+                "response": response.strip(),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "batch_size": len(requests),
+                "prefill_tokens": input_tokens - tokens_saved,
+                "prefill_tokens_saved": tokens_saved,
+                "queue_s": batch_start - request.submitted_at if request.submitted_at is not None else 0.0,
+                "prefix_cache_s": prefix_cache_time,
+                "generate_s": elapsed
+            })
+
+        return results
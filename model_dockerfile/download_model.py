@@ -1,148 +1,317 @@
 #!/usr/bin/env python3
-import subprocess
-import os
+import argparse
+import hashlib
+import http.client
+import json
 import logging
+import os
+import re
+import shutil
 import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_command(cmd, show_progress=False):
-    """Run a shell command and log output"""
-    logger.info(f"Running: {cmd}")
-    
-    if show_progress:
-        # For long-running commands, show real-time output
-        process = subprocess.Popen(
-            cmd, 
-            shell=True, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-        
-        # Print output in real-time
-        for line in iter(process.stdout.readline, ''):
-            if line.strip():
-                logger.info(f"DOWNLOAD: {line.strip()}")
-        
-        process.wait()
-        if process.returncode != 0:
-            raise RuntimeError(f"Command failed with code {process.returncode}: {cmd}")
-            
+MODEL_NAME = "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ"
+MODEL_DIR = "/models/Mistral-7B-Instruct-v0.1-GPTQ"
+MARKER_FILE = "/models/downloaded_model.txt"
+REVISIONS = ("main", "gptq-4bit-32g-actorder_True")
+
+# Hugging Face Hub (or a mirror / local stand-in serving the same API)
+HF_ENDPOINT = os.getenv("HF_ENDPOINT", "https://huggingface.co").rstrip("/")
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+# Files larger than this are fetched as several byte ranges in parallel
+SEGMENT_BYTES = int(os.getenv("DOWNLOAD_SEGMENT_MB", "256")) * 1024**2
+CHUNK_BYTES = 1024**2
+RETRIES = 5
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+def _request(url, token=None, headers=None):
+    request = urllib.request.Request(url, headers=dict(headers or {}))
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    return urllib.request.urlopen(request, timeout=60)
+
+
+def fetch_manifest(model_name, revision, token=None, endpoint=HF_ENDPOINT):
+    """
+    List the repository files with their size and checksum:
+    SHA256 for LFS files (the weights), the git blob SHA1 for small files.
+    """
+    url = f"{endpoint}/api/models/{model_name}/revision/{urllib.parse.quote(revision, safe='')}?blobs=true"
+    with _request(url, token) as response:
+        info = json.load(response)
+
+    manifest = []
+    for sibling in info.get("siblings", []):
+        lfs = sibling.get("lfs")
+        if lfs:
+            manifest.append({"name": sibling["rfilename"], "size": lfs["size"], "sha256": lfs["sha256"]})
+        else:
+            manifest.append({"name": sibling["rfilename"], "size": sibling.get("size"), "git_sha1": sibling.get("blobId")})
+    return manifest
+
+
+def file_url(model_name, revision, name, endpoint=HF_ENDPOINT):
+    return f"{endpoint}/{model_name}/resolve/{urllib.parse.quote(revision, safe='')}/{urllib.parse.quote(name)}"
+
+
+def verify_file(path, entry):
+    """
+    Check a file's size and checksum against its manifest entry.
+    """
+    if not os.path.isfile(path):
+        return False
+    size = os.path.getsize(path)
+    if entry.get("size") is not None and size != entry["size"]:
+        return False
+
+    if entry.get("sha256"):
+        digest = hashlib.sha256()
+        expected = entry["sha256"]
+    elif entry.get("git_sha1"):
+        # Git hashes a blob as "blob <size>\0<content>"
+        digest = hashlib.sha1(f"blob {size}\0".encode())
+        expected = entry["git_sha1"]
     else:
-        # For quick commands, capture all output
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        if result.stdout:
-            logger.info(f"STDOUT: {result.stdout}")
-        if result.stderr:
-            logger.warning(f"STDERR: {result.stderr}")
-        
-        if result.returncode != 0:
-            raise RuntimeError(f"Command failed with code {result.returncode}: {cmd}")
-        
-        return result
+        return True
 
-def main():
-    model_name = "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ"
-    model_dir = "/models/Mistral-7B-Instruct-v0.1-GPTQ"
-    
-    logger.info(f"Downloading pre-quantized model: {model_name}")
-    logger.info("Using huggingface-cli for reliable download (CPU-only, no GPU needed)")
-    
-    # Create models directory
-    os.makedirs("/models", exist_ok=True)
-    
-    # Remove existing directory if it exists
-    if os.path.exists(model_dir):
-        logger.info(f"Removing existing directory: {model_dir}")
-        run_command(f"rm -rf {model_dir}", show_progress=False)
-    
-    # Create the model directory
-    run_command(f"mkdir -p {model_dir}", show_progress=False)
-    
-    # Download using huggingface-cli (much more reliable than Python API)
-    download_cmd = (
-        f"huggingface-cli download {model_name} "
-        f"--local-dir {model_dir} "
-        f"--local-dir-use-symlinks False"
-    )
-    
-    try:
-        logger.info("Starting download with huggingface-cli...")
-        logger.info("This may take several minutes for a 7B model (~3-4GB)...")
-        logger.info("Download progress will be shown below:")
-        
-        # Use show_progress=True for the download command
-        run_command(download_cmd, show_progress=True)
-        logger.info("✓ Model download completed successfully!")
-        
-    except Exception as e:
-        logger.error(f"Download failed: {e}")
-        logger.info("Trying fallback download with specific branch...")
-        
-        # Try with specific branch as fallback
-        fallback_cmd = (
-            f"huggingface-cli download {model_name} "
-            f"--revision gptq-4bit-32g-actorder_True "
-            f"--local-dir {model_dir} "
-            f"--local-dir-use-symlinks False"
-        )
-        
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest() == expected
+
+
+def plan_segments(entry, segment_bytes=SEGMENT_BYTES):
+    """
+    Split a file into (start, end) byte ranges, end exclusive.
+    Files of unknown size are fetched in one piece.
+    """
+    size = entry.get("size")
+    if not size or size <= segment_bytes:
+        return [(0, size)]
+    return [(start, min(start + segment_bytes, size)) for start in range(0, size, segment_bytes)]
+
+
+def fetch_segment(url, part_path, start, end, token=None, retries=RETRIES):
+    """
+    Download bytes [start, end) of `url` into `part_path`, resuming from
+    whatever a previous attempt left there. `end` None means to the end of the file.
+    """
+    for attempt in range(1, retries + 1):
+        done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        expected = None if end is None else end - start
+        if expected is not None and done >= expected:
+            if done > expected:
+                # Server sent more than asked for; start this segment over
+                os.remove(part_path)
+                continue
+            return
+
+        headers = {}
+        if start + done > 0 or end is not None:
+            headers["Range"] = f"bytes={start + done}-" + ("" if end is None else str(end - 1))
         try:
-            logger.info("Starting fallback download...")
-            run_command(fallback_cmd, show_progress=True)
-            logger.info("✓ Fallback download completed successfully!")
-        except Exception as e2:
-            logger.error(f"Fallback download also failed: {e2}")
-            raise RuntimeError("Both primary and fallback downloads failed")
-    
-    # Verify download
-    logger.info("Verifying downloaded files...")
-    if os.path.exists(model_dir):
-        files = os.listdir(model_dir)
-        logger.info(f"Downloaded files: {files}")
-        
-        # Check for required files
-        required_files = ["config.json", "tokenizer.json", "quantize_config.json"]
-        missing_files = []
-        
-        for file in required_files:
-            if file in files:
-                logger.info(f"✓ {file} found")
-            else:
-                missing_files.append(file)
-                logger.warning(f"⚠ {file} not found")
-        
-        # Check for model weight files
-        weight_files = [f for f in files if f.endswith(('.safetensors', '.bin'))]
-        if weight_files:
-            logger.info(f"✓ Model weights found: {weight_files}")
+            with _request(url, token, headers) as response:
+                if headers and response.status != 206:
+                    # Range ignored: the body is the whole file
+                    if start > 0:
+                        raise DownloadError(f"Server does not support ranges for {url}")
+                    done = 0
+                with open(part_path, "ab" if done else "wb") as f:
+                    for block in iter(lambda: response.read(CHUNK_BYTES), b""):
+                        f.write(block)
+            if end is None:
+                return
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            if isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429:
+                # Bad URL, revision or token: another attempt gets the same answer
+                raise DownloadError(f"Failed to download {url} [{start}, {end}): {e}") from e
+            if attempt == retries:
+                raise DownloadError(f"Failed to download {url} [{start}, {end}): {e}") from e
+            logger.warning(f"Retrying {os.path.basename(part_path)} after error: {e}")
+            time.sleep(min(2 ** attempt, 30))
+    raise DownloadError(f"Could not complete {url} [{start}, {end})")
+
+
+def assemble(path, part_paths):
+    """
+    Concatenate segment files into `path` atomically and remove them.
+    """
+    tmp_path = f"{path}.incomplete"
+    with open(tmp_path, "wb") as out:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, out, CHUNK_BYTES)
+    os.replace(tmp_path, path)
+    for part_path in part_paths:
+        os.remove(part_path)
+
+
+def part_paths(path, entry, n_segments):
+    """
+    Segment file names for `path`. They carry the expected checksum, so a
+    resume never reuses bytes of another revision or of an older upstream file.
+    """
+    tag = (entry.get("sha256") or entry.get("git_sha1") or "nochecksum")[:16]
+    return [f"{path}.{tag}.part{i}" for i in range(n_segments)]
+
+
+def remove_stale_parts(path, keep):
+    """
+    Delete segment files left for `path` by downloads of other checksums.
+    """
+    directory, name = os.path.split(path)
+    pattern = re.compile(rf"{re.escape(name)}(\.\w+)?\.part\d+")
+    for filename in os.listdir(directory):
+        part_path = os.path.join(directory, filename)
+        if pattern.fullmatch(filename) and part_path not in keep:
+            os.remove(part_path)
+
+
+def fetch_all(jobs, token=None, workers=DOWNLOAD_WORKERS):
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download") as pool:
+        futures = [pool.submit(fetch_segment, url, part, start, end, token) for url, part, start, end in jobs]
+        for future in futures:
+            future.result()
+
+
+def download_files(model_name, revision, model_dir, manifest, token=None, workers=DOWNLOAD_WORKERS,
+                   endpoint=HF_ENDPOINT, segment_bytes=SEGMENT_BYTES):
+    """
+    Download the manifest's files into `model_dir`.
+    - Files already present with the right checksum are skipped.
+    - Large files are split into byte ranges; all ranges of all files share one worker pool.
+    - Interrupted ranges resume from their `.part` files on the next run.
+    - A file failing its checksum is downloaded again from scratch, once.
+    Returns (downloaded, skipped) file names.
+    """
+    todo, skipped = [], []
+    for entry in manifest:
+        path = os.path.join(model_dir, entry["name"])
+        if verify_file(path, entry):
+            skipped.append(entry["name"])
         else:
-            logger.warning("⚠ No model weight files found")
-        
-        # Create marker file with model info
-        marker_file = "/models/downloaded_model.txt"
-        with open(marker_file, "w") as f:
-            f.write(f"{model_name}\n")
-            f.write(f"local_path: {model_dir}\n")
-            f.write(f"files: {', '.join(files)}\n")
-        
-        logger.info(f"✓ Model marker created: {marker_file}")
-        
-        if missing_files:
-            logger.warning(f"Some files missing: {missing_files}")
+            todo.append(entry)
+    logger.info(f"{len(skipped)} files already valid, {len(todo)} to download")
+
+    jobs = {}
+    for entry in todo:
+        path = os.path.join(model_dir, entry["name"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        segments = plan_segments(entry, segment_bytes)
+        parts = part_paths(path, entry, len(segments))
+        remove_stale_parts(path, keep=parts)
+        url = file_url(model_name, revision, entry["name"], endpoint)
+        jobs[entry["name"]] = [(url, part_path, start, end) for (start, end), part_path in zip(segments, parts)]
+
+    start_time = time.perf_counter()
+    fetch_all([job for file_jobs in jobs.values() for job in file_jobs], token, workers)
+
+    total_bytes = 0
+    for entry in todo:
+        path = os.path.join(model_dir, entry["name"])
+        file_jobs = jobs[entry["name"]]
+        assemble(path, [part_path for _, part_path, _, _ in file_jobs])
+        if not verify_file(path, entry):
+            # The parts are gone after assembly, so this starts over
+            os.remove(path)
+            logger.warning(f"Checksum mismatch for {entry['name']}; downloading it again")
+            fetch_all(file_jobs, token, workers)
+            assemble(path, [part_path for _, part_path, _, _ in file_jobs])
+            if not verify_file(path, entry):
+                os.remove(path)
+                raise DownloadError(f"Checksum mismatch for {entry['name']}")
+        total_bytes += os.path.getsize(path)
+        logger.info(f"✓ {entry['name']} verified")
+
+    elapsed = time.perf_counter() - start_time
+    if total_bytes:
+        logger.info(f"Downloaded {total_bytes / 1024**2:.1f} MB in {elapsed:.1f}s "
+                    f"({total_bytes / 1024**2 / max(elapsed, 1e-9):.1f} MB/s)")
+    return [entry["name"] for entry in todo], skipped
+
+
+def write_marker(marker_file, model_name, model_dir, files):
+    """
+    Write the marker read by the worker (see startup.find_model_path) atomically.
+    """
+    tmp_path = f"{marker_file}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(f"{model_name}\n")
+        f.write(f"local_path: {model_dir}\n")
+        f.write(f"files: {', '.join(files)}\n")
+    os.replace(tmp_path, marker_file)
+
+
+def check_files(model_dir):
+    files = sorted(os.listdir(model_dir))
+    logger.info(f"Downloaded files: {files}")
+
+    # Check for required files
+    required_files = ["config.json", "tokenizer.json", "quantize_config.json"]
+    missing_files = [file for file in required_files if file not in files]
+    for file in required_files:
+        if file in files:
+            logger.info(f"✓ {file} found")
         else:
-            logger.info("✓ All required files present!")
-            
+            logger.warning(f"⚠ {file} not found")
+
+    # Check for model weight files
+    weight_files = [f for f in files if f.endswith(('.safetensors', '.bin'))]
+    if weight_files:
+        logger.info(f"✓ Model weights found: {weight_files}")
+    else:
+        logger.warning("⚠ No model weight files found")
+
+    if missing_files:
+        logger.warning(f"Some files missing: {missing_files}")
     else:
-        raise RuntimeError(f"Model directory not found: {model_dir}")
-    
-    logger.info("Pre-quantized model download completed successfully!")
+        logger.info("✓ All required files present!")
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the pre-quantized model with resume and checksum checks.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--marker", default=MARKER_FILE)
+    parser.add_argument("--revision", action="append", help="Revision(s) to try in order")
+    parser.add_argument("--endpoint", default=HF_ENDPOINT)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    args = parser.parse_args()
+
+    token = os.getenv("HF_TOKEN") or None
+    os.makedirs(args.model_dir, exist_ok=True)
+    logger.info(f"Downloading pre-quantized model: {args.model}")
+
+    for revision in args.revision or REVISIONS:
+        try:
+            manifest = fetch_manifest(args.model, revision, token, args.endpoint)
+            logger.info(f"Revision {revision}: {len(manifest)} files")
+            download_files(args.model, revision, args.model_dir, manifest, token=token,
+                           workers=args.workers, endpoint=args.endpoint)
+            break
+        except (DownloadError, urllib.error.URLError, OSError) as e:
+            logger.error(f"Download of revision {revision} failed: {e}")
+    else:
+        logger.error("All revisions failed; partial files are kept for the next attempt")
+        sys.exit(1)
+
+    files = check_files(args.model_dir)
+    write_marker(args.marker, args.model, args.model_dir, files)
+    logger.info(f"✓ Model marker created: {args.marker}")
     logger.info("Model ready for GPU loading at runtime")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,147 +1,159 @@
 import runpod
-from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 import os
+import asyncio
 import logging
+import threading
+import time
+from batching import BatchScheduler, GenerationRequest
+from prefix_cache import PrefixCache
+from prompting import encode_prompt, prompt_parts
+from schema import job_params, response_payload, stream_stats_payload
+from startup import StartupProfiler, emit_report, load_model, warm_up
+from streaming import stream_generate
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_model_path():
-    """Find the downloaded model path"""
-    # First check for the direct download path
-    direct_path = "/models/Mistral-7B-Instruct-v0.1-GPTQ"
-    if os.path.exists(direct_path) and os.path.exists(os.path.join(direct_path, "config.json")):
-        logger.info(f"Found model at direct path: {direct_path}")
-        return direct_path
-    
-    # Check marker file
-    marker_file = "/models/downloaded_model.txt"
-    if os.path.exists(marker_file):
-        with open(marker_file, "r") as f:
-            content = f.read().strip()
-            for line in content.split('\n'):
-                if line.startswith('local_path:'):
-                    path = line.split('local_path:')[1].strip()
-                    if os.path.exists(path):
-                        logger.info(f"Found model from marker: {path}")
-                        return path
-    
-    # Fallback: search for any config.json
-    for root, dirs, files in os.walk("/models"):
-        if "config.json" in files and "quantize_config.json" in files:
-            logger.info(f"Found quantized model at: {root}")
-            return root
-    
-    # If nothing found locally, use the model name (will download at runtime)
-    model_name = "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ"
-    logger.info(f"No local model found, will use: {model_name}")
-    return model_name
+# Request coalescing: jobs arriving within BATCH_WINDOW_MS are generated together
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "25"))
 
-def load_model():
-    """Load the pre-quantized GPTQ model"""
-    model_path = find_model_path()
-    
-    logger.info(f"Loading pre-quantized GPTQ model from: {model_path}")
-    
-    # Load tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(
-        model_path,
-        trust_remote_code=False,  # As per TheBloke's docs
-        use_fast=True
-    )
-    
-    # Set pad token if not exists
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
-    
-    # Load the pre-quantized model
-    # Note: No quantization_config needed - it's already quantized
-    model = AutoModelForCausalLM.from_pretrained(
-        model_path,
-        device_map="auto",
-        trust_remote_code=False,  # As per TheBloke's docs
-        revision="main"  # Use main branch
-    )
-    
-    logger.info("Pre-quantized GPTQ model loaded successfully!")
-    logger.info(f"Model device: {model.device}")
-    logger.info(f"Model dtype: {model.dtype}")
-    
-    if torch.cuda.is_available():
-        logger.info(f"GPU Memory usage: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
-        logger.info(f"GPU Memory reserved: {torch.cuda.memory_reserved() / 1024**3:.2f} GB")
-    
-    return model, tokenizer
+# Streamed jobs generate one by one, outside the batch scheduler; cap how many
+# run on the GPU at once, the others wait their turn
+MAX_CONCURRENT_STREAMS = int(os.getenv("MAX_CONCURRENT_STREAMS", "2"))
 
-# Load model at startup
+# Prompts are truncated to this many tokens
+MAX_INPUT_LENGTH = 2048
+# Reuse the attention KV of the shared instruction preamble; set to "0" to disable
+PREFIX_CACHE = os.getenv("PREFIX_CACHE", "1") != "0"
+
+# Load and warm up the model at startup, before accepting jobs
 logger.info("Loading model at startup...")
-model, tokenizer = load_model()
+profiler = StartupProfiler()
+model, tokenizer = load_model(profiler)
+
+prefix_cache = PrefixCache(model) if PREFIX_CACHE else None
+warm_up(model, tokenizer, profiler, prefix_cache=prefix_cache)
+startup_report = profiler.report(device=str(model.device))
+emit_report(startup_report)
 logger.info("Model loaded and ready for inference!")
 
-def handler(job):
-    """Handle inference requests"""
+scheduler = BatchScheduler(
+    model,
+    tokenizer,
+    max_batch_size=MAX_BATCH_SIZE,
+    batch_window_ms=BATCH_WINDOW_MS,
+    max_input_length=MAX_INPUT_LENGTH,
+    prefix_cache=prefix_cache
+)
+if MAX_BATCH_SIZE > 1:
+    scheduler.start()
+    logger.info(f"Batching enabled (max batch size: {MAX_BATCH_SIZE}, window: {BATCH_WINDOW_MS}ms)")
+
+stream_slots = asyncio.Semaphore(max(1, MAX_CONCURRENT_STREAMS))
+
+async def handler(job):
+    """
+    Handle inference requests.
+    RAG jobs send `question` and `context` and the worker applies the prompt
+    template (see prompting.py); raw jobs send a `prompt`.
+    This is a generator handler: with `"stream": true` in the input it yields
+    `{"token": ...}` pieces followed by a stats dict, otherwise it yields the
+    full response dict once.
+    Both end with a `timings` dict of per-stage seconds for client-side tracing.
+    """
+    start = time.perf_counter()
     try:
         inputs = job["input"]
-        prompt = inputs.get("prompt", "")
-        max_tokens = inputs.get("max_tokens", 100)
-        temperature = inputs.get("temperature", 0.7)
-        top_p = inputs.get("top_p", 0.95)
-        top_k = inputs.get("top_k", 40)
-        
-        if not prompt:
-            return {"error": "Empty prompt provided"}
-        
-        logger.info(f"Processing prompt (length: {len(prompt)} chars)")
+        try:
+            params = job_params(inputs)
+        except ValueError as e:
+            yield {"error": str(e)}
+            return
+        max_tokens, stream = params["max_tokens"], params["stream"]
         
         # Format prompt according to Mistral's instruction format
         # As shown in TheBloke's documentation
-        prompt_template = f"<s>[INST] {prompt} [/INST]\n"
+        prefix, suffix = prompt_parts(inputs)
+        input_ids, prefix_length = encode_prompt(tokenizer, prefix, suffix, max_length=MAX_INPUT_LENGTH)
+        encode_time = time.perf_counter() - start
+        logger.info(f"Processing prompt ({len(input_ids)} tokens, stream: {stream})")
         
-        # Tokenize input
-        input_ids = tokenizer(
-            prompt_template, 
-            return_tensors="pt",
-            truncation=True,
-            max_length=2048
-        ).input_ids.to(model.device)
+        request = GenerationRequest(
+            input_ids=input_ids,
+            prefix_length=prefix_length,
+            max_tokens=max_tokens,
+            temperature=params["temperature"],
+            top_p=params["top_p"],
+            top_k=params["top_k"]
+        )
         
-        # Generate response
-        with torch.no_grad():
-            outputs = model.generate(
-                inputs=input_ids,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                do_sample=True,
-                top_p=top_p,
-                top_k=top_k,
-                repetition_penalty=1.1,
-                pad_token_id=tokenizer.eos_token_id,
-                eos_token_id=tokenizer.eos_token_id
-            )
+        if stream:
+            queued_at = time.perf_counter()
+            async with stream_slots:
+                queue_time = time.perf_counter() - queued_at
+                stop = threading.Event()
+                pieces = stream_generate(
+                    model, tokenizer, request, max_input_length=MAX_INPUT_LENGTH, prefix_cache=prefix_cache,
+                    stop_event=stop
+                )
+                step = None
+                try:
+                    while True:
+                        # Pull each decoded piece off the streamer without blocking the event loop;
+                        # shielded, so a cancelled job can still wait for the pull below
+                        step = asyncio.ensure_future(asyncio.to_thread(next, pieces, None))
+                        piece = await asyncio.shield(step)
+                        if piece is None:
+                            break
+                        if isinstance(piece, str):
+                            yield {"token": piece}
+                        else:
+                            logger.info("Response streamed successfully")
+                            yield stream_stats_payload(
+                                {**piece, "queue_s": queue_time}, str(model.device), encode_time,
+                                time.perf_counter() - start
+                            )
+                finally:
+                    # A cancelled or disconnected job keeps its slot until its generation has stopped
+                    stop.set()
+                    if step is not None and not step.done():
+                        await asyncio.wait([step])
+                    await asyncio.to_thread(pieces.close)
+            return
         
-        # Decode only the new tokens (excluding input)
-        response = tokenizer.decode(
-            outputs[0][input_ids.shape[1]:], 
-            skip_special_tokens=True
-        )
+        # Generate response, coalesced with other in-flight jobs when batching is on
+        if MAX_BATCH_SIZE > 1:
+            result = await asyncio.wrap_future(scheduler.submit(request))
+        else:
+            # Off the event loop, so other jobs' streams keep flowing meanwhile
+            result = (await asyncio.to_thread(scheduler.generate_batch, [request]))[0]
         
         logger.info("Response generated successfully")
         
-        return {
-            "response": response.strip(),
-            "model": "Mistral-7B-Instruct-GPTQ-4bit",
-            "device": str(model.device),
-            "memory_usage_gb": torch.cuda.memory_allocated() / 1024**3 if torch.cuda.is_available() else 0,
-            "input_tokens": input_ids.shape[1],
-            "output_tokens": outputs[0].shape[0] - input_ids.shape[1],
-            "prompt_template_used": True
-        }
+        memory_usage_gb = torch.cuda.memory_allocated() / 1024**3 if torch.cuda.is_available() else 0
+        yield response_payload(
+            result, str(model.device), encode_time, time.perf_counter() - start, memory_usage_gb=memory_usage_gb
+        )
         
     except Exception as e:
         logger.error(f"Error in handler: {str(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return {"error": str(e)}
+        yield {"error": str(e)}
+
+def concurrency_modifier(current_concurrency):
+    """
+    Let RunPod hand us as many concurrent jobs as one batch can hold.
+    Streamed jobs beyond MAX_CONCURRENT_STREAMS wait for a slot.
+    """
+    return MAX_BATCH_SIZE
 
-runpod.serverless.start({"handler": handler})
\ No newline at end of file
+if __name__ == "__main__":
+    runpod.serverless.start({
+        "handler": handler,
+        "concurrency_modifier": concurrency_modifier,
+        # Also expose the yielded items as the job output for /run and /runsync
+        "return_aggregate_stream": True
+    })
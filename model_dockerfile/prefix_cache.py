@@ -0,0 +1,67 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+from transformers import DynamicCache
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixCache:
+    """
+    Attention KV cache of shared prompt prefixes (e.g. the RAG instructions).
+    The KV of a prefix is computed once; each request gets its own copy to
+    extend, so `generate` only prefills the tokens after the prefix.
+    Prefixes shorter than `min_tokens` are not worth caching. At most
+    `max_entries` prefixes are kept, least recently used evicted first.
+    """
+
+    def __init__(self, model, max_entries=4, min_tokens=16):
+        self.model = model
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def lookup(self, input_ids, prefix_length):
+        """
+        Return (past_key_values, tokens_saved) for a prompt whose first
+        `prefix_length` tokens are the shared prefix, or (None, 0) if the
+        prefix is not cacheable. The returned cache is a private copy;
+        `tokens_saved` is 0 when the prefix had to be computed for this request.
+        """
+        # generate needs at least one uncached token to produce logits from
+        if prefix_length < self.min_tokens or prefix_length >= len(input_ids):
+            return None, 0
+
+        key = tuple(input_ids[:prefix_length])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._compute(key)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                saved = 0
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                saved = prefix_length
+            self.tokens_saved += saved
+            return copy.deepcopy(entry), saved
+
+    def _compute(self, prefix_ids):
+        ids = torch.tensor([prefix_ids], device=self.model.device)
+        with torch.no_grad():
+            outputs = self.model(input_ids=ids, past_key_values=DynamicCache(), use_cache=True)
+        logger.info(f"Cached KV for a {len(prefix_ids)}-token prompt prefix")
+        return outputs.past_key_values
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "tokens_saved": self.tokens_saved}
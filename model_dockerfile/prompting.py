@@ -0,0 +1,40 @@
+# Instructions shared by every RAG request. The worker owns the prompt
+# template: clients send the question and retrieved context separately.
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions based on the provided context. "
+    "Use only the information given in the context to answer the question. "
+    "If the context doesn't contain enough information, say so clearly."
+)
+
+
+def prompt_parts(inputs):
+    """
+    Split a job's prompt into (prefix, suffix) text in Mistral's instruction format.
+    The prefix is identical across requests of the same kind, so its attention
+    KV can be computed once and reused.
+    - RAG jobs send `question` and `context`.
+    - Raw jobs send `prompt`; a prompt that already carries the template
+      (starts with "<s>[INST]", as older clients sent it) is used as is.
+    The BOS token is added by the tokenizer, never as text.
+    """
+    if "question" in inputs:
+        prefix = f"[INST] {SYSTEM_PROMPT}\n\n"
+        suffix = f"Context:\n{inputs.get('context') or ''}\n\nQuestion: {inputs['question']} [/INST]"
+        return prefix, suffix
+
+    prompt = inputs.get("prompt", "").strip()
+    if prompt.startswith("<s>"):
+        return "", prompt[len("<s>"):].lstrip()
+    return "[INST] ", f"{prompt} [/INST]\n"
+
+
+def encode_prompt(tokenizer, prefix, suffix, max_length=2048):
+    """
+    Tokenize the prefix (with BOS) and suffix separately and concatenate them,
+    so the prefix tokens are the same for every request whatever follows.
+    Returns (input_ids, prefix_length); the prompt is cut to `max_length` tokens.
+    """
+    prefix_ids = tokenizer(prefix, add_special_tokens=True).input_ids
+    suffix_ids = tokenizer(suffix, add_special_tokens=False).input_ids
+    input_ids = (prefix_ids + suffix_ids)[:max_length]
+    return input_ids, min(len(prefix_ids), len(input_ids))
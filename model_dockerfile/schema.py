@@ -0,0 +1,68 @@
+MODEL_NAME = "Mistral-7B-Instruct-GPTQ-4bit"
+
+# Sampling defaults for fields a job leaves out
+DEFAULT_PARAMS = {
+    "max_tokens": 100,
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "stream": False
+}
+
+
+def job_params(inputs):
+    """
+    Generation parameters of a job's input, with defaults for missing fields.
+    Raises ValueError when the job has neither a `prompt` nor a `question`.
+    Shared by the worker and the mock server (benchmarks/mock_runpod.py), so
+    both accept exactly the same input.
+    """
+    if not inputs.get("prompt") and not inputs.get("question"):
+        raise ValueError("Empty prompt provided")
+    return {name: inputs.get(name, default) for name, default in DEFAULT_PARAMS.items()}
+
+
+def response_payload(result, device, encode_time, total_time, memory_usage_gb=0):
+    """
+    The dict a non-streaming job yields, from a generation result
+    (see BatchScheduler.generate_batch).
+    """
+    return {
+        "response": result["response"],
+        "model": MODEL_NAME,
+        "device": device,
+        "memory_usage_gb": memory_usage_gb,
+        "input_tokens": result["input_tokens"],
+        "output_tokens": result["output_tokens"],
+        "batch_size": result["batch_size"],
+        "prefill_tokens": result["prefill_tokens"],
+        "prefill_tokens_saved": result["prefill_tokens_saved"],
+        "prompt_template_used": True,
+        "timings": {
+            "encode_s": encode_time,
+            "queue_s": result["queue_s"],
+            "prefix_cache_s": result["prefix_cache_s"],
+            "generate_s": result["generate_s"],
+            "total_s": total_time
+        }
+    }
+
+
+def stream_stats_payload(stats, device, encode_time, total_time):
+    """
+    The final dict a streaming job yields after its `{"token": ...}` pieces,
+    from the stats of stream_generate.
+    """
+    return {
+        "model": MODEL_NAME,
+        "device": device,
+        **stats,
+        "timings": {
+            "encode_s": encode_time,
+            "queue_s": stats.get("queue_s", 0.0),
+            "prefix_cache_s": stats["prefix_cache_s"],
+            "time_to_first_token_s": stats["time_to_first_token_s"],
+            "generate_s": stats["generation_time_s"],
+            "total_s": total_time
+        }
+    }
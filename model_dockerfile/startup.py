@@ -0,0 +1,203 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import time
+from contextlib import contextmanager
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from prompting import encode_prompt, prompt_parts
+
+logger = logging.getLogger(__name__)
+
+# Local model directory or hub name; overrides the search under /models
+# (e.g. a tiny model to profile start-up on CPU)
+MODEL_PATH = os.getenv("MODEL_PATH")
+# Warm-up generate calls run before the worker accepts jobs (0 disables)
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "1"))
+WARMUP_MAX_TOKENS = int(os.getenv("WARMUP_MAX_TOKENS", "16"))
+# Also write the startup report to this JSON file
+STARTUP_REPORT_PATH = os.getenv("STARTUP_REPORT_PATH")
+
+
+class StartupProfiler:
+    """
+    Time named start-up steps and collect them in a structured report.
+    GPU memory is recorded after each step when CUDA is available.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def step(self, name, **details):
+        start = time.perf_counter()
+        record = {"step": name, **details}
+        try:
+            yield record
+        finally:
+            # Wait for the step's queued GPU work (e.g. `.to("cuda")`) before reading the clock
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            record["seconds"] = time.perf_counter() - start
+            if torch.cuda.is_available():
+                record["gpu_allocated_gb"] = torch.cuda.memory_allocated() / 1024**3
+                record["gpu_reserved_gb"] = torch.cuda.memory_reserved() / 1024**3
+            self.steps.append(record)
+            logger.info(f"Startup step '{name}' took {record['seconds']:.2f}s")
+
+    def report(self, **extra):
+        return {
+            "total_seconds": time.perf_counter() - self._start,
+            "steps": self.steps,
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cuda": torch.cuda.is_available(),
+            **extra,
+        }
+
+
+def find_model_path():
+    """Find the downloaded model path"""
+    if MODEL_PATH:
+        logger.info(f"Using MODEL_PATH: {MODEL_PATH}")
+        return MODEL_PATH
+
+    # First check for the direct download path
+    direct_path = "/models/Mistral-7B-Instruct-v0.1-GPTQ"
+    if os.path.exists(direct_path) and os.path.exists(os.path.join(direct_path, "config.json")):
+        logger.info(f"Found model at direct path: {direct_path}")
+        return direct_path
+
+    # Check marker file
+    marker_file = "/models/downloaded_model.txt"
+    if os.path.exists(marker_file):
+        with open(marker_file, "r") as f:
+            content = f.read().strip()
+            for line in content.split('\n'):
+                if line.startswith('local_path:'):
+                    path = line.split('local_path:')[1].strip()
+                    if os.path.exists(path):
+                        logger.info(f"Found model from marker: {path}")
+                        return path
+
+    # Fallback: search for any config.json
+    for root, dirs, files in os.walk("/models"):
+        if "config.json" in files and "quantize_config.json" in files:
+            logger.info(f"Found quantized model at: {root}")
+            return root
+
+    # If nothing found locally, use the model name (will download at runtime)
+    model_name = "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ"
+    logger.info(f"No local model found, will use: {model_name}")
+    return model_name
+
+
+def load_model(profiler=None):
+    """Load the pre-quantized GPTQ model, timing each step"""
+    profiler = profiler or StartupProfiler()
+
+    with profiler.step("resolve_model_path") as record:
+        model_path = find_model_path()
+        record["model_path"] = model_path
+
+    logger.info(f"Loading pre-quantized GPTQ model from: {model_path}")
+
+    # Load tokenizer
+    with profiler.step("load_tokenizer"):
+        tokenizer = AutoTokenizer.from_pretrained(
+            model_path,
+            trust_remote_code=False,  # As per TheBloke's docs
+            use_fast=True
+        )
+
+    # Set pad token if not exists
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    # Left padding keeps batched prompts adjacent to their generated tokens
+    tokenizer.padding_side = "left"
+
+    # Load the pre-quantized model
+    # Note: No quantization_config needed - it's already quantized
+    with profiler.step("load_weights") as record:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_path,
+            # device_map needs accelerate, which CPU-only profiling runs can do without
+            device_map="auto" if torch.cuda.is_available() else None,
+            trust_remote_code=False,  # As per TheBloke's docs
+            revision="main"  # Use main branch
+        )
+        model.eval()
+        record["parameters"] = sum(p.numel() for p in model.parameters())
+
+    logger.info("Pre-quantized GPTQ model loaded successfully!")
+    logger.info(f"Model device: {model.device}")
+    logger.info(f"Model dtype: {model.dtype}")
+
+    return model, tokenizer
+
+
+def warm_up(model, tokenizer, profiler, iterations=WARMUP_ITERATIONS, max_tokens=WARMUP_MAX_TOKENS,
+            prefix_cache=None):
+    """
+    Run a forward pass and `iterations` short generate calls on a RAG-shaped
+    prompt, so CUDA kernels and the allocator are warmed up before the first
+    job (and the instruction prefix is in `prefix_cache`).
+    """
+    inputs = {"question": "What is this document about?", "context": "A short warm-up document."}
+    input_ids, prefix_length = encode_prompt(tokenizer, *prompt_parts(inputs))
+    ids = torch.tensor([input_ids], device=model.device)
+
+    with profiler.step("first_forward", input_tokens=len(input_ids)):
+        with torch.no_grad():
+            model(input_ids=ids)
+
+    if prefix_cache is not None:
+        with profiler.step("prefix_cache", prefix_tokens=prefix_length):
+            prefix_cache.lookup(input_ids, prefix_length)
+
+    for i in range(iterations):
+        with profiler.step(f"warmup_generate_{i + 1}", max_new_tokens=max_tokens):
+            with torch.no_grad():
+                model.generate(
+                    input_ids=ids,
+                    attention_mask=torch.ones_like(ids),
+                    max_new_tokens=max_tokens,
+                    min_new_tokens=max_tokens,
+                    do_sample=True,
+                    pad_token_id=tokenizer.pad_token_id,
+                    eos_token_id=tokenizer.eos_token_id
+                )
+
+
+def emit_report(report, path=STARTUP_REPORT_PATH):
+    """Log the startup report as one JSON line, and write it to `path` if set"""
+    logger.info(f"Startup report: {json.dumps(report)}")
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    """Profile start-up without serving, e.g. `MODEL_PATH=/tmp/tiny python startup.py`"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--warmup-iterations", type=int, default=WARMUP_ITERATIONS)
+    parser.add_argument("--warmup-max-tokens", type=int, default=WARMUP_MAX_TOKENS)
+    parser.add_argument("--json", default=STARTUP_REPORT_PATH, help="Write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    profiler = StartupProfiler()
+    model, tokenizer = load_model(profiler)
+    warm_up(model, tokenizer, profiler, iterations=args.warmup_iterations, max_tokens=args.warmup_max_tokens)
+    report = profiler.report(device=str(model.device))
+    emit_report(report, args.json)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+logger = logging.getLogger(__name__)
+
+
+class StopEvent(StoppingCriteria):
+    """
+    Stops generation once the event is set, e.g. when the client went away.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def stream_generate(model, tokenizer, request, max_input_length=2048, timeout=120, prefix_cache=None,
+                    stop_event=None):
+    """
+    Generate a single request on a background thread and yield text pieces
+    as soon as the TextIteratorStreamer decodes them.
+    With a `prefix_cache`, only the tokens after the shared prompt prefix are prefilled.
+    The last item yielded is a stats dict with token counts and timings.
+    Setting `stop_event` stops the generation at the next token; closing the
+    generator sets it and returns once the generation thread has ended.
+    """
+    stop_event = stop_event or threading.Event()
+    start = time.perf_counter()
+    prompt_ids = request.input_ids[:max_input_length]
+    input_ids = torch.tensor([prompt_ids], device=model.device)
+
+    past_key_values, tokens_saved = None, 0
+    if prefix_cache is not None:
+        past_key_values, tokens_saved = prefix_cache.lookup(prompt_ids, request.prefix_length)
+    prefix_cache_time = time.perf_counter() - start
+
+    streamer = TextIteratorStreamer(
+        tokenizer,
+        skip_prompt=True,
+        skip_special_tokens=True,
+        timeout=timeout
+    )
+    result = {}
+
+    def _generate():
+        try:
+            with torch.no_grad():
+                result["outputs"] = model.generate(
+                    inputs=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    max_new_tokens=request.max_tokens,
+                    temperature=request.temperature,
+                    do_sample=True,
+                    top_p=request.top_p,
+                    top_k=request.top_k,
+                    repetition_penalty=1.1,
+                    pad_token_id=tokenizer.pad_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopEvent(stop_event)])
+                )
+        except Exception as e:
+            result["error"] = e
+            # Unblock the consumer, which would otherwise wait for the timeout
+            streamer.end()
+
+    thread = threading.Thread(target=_generate, name="stream-generate", daemon=True)
+    thread.start()
+
+    time_to_first_token = None
+    try:
+        for text in streamer:
+            if not text:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+            yield text
+    finally:
+        # A consumer that stops early must not leave the generation running on the GPU
+        stop_event.set()
+        thread.join()
+    if "error" in result:
+        raise result["error"]
+
+    yield {
+        "input_tokens": input_ids.shape[1],
+        "output_tokens": result["outputs"][0].shape[0] - input_ids.shape[1],
+        "prefill_tokens": input_ids.shape[1] - tokens_saved,
+        "prefill_tokens_saved": tokens_saved,
+        "prefix_cache_s": prefix_cache_time,
+        "time_to_first_token_s": time_to_first_token,
+        "generation_time_s": time.perf_counter() - start
+    }
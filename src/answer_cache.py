@@ -0,0 +1,151 @@
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+
+# Rough per-entry bookkeeping cost (entry object, dict slots, key tuple)
+ENTRY_OVERHEAD_BYTES = 256
+
+
+@dataclass
+class CacheEntry:
+    key: tuple
+    embedding: np.ndarray
+    answer: str
+    size: int
+    created: float
+
+
+class AnswerCache:
+    """
+    Cache of generated answers keyed on the retrieved chunk IDs plus the
+    generation parameters.
+    Within a key, an entry is reused when the new query's embedding is within
+    `similarity_threshold` (cosine) of the cached query, so near-identical
+    questions over the same context skip the GPU round-trip entirely.
+    Entries are evicted LRU once `max_entries` or `max_bytes` is exceeded,
+    and expire after `ttl` seconds.
+    """
+
+    def __init__(self, similarity_threshold=0.95, max_entries=256, max_bytes=16 * 1024**2, ttl=3600):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # entry id -> CacheEntry, least recently used first
+        self._by_key = {}  # key -> list of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(chunk_ids, **generation_params):
+        """
+        Build a cache key from retrieved chunk IDs and generation parameters.
+        """
+        return (tuple(chunk_ids), tuple(sorted(generation_params.items())))
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, key, query_embedding):
+        """
+        Return the cached answer for the most similar query under `key`,
+        or None if no entry is within the similarity threshold.
+        """
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_similarity = None, -1.0
+            for entry_id in list(self._by_key.get(key, [])):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(np.dot(query, entry.embedding))
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            if best_similarity < 1.0 - 1e-6:
+                self.semantic_hits += 1
+            return self._entries[best_id].answer
+
+    def put(self, key, query_embedding, answer):
+        """
+        Store an answer for a query under `key`.
+        """
+        embedding = self._normalize(query_embedding)
+        size = len(answer.encode("utf-8")) + embedding.nbytes + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = CacheEntry(key, embedding, answer, size, time.monotonic())
+            self._by_key.setdefault(key, []).append(entry_id)
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        self.bytes -= entry.size
+        ids = self._by_key[entry.key]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_key[entry.key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Hit/miss counters and current memory usage.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+        }
+
+
+@st.cache_resource
+def get_answer_cache():
+    """
+    Get the process-wide answer cache, shared by all sessions. Chunk IDs are
+    derived from the file name and chunk content, so sessions that uploaded
+    the same documents reuse each other's answers.
+    """
+    return AnswerCache()
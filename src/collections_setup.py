@@ -1,107 +1,570 @@
-import chromadb
 import streamlit as st
-import fitz 
 import os
-from chromadb.utils import embedding_functions
-from text_processing import lines_chunking, paragraphs_chunking
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from extraction import SUPPORTED_TYPES, iter_file_text
+from ingestion_service import QUEUED, IngestionService
+from session_memory import PENDING, INDEXING
+from tenant_store import TenantStore
+from tracing import get_tracer
+from text_processing import iter_lines_chunking, iter_text_lines, content_hash
+from token_chunking import iter_token_chunking, load_tokenizer
+
+# Chunks embedded per call; bounds peak memory during ingestion
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# "tokens" chunks on real model tokens with overlap, "words" keeps the 200-word chunker
+CHUNKING = os.getenv("CHUNKING", "tokens")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_MAX_WORDS = 200
+
+# "torch" runs the Sentence Transformer in PyTorch; "onnx" / "onnx-int8" run an
+# export of the same model (see onnx_embedding.py) with ONNX Runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+
+# Persistent embedding cache, disabled unless a path is configured
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+# Fuse BM25 keyword matches with vector search; set to "0" for vector search only
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+
+# Limits of the shared multi-tenant store (one collection per browser session)
+MAX_TENANTS = int(os.getenv("MAX_TENANTS", "64"))
+TENANT_STORE_MAX_MB = int(os.getenv("TENANT_STORE_MAX_MB", "2048"))
+TENANT_IDLE_TTL_S = int(os.getenv("TENANT_IDLE_TTL_S", "3600"))
+
+# Files ingested concurrently in the background (across all sessions)
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+# Seconds between refreshes of the ingestion status panel
+INGESTION_POLL_S = 1.0
 
 
 def get_chroma_client():
     """
     Get an ephemeral ChromaDB client for session-based RAG.
-    Data is automatically deleted when user closes browser/session ends.
+    Data lives in memory only; the tenant store gives each session its own
+    collection and drops it once the session goes idle.
     """
+    # Imported lazily: chromadb is slow to import and not needed to render the page
+    import chromadb
     return chromadb.EphemeralClient()
 
 
-@st.cache_resource
-def initialize_chroma_client():
+def load_embedding_function(embedding_model):
+    """
+    The embedding function of the configured backend, without the cache.
+    Loading the Sentence Transformer model dominates startup time.
+    """
+    if EMBEDDING_BACKEND in ("onnx", "onnx-int8"):
+        from onnx_embedding import OnnxEmbeddingFunction
+        return OnnxEmbeddingFunction(
+            ONNX_MODEL_DIR, quantized=EMBEDDING_BACKEND == "onnx-int8", num_threads=EMBEDDING_THREADS
+        )
+    from chromadb.utils import embedding_functions
+    # Initialize an embedding function (using a Sentence Transformer model)
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=embedding_model
+    )
+
+
+def embedding_cache_key(embedding_model):
+    """
+    Model name under which the embedding cache stores vectors of the configured backend.
     """
-    Initialize ChromaDB client and store in Streamlit's resource cache.
-    This ensures one client per Streamlit session.
+    # Vectors of different backends differ slightly, so they are cached separately
+    return embedding_model if EMBEDDING_BACKEND == "torch" else f"{embedding_model}:{EMBEDDING_BACKEND}"
+
+
+def load_chromadb(embedding_model):
     """
-    return get_chroma_client()
+    Create the ChromaDB client and embedding function.
+    """
+    client = get_chroma_client()
+    embedding_func = load_embedding_function(embedding_model)
+
+    # Opt-in: reuse vectors persisted on disk by earlier sessions or offline warming
+    if EMBEDDING_CACHE_PATH:
+        from embedding_cache import CachedEmbeddingFunction, EmbeddingStore
+        store = EmbeddingStore(EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_MB * 1024**2)
+        embedding_func = CachedEmbeddingFunction(embedding_func, store, embedding_cache_key(embedding_model))
+
+    return client, embedding_func
 
 
 @st.cache_resource
+def start_chromadb_initialization(embedding_model):
+    """
+    Start creating the ChromaDB client and embedding function in a background thread.
+    Cached, so this happens once per process; returns a Future.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chromadb-init")
+    future = executor.submit(load_chromadb, embedding_model)
+    executor.shutdown(wait=False)
+    return future
+
+
 def initialize_chromadb(embedding_model):
     """
-    Initialize ChromaDB client and embedding function.
-    Both are cached to avoid recreating on every rerun.
+    Get the ChromaDB client and embedding function, waiting for the
+    background initialization to finish if it is still running.
     """
-    # Get the cached client
-    client = initialize_chroma_client()
+    future = start_chromadb_initialization(embedding_model)
+    try:
+        return future.result()
+    except Exception:
+        # Do not cache a failed initialization; the next call retries
+        start_chromadb_initialization.clear()
+        raise
 
-    # Initialize an embedding function (using a Sentence Transformer model)
-    embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=embedding_model
+
+@st.cache_resource
+def get_tenant_store(embedding_model, collection_prefix, retriever_backend="chroma"):
+    """
+    Get the process-wide tenant store. All sessions share the ChromaDB client
+    and the embedding model, but each one gets its own collection.
+    """
+    client, embedding_func = initialize_chromadb(embedding_model)
+    return TenantStore(
+        client, embedding_func,
+        collection_prefix=collection_prefix,
+        retriever_backend=retriever_backend,
+        hybrid=HYBRID_RETRIEVAL,
+        max_tenants=MAX_TENANTS,
+        max_bytes=TENANT_STORE_MAX_MB * 1024**2,
+        idle_ttl=TENANT_IDLE_TTL_S,
     )
 
-    return client, embedding_func
+
+def session_tenant_id():
+    """
+    Tenant id of the current browser session.
+    """
+    if "tenant_id" not in st.session_state:
+        st.session_state.tenant_id = uuid.uuid4().hex
+    return st.session_state.tenant_id
+
+
+def session_tenant(embedding_model, collection_name, retriever_backend="chroma"):
+    """
+    Get the tenant store and the current session's tenant.
+    If the store evicted this session while it was idle, files still waiting
+    to be indexed are queued again; indexed files no longer have their raw
+    bytes, so they are dropped and have to be uploaded again.
+    """
+    store = get_tenant_store(embedding_model, collection_name, retriever_backend)
+    tenant = store.get(session_tenant_id())
+
+    if st.session_state.get("tenant_created_at") != tenant.created_at:
+        evicted = "tenant_created_at" in st.session_state
+        st.session_state.tenant_created_at = tenant.created_at
+        session_files = st.session_state.session_files
+        session_files.index_bytes = 0
+        lost = []
+        for record in session_files:
+            if record.data is None:
+                session_files.remove(record.name)
+                lost.append(record.name)
+            else:
+                record.status, record.job_id = PENDING, None
+        if evicted and lost:
+            st.info(
+                "Your documents were unloaded after a period of inactivity; "
+                f"please upload them again: {', '.join(lost)}"
+            )
+        submit_files(store, tenant, session_files.names(PENDING))
+
+    return store, tenant
+
+
+def get_vector_store(embedding_model, collection_name, retriever_backend="chroma"):
+    """
+    Get the session's collection, the shared embedding function, and the
+    session's retriever and sparse index (None when hybrid retrieval is off),
+    on first need.
+    """
+    store, tenant = session_tenant(embedding_model, collection_name, retriever_backend)
+    return tenant.collection, store.embedding_func, tenant.retriever, tenant.sparse_index
+
+
+def iter_file_chunks(data, file_type, **chunk_options):
+    """
+    Extract and chunk a file lazily: pages stream out of the extractor pool
+    and chunks are yielded as soon as their paragraph is complete.
+    """
+    return iter_text_chunks(iter_file_text(data, file_type), **chunk_options)
+
+
+def iter_text_chunks(pieces, chunking=None, max_tokens=None, overlap_tokens=None, max_words=None):
+    """
+    Chunk text pieces (e.g. pages) with the configured chunker.
+    Options left as None use the CHUNKING / CHUNK_* settings.
+    """
+    lines = iter_text_lines(pieces)
+    if (chunking or CHUNKING) == "tokens":
+        return iter_token_chunking(
+            lines, load_tokenizer(),
+            max_tokens=max_tokens or CHUNK_MAX_TOKENS,
+            overlap_tokens=CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens,
+        )
+    return iter_lines_chunking(lines, max_words=max_words or CHUNK_MAX_WORDS)
+
+
+def chunk_content_hash(chunk):
+    """
+    Identity of a chunk for incremental ingestion and vector reuse.
+    Token chunks also hash the tokenizer that cut them, so that switching
+    between the real tokenizer and the approximate fallback re-chunks files
+    visibly instead of mixing chunks cut by both.
+    """
+    tokenizer = getattr(chunk, "tokenizer", None)
+    return content_hash(f"{tokenizer}\0{chunk}" if tokenizer else chunk)
+
+
+def chunk_id(filename, chunk_hash):
+    """
+    Chunk IDs combine the full filename with the chunk's content hash,
+    so files sharing a stem (a.pdf / a.txt) never collide.
+    """
+    return f"{filename}#{chunk_hash[:16]}"
 
 
-def initialize_collection(client, embedding_func, collection_name):
+def lookup_embeddings(collection, chunk_hashes):
     """
-    Initialize a collection in ChromaDB.
+    Find already-stored vectors for the given chunk hashes.
+    Returns a dict chunk_hash -> embedding.
     """
-    collection = client.get_or_create_collection(
-        name=collection_name,
-        embedding_function=embedding_func,
-        metadata={"hnsw:space": "cosine"},
+    if not chunk_hashes:
+        return {}
+    existing = collection.get(
+        where={"chunk_hash": {"$in": list(chunk_hashes)}},
+        include=["embeddings", "metadatas"],
     )
+    return {
+        metadata["chunk_hash"]: embedding
+        for metadata, embedding in zip(existing["metadatas"], existing["embeddings"])
+    }
 
-    return collection
 
+class IngestionPipeline:
+    """
+    Embed and insert a file's chunks in bounded batches.
+    `chunks` may be any iterable (e.g. a generator fed by extraction), so
+    embedding starts before extraction finishes. While batch N is written to
+    Chroma on a background thread, batch N+1 is embedded on the calling thread;
+    at most two batches are held in memory at any time.
+    - Chunks whose content is already stored for the file are kept (only their part number is refreshed).
+    - Chunks that disappeared from the file are deleted.
+    - New chunks reuse the vector of an identical chunk from any file, and only
+      chunks never seen before are embedded.
+    - If a `sparse_index` is given, it is kept in step with the collection,
+      and so is a `usage` counter (see tenant_store.UsageCounter).
+    """
+
+    def __init__(self, collection, embedding_func, batch_size=EMBEDDING_BATCH_SIZE, progress_callback=None,
+                 sparse_index=None, usage=None):
+        self.collection = collection
+        self.embedding_func = embedding_func
+        self.batch_size = max(1, int(batch_size))
+        self.progress_callback = progress_callback
+        self.sparse_index = sparse_index
+        self.usage = usage
+
+    def run(self, filename, chunks):
+        """
+        Sync `chunks` into the collection as the content of `filename`.
+        Returns a dict with counts of added, embedded, reused, unchanged and
+        removed chunks, plus elapsed seconds and chunks/sec.
+        """
+        start = time.perf_counter()
+        existing_ids = set(self.collection.get(where={"source": filename}, include=[])["ids"])
+        seen_ids = set()
+        stats = {"added": 0, "embedded": 0, "reused": 0, "unchanged": 0, "removed": 0,
+                 "chunks": 0, "elapsed_s": 0.0, "chunks_per_sec": 0.0}
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-insert") as writer:
+            pending_write = None
+            for batch in _batched(enumerate(chunks), self.batch_size):
+                # Identical chunks within a file are stored once, at their first position
+                records = {}
+                for part, chunk in batch:
+                    chunk_hash = chunk_content_hash(chunk)
+                    cid = chunk_id(filename, chunk_hash)
+                    if cid not in seen_ids:
+                        seen_ids.add(cid)
+                        # `overlap` lets context packing drop the text repeated from the previous part
+                        records[cid] = (chunk, {"source": filename, "part": part, "chunk_hash": chunk_hash,
+                                                "overlap": getattr(chunk, "overlap", 0)})
+
+                with get_tracer().span("ingest.embed", chunks=len(records)):
+                    prepared = self._embed_batch(records, existing_ids, stats)
+
+                # Wait for the previous insert before queueing this one, to bound memory
+                if pending_write is not None:
+                    pending_write.result()
+                    self._report(stats, start)
+                pending_write = writer.submit(self._write_batch, *prepared)
+                stats["chunks"] += len(batch)
+
+            if pending_write is not None:
+                pending_write.result()
+
+        stale_ids = [cid for cid in existing_ids if cid not in seen_ids]
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+            if self.sparse_index is not None:
+                self.sparse_index.delete(stale_ids)
+            if self.usage is not None:
+                self.usage.delete(stale_ids)
+        stats["removed"] = len(stale_ids)
+
+        self._report(stats, start)
+        return stats
+
+    def _embed_batch(self, records, existing_ids, stats):
+        """
+        Split a batch into kept and new chunks and embed only never-seen content.
+        """
+        kept_ids = [cid for cid in records if cid in existing_ids]
+        new_ids = [cid for cid in records if cid not in existing_ids]
+
+        known = lookup_embeddings(self.collection, {records[cid][1]["chunk_hash"] for cid in new_ids})
+        missing_ids = [cid for cid in new_ids if records[cid][1]["chunk_hash"] not in known]
+        if missing_ids:
+            vectors = self.embedding_func([records[cid][0] for cid in missing_ids])
+            for cid, vector in zip(missing_ids, vectors):
+                known[records[cid][1]["chunk_hash"]] = vector
+
+        stats["unchanged"] += len(kept_ids)
+        stats["added"] += len(new_ids)
+        stats["embedded"] += len(missing_ids)
+        stats["reused"] += len(new_ids) - len(missing_ids)
+
+        embeddings = [known[records[cid][1]["chunk_hash"]] for cid in new_ids]
+        return records, kept_ids, new_ids, embeddings
+
+    def _write_batch(self, records, kept_ids, new_ids, embeddings):
+        with get_tracer().span("ingest.write", chunks=len(kept_ids) + len(new_ids)):
+            self._write_records(records, kept_ids, new_ids, embeddings)
+
+    def _write_records(self, records, kept_ids, new_ids, embeddings):
+        if kept_ids:
+            self.collection.update(ids=kept_ids, metadatas=[records[cid][1] for cid in kept_ids])
+        if new_ids:
+            self.collection.add(
+                ids=new_ids,
+                documents=[records[cid][0] for cid in new_ids],
+                embeddings=embeddings,
+                metadatas=[records[cid][1] for cid in new_ids],
+            )
+            if self.sparse_index is not None:
+                self.sparse_index.add(new_ids, [records[cid][0] for cid in new_ids])
+            if self.usage is not None:
+                self.usage.add(new_ids, [records[cid][0] for cid in new_ids],
+                               [records[cid][1] for cid in new_ids], embeddings)
+
+    def _report(self, stats, start):
+        stats["elapsed_s"] = time.perf_counter() - start
+        stats["chunks_per_sec"] = stats["chunks"] / stats["elapsed_s"] if stats["elapsed_s"] > 0 else 0.0
+        if self.progress_callback is not None:
+            self.progress_callback(stats)
+
+
+def sync_file_chunks(collection, embedding_func, filename, chunks, batch_size=EMBEDDING_BATCH_SIZE, progress_callback=None,
+                     sparse_index=None, usage=None):
+    """
+    Incrementally sync a file's chunks into the collection through an IngestionPipeline.
+    """
+    pipeline = IngestionPipeline(collection, embedding_func, batch_size=batch_size, progress_callback=progress_callback,
+                                 sparse_index=sparse_index, usage=usage)
+    return pipeline.run(filename, chunks)
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-def update_collection(collection, files_to_add_to_collection):
+
+def ingest_file(collection, embedding_func, filename, data, file_type, sparse_index=None, progress_callback=None,
+                chunk_options=None, usage=None):
+    """
+    Extract, chunk and embed a file's bytes into the collection.
+    Safe to run off the script thread: it does not touch the Streamlit session.
+    `chunk_options` override the chunking settings (see `iter_text_chunks`).
+    Returns the IngestionPipeline stats.
+    """
+    if file_type not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    tracer = get_tracer()
+    # Extraction and chunking run lazily as the pipeline pulls chunks
+    chunks = tracer.timed_iter("ingest.extract_chunk", iter_file_chunks(data, file_type, **(chunk_options or {})))
+    # Store only new or changed chunks in the collection
+    with tracer.span("ingest.file", file=filename):
+        return sync_file_chunks(
+            collection, embedding_func, filename, chunks,
+            sparse_index=sparse_index, progress_callback=progress_callback, usage=usage,
+        )
+
+
+@st.cache_resource
+def get_ingestion_service():
     """
-    Update collection with new uploaded files.
-    Returns updated collection and session state.
+    Get the process-wide background ingestion service.
     """
-    for file_to_add in files_to_add_to_collection:
+    return IngestionService(max_workers=INGESTION_WORKERS)
 
-        current_file = next(
-            (file for file in st.session_state.get('uploaded_files_raw', []) 
-            if file.name == file_to_add),None)
-        
-        if current_file is None:
-            st.error(f"File '{file_to_add}' not found in uploaded files.")
-            continue  
 
-        # Read file content
+def _ingestion_task(store, tenant, filename, data, file_type):
+    """
+    The ingestion job of one file. The tenant is held (see TenantStore.hold)
+    from submission until the job ends, so it is not evicted under the job.
+    """
+    def task(progress_callback):
         try:
-            if current_file.type == "text/plain":  # Handling TXT files
-                file_text = current_file.getvalue().decode("utf-8")
-            elif current_file.type == "application/pdf":  # Handling PDFs
-                with fitz.open(stream=current_file.getvalue(), filetype="pdf") as pdf_document:
-                    file_text = "\n".join([page.get_text("text") for page in pdf_document])
-            else:
-                st.warning(f"Unsupported file type: {current_file.name} type:{current_file.type}")
-                continue
-
-            # Tokenize text into chunks
-            max_words = 200
-            chunks = lines_chunking(file_text, max_words=max_words)
-            
-            if not chunks:  # Skip if no chunks generated
-                st.warning(f"No content extracted from {current_file.name}")
-                continue
-
-            # Store chunks in the collection
-            filename = current_file.name
-            collection.add(
-                documents=chunks,
-                ids=[f"id{filename[:-4]}.{j}" for j in range(len(chunks))],
-                metadatas=[{"source": filename, "part": n} for n in range(len(chunks))],
-            )
-            
-            st.session_state.collections_files_name.append(filename)
-            st.success(f"Added {len(chunks)} chunks from {filename}")
-            
-        except Exception as e:
-            st.error(f"Error processing {current_file.name}: {str(e)}")
+            with get_tracer().trace("ingest", session=tenant.tenant_id):
+                stats = ingest_file(
+                    tenant.collection, store.embedding_func, filename, data, file_type,
+                    sparse_index=tenant.sparse_index, progress_callback=progress_callback, usage=tenant.usage,
+                )
+                tenant.retriever.sync(tenant.collection)
+                # Account the session's memory in the shared store (may evict idle sessions)
+                stats["usage_bytes"] = store.refresh_usage(tenant.tenant_id)
+            return stats
+        finally:
+            store.release(tenant.tenant_id)
+    return task
+
+
+def submit_files(store, tenant, filenames):
+    """
+    Queue the session's pending files for background ingestion into the tenant's collection.
+    Revised files only embed the chunks that changed.
+    See `collect_ingestion_results` for what happens once a job finishes.
+    """
+    session_files = st.session_state.session_files
+    service = get_ingestion_service()
+
+    for filename in filenames:
+        record = session_files.get(filename)
+        if record is None or record.status != PENDING:
+            continue
+
+        if record.file_type not in SUPPORTED_TYPES:
+            st.warning(f"Unsupported file type: {filename} type:{record.file_type}")
+            session_files.remove(filename)
+            continue
+
+        store.hold(tenant.tenant_id)
+        job = service.submit(
+            tenant.tenant_id, filename, _ingestion_task(store, tenant, filename, record.data, record.file_type),
+        )
+        session_files.mark_indexing(filename, job.job_id)
+
+
+def ingest_in_background(embedding_model, collection_name, filenames, retriever_backend="chroma"):
+    """
+    Queue files for ingestion into the session's collection and return immediately.
+    """
+    store, tenant = session_tenant(embedding_model, collection_name, retriever_backend)
+    submit_files(store, tenant, filenames)
+
+
+def remove_file(embedding_model, collection_name, filename, retriever_backend="chroma"):
+    """
+    Delete a file's chunks from the session's collection and forget the file.
+    """
+    store, tenant = session_tenant(embedding_model, collection_name, retriever_backend)
+    stale_ids = tenant.collection.get(where={"source": filename}, include=[])["ids"]
+    if stale_ids:
+        tenant.collection.delete(ids=stale_ids)
+        if tenant.sparse_index is not None:
+            tenant.sparse_index.delete(stale_ids)
+        tenant.usage.delete(stale_ids)
+        tenant.retriever.sync(tenant.collection)
+    session_files = st.session_state.session_files
+    session_files.remove(filename)
+    session_files.index_bytes = store.refresh_usage(tenant.tenant_id)
+
+
+def collect_ingestion_results():
+    """
+    Apply finished jobs to the session's files: indexed files become
+    queryable and their raw bytes are released, failed ones are dropped.
+    Jobs of a file that was re-uploaded meanwhile are ignored; the new
+    version gets its own job.
+    """
+    session_files = st.session_state.session_files
+    service = get_ingestion_service()
+
+    for record in session_files:
+        if record.status != INDEXING:
+            continue
+        job = service.get(record.job_id)
+        if job is not None and not job.finished:
+            continue
+        filename = record.name
+
+        if job is None:
+            # Forgotten by the service; index the file again
+            record.status, record.job_id = PENDING, None
+            continue
+
+        if job.error is not None:
+            st.error(f"Error processing {filename}: {job.error}")
             # Remove from session state if processing failed
-            st.session_state.uploaded_files_name.remove(filename)
-    
-    return collection
-    
\ No newline at end of file
+            session_files.remove(filename)
+            continue
+
+        stats = job.result
+        session_files.mark_indexed(filename)
+        session_files.index_bytes = stats["usage_bytes"]
+        if not stats["added"] and not stats["unchanged"]:
+            st.warning(f"No content extracted from {filename}")
+            continue
+        st.success(
+            f"Indexed {filename}: {stats['added']} new chunks "
+            f"({stats['embedded']} embedded, {stats['reused']} reused), "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed "
+            f"in {stats['elapsed_s']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/s)"
+        )
+
+
+@st.fragment(run_every=INGESTION_POLL_S)
+def display_ingestion_status():
+    """
+    Show per-file status of the session's pending ingestion jobs.
+    Refreshes on its own while the rest of the page stays interactive, and
+    reruns the app once a job finishes so its results are collected.
+    """
+    indexing = [record for record in st.session_state.session_files if record.status == INDEXING]
+    if not indexing:
+        return
+    service = get_ingestion_service()
+
+    finished = False
+    for record in indexing:
+        filename = record.name
+        job = service.get(record.job_id)
+        if job is None or job.finished:
+            finished = True
+            continue
+        if job.status == QUEUED:
+            st.caption(f"{filename}: queued")
+        else:
+            progress = job.progress
+            st.caption(
+                f"{filename}: indexing, {progress.get('chunks', 0)} chunks processed "
+                f"({progress.get('chunks_per_sec', 0.0):.1f} chunks/s)"
+            )
+    if finished:
+        st.rerun()
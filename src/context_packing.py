@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+
+from text_processing import content_hash
+
+
+PASSAGE_SEPARATOR = "\n\n"
+
+
+@dataclass
+class PackedContext:
+    """
+    Context assembled for the prompt.
+    `chunks` are the packed chunks in prompt order, `token_count` the tokens
+    of `text` as counted by the tokenizer used for packing.
+    """
+    text: str = ""
+    token_count: int = 0
+    chunks: list = field(default_factory=list)
+
+    @property
+    def chunk_ids(self):
+        return [chunk["id"] for chunk in self.chunks]
+
+
+def format_passage(source, parts, text):
+    """
+    Attribute a passage to its source file and chunk range.
+    """
+    first, last = parts[0], parts[-1]
+    label = f"part {first}" if first == last else f"parts {first}-{last}"
+    return f"[Source: {source}, {label}]\n{text}"
+
+
+def pack_context(chunks, budget, tokenizer, separator=PASSAGE_SEPARATOR):
+    """
+    Greedily pack the best-scoring chunks into `budget` tokens.
+    - `chunks` come from retrieval, best first.
+    - Chunks with identical content (e.g. the same paragraph in two files) are kept once.
+    - A chunk that does not fit is skipped, and smaller ones further down may still fill the budget.
+    - Selected chunks with adjacent `part` numbers from the same `source` are
+      merged into one contiguous passage, ordered by source and position.
+    """
+    selected, seen_hashes = [], set()
+    used = 0
+    for chunk in chunks:
+        chunk_hash = (chunk.get("metadata") or {}).get("chunk_hash") or content_hash(chunk["document"])
+        if chunk_hash in seen_hashes:
+            continue
+        # Attribution header and separator cost a few tokens per chunk
+        cost = tokenizer.count(chunk["document"]) + _overhead_tokens(chunk, tokenizer, separator)
+        if used + cost > budget:
+            continue
+        seen_hashes.add(chunk_hash)
+        selected.append(chunk)
+        used += cost
+
+    passages = _merge_adjacent(selected)
+    text = separator.join(passages)
+    return PackedContext(text=text, token_count=tokenizer.count(text) if text else 0, chunks=selected)
+
+
+def _overhead_tokens(chunk, tokenizer, separator):
+    metadata = chunk.get("metadata") or {}
+    header = format_passage(metadata.get("source", ""), [metadata.get("part", 0)], "")
+    return tokenizer.count(header + separator)
+
+
+def _merge_adjacent(chunks):
+    """
+    Group chunks by source, sort by part and join consecutive parts into passages.
+    Sources appear in the order of their best-scoring chunk.
+    """
+    by_source = {}
+    for chunk in chunks:
+        metadata = chunk.get("metadata") or {}
+        by_source.setdefault(metadata.get("source", ""), []).append(chunk)
+
+    passages = []
+    for source, source_chunks in by_source.items():
+        source_chunks.sort(key=lambda chunk: (chunk.get("metadata") or {}).get("part", 0))
+        run_parts, run_chunks = [], []
+        for chunk in source_chunks:
+            part = (chunk.get("metadata") or {}).get("part", 0)
+            if run_parts and part != run_parts[-1] + 1:
+                passages.append(format_passage(source, run_parts, _join_overlapping(run_chunks)))
+                run_parts, run_chunks = [], []
+            run_parts.append(part)
+            run_chunks.append(chunk)
+        if run_parts:
+            passages.append(format_passage(source, run_parts, _join_overlapping(run_chunks)))
+    return passages
+
+
+def _join_overlapping(chunks):
+    """
+    Join consecutive chunks of a source, dropping the text a chunk repeats from
+    the end of the previous one. The repeated length is the `overlap` the
+    chunker recorded in the chunk's metadata; chunks without one are joined whole.
+    """
+    joined = chunks[0]["document"]
+    for chunk in chunks[1:]:
+        text = chunk["document"]
+        overlap = (chunk.get("metadata") or {}).get("overlap") or 0
+        if 0 < overlap <= len(text) and joined.endswith(text[:overlap]):
+            joined += text[overlap:]
+        else:
+            joined += " " + text
+    return joined
@@ -0,0 +1,277 @@
+import argparse
+import logging
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+from collections_setup import embedding_cache_key, iter_file_chunks, load_embedding_function
+from text_processing import content_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024**2
+
+# After an eviction the store is trimmed to this fraction of its budget,
+# so that consecutive inserts do not each trigger an eviction pass
+EVICTION_TARGET = 0.9
+
+# Cache hits only refresh their recency in memory; the refreshes are written
+# in one transaction at the next insert, or after this many seconds
+ACCESS_FLUSH_INTERVAL_S = 30.0
+
+
+class EmbeddingStore:
+    """
+    Persistent SQLite store of embeddings keyed by (model name, chunk text hash).
+    Size-bounded: once the stored vectors exceed `max_bytes`, the least recently
+    used entries are evicted.
+    Safe to share between threads and between processes on the same host.
+    The size of the stored vectors is kept up to date by triggers, so checking
+    the budget does not scan the table.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._create_size_total()
+        # (model, text_hash) -> time of the latest cache hit not yet written
+        self._accessed = {}
+        self._accessed_since = time.monotonic()
+
+    def _create_size_total(self):
+        """
+        Running total of the stored vector bytes, counted once for stores
+        created before the total existed.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS store_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+        )
+        if self._conn.execute("SELECT 1 FROM store_size").fetchone() is None:
+            self._conn.execute(
+                "INSERT INTO store_size SELECT 0, COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            )
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN
+                UPDATE store_size SET bytes = bytes + LENGTH(NEW.vector);
+            END
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_update AFTER UPDATE OF vector ON embeddings BEGIN
+                UPDATE store_size SET bytes = bytes + LENGTH(NEW.vector) - LENGTH(OLD.vector);
+            END
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN
+                UPDATE store_size SET bytes = bytes - LENGTH(OLD.vector);
+            END
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model, text_hashes):
+        """
+        Return a dict text_hash -> float32 vector for the hashes found in the store.
+        """
+        found = {}
+        hashes = list(text_hashes)
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+                    self._accessed[(model, text_hash)] = now
+            if self._accessed and time.monotonic() - self._accessed_since >= ACCESS_FLUSH_INTERVAL_S:
+                self._flush_accessed()
+                self._conn.commit()
+        return found
+
+    def put_many(self, model, vectors):
+        """
+        Store a dict text_hash -> vector, then evict if over budget.
+        """
+        now = time.time()
+        rows = [
+            (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock:
+            self._flush_accessed()
+            self._conn.executemany(
+                """
+                INSERT INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT (model, text_hash) DO UPDATE SET vector = excluded.vector, last_access = excluded.last_access
+                """,
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _flush_accessed(self):
+        """
+        Write the pending recency updates of cache hits, in the caller's transaction.
+        """
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                [(last_access, model, text_hash) for (model, text_hash), last_access in self._accessed.items()],
+            )
+            self._accessed = {}
+        self._accessed_since = time.monotonic()
+
+    def size_bytes(self):
+        with self._lock:
+            return self._size_bytes()
+
+    def _size_bytes(self):
+        return self._conn.execute("SELECT bytes FROM store_size").fetchone()[0]
+
+    def _evict(self):
+        """
+        Drop least recently used vectors until the store is back under budget.
+        """
+        size = self._size_bytes()
+        if size <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET
+        rows = self._conn.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access"
+        )
+        to_delete = []
+        for model, text_hash, length in rows:
+            if size <= target:
+                break
+            to_delete.append((model, text_hash))
+            size -= length
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete)
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that consults an EmbeddingStore before calling
+    the wrapped model, and stores whatever it had to compute.
+    """
+
+    def __init__(self, embedding_func, store, model_name):
+        self.embedding_func = embedding_func
+        self.store = store
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, input):
+        hashes = [content_hash(text) for text in input]
+        cached = self.store.get_many(self.model_name, set(hashes))
+
+        missing = {}
+        for text, text_hash in zip(input, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        if missing:
+            vectors = self.embedding_func(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(self.model_name, computed)
+            cached.update({h: np.asarray(v, dtype=np.float32) for h, v in computed.items()})
+
+        self.hits += len(hashes) - len(missing)
+        self.misses += len(missing)
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, input):
+        # Queries are seldom asked twice word for word: do not persist them
+        return self.embedding_func.embed_query(input)
+
+    def name(self):
+        return self.embedding_func.name()
+
+    def get_config(self):
+        return self.embedding_func.get_config()
+
+    def default_space(self):
+        return self.embedding_func.default_space()
+
+    def supported_spaces(self):
+        return self.embedding_func.supported_spaces()
+
+
+def warm(store, model_name, embedding_func, paths, batch_size=64):
+    """
+    Pre-compute embeddings for the chunks of the given files, so that later
+    uploads of the same documents skip the model entirely.
+    Files are chunked exactly like `ingest_file` does.
+    Returns the number of chunks processed.
+    """
+    cached_func = CachedEmbeddingFunction(embedding_func, store, model_name)
+    processed = 0
+    for path in paths:
+        file_type, _ = mimetypes.guess_type(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        chunks = list(iter_file_chunks(data, file_type))
+        for i in range(0, len(chunks), batch_size):
+            cached_func(chunks[i:i + batch_size])
+        processed += len(chunks)
+        logger.info(f"{path}: {len(chunks)} chunks")
+    logger.info(f"Warmed {processed} chunks ({cached_func.misses} newly embedded)")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the persistent embedding cache offline.")
+    parser.add_argument("files", nargs="+", help="TXT or PDF files to embed")
+    parser.add_argument("--db", default=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // 1024**2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # The app's embedding function and cache key, so EMBEDDING_BACKEND applies here too
+    store = EmbeddingStore(args.db, max_bytes=args.max_mb * 1024**2)
+    warm(store, embedding_cache_key(args.model), load_embedding_function(args.model), args.files)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+
+# Pages handed to a worker per task, and the smallest PDF worth a process pool:
+# spawning the workers and copying the PDF into each costs about a second,
+# which text extraction of a few hundred pages does not win back
+PAGES_PER_TASK = 16
+MIN_PAGES_FOR_POOL = 512
+# Page ranges in flight per worker; bounds the extracted text held in memory
+# when the consumer (chunking and embedding) is slower than extraction
+TASKS_PER_WORKER = 2
+
+SUPPORTED_TYPES = ("text/plain", "application/pdf")
+
+_worker_document = None
+
+
+def _init_worker(data):
+    """
+    Open the PDF once per worker process instead of once per task.
+    """
+    global _worker_document
+    _worker_document = fitz.open(stream=data, filetype="pdf")
+
+
+def _extract_page_range(start, stop):
+    return [_worker_document[i].get_text("text") for i in range(start, stop)]
+
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+def iter_pdf_pages(data, max_workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yield the text of each PDF page, in order.
+    Large documents are split into page ranges extracted in parallel by a
+    process pool; pages are yielded as soon as their range is done, so
+    downstream chunking can start before the whole document is extracted.
+    Only a few ranges per worker are in flight at a time, so a slow consumer
+    does not make the extracted text pile up.
+    """
+    with fitz.open(stream=data, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count
+        max_workers = max_workers or default_workers()
+        if max_workers == 1 or page_count < MIN_PAGES_FOR_POOL:
+            for page in pdf_document:
+                yield page.get_text("text")
+            return
+
+    # Spawned workers are safe to start from Streamlit's threaded server process
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(data,),
+    ) as pool:
+        ranges = ((start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task))
+        futures = deque()
+        try:
+            for page_range in ranges:
+                futures.append(pool.submit(_extract_page_range, *page_range))
+                if len(futures) >= TASKS_PER_WORKER * max_workers:
+                    yield from futures.popleft().result()
+            while futures:
+                yield from futures.popleft().result()
+        finally:
+            # Closed early: do not extract the ranges nobody will read
+            for future in futures:
+                future.cancel()
+
+
+def iter_file_text(data, file_type, max_workers=None):
+    """
+    Yield the text of an uploaded file piece by piece (one piece per PDF page).
+    """
+    if file_type == "text/plain":
+        yield data.decode("utf-8")
+    elif file_type == "application/pdf":
+        yield from iter_pdf_pages(data, max_workers=max_workers)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
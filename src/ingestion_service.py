@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Job states; "done" and "failed" are final
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class IngestionJob:
+    """
+    One file being ingested for one tenant.
+    `progress` holds the latest pipeline stats (chunks processed, chunks/sec),
+    `result` the final stats once the job is done.
+    """
+    tenant_id: str
+    filename: str
+    file_id: str = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    progress: dict = field(default_factory=dict)
+    result: dict = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class IngestionService:
+    """
+    Run ingestion tasks on a thread pool, off the Streamlit script thread,
+    and keep a table of their status that any script rerun can poll.
+    - A task is a callable taking a progress callback and returning a stats dict.
+    - Files of one tenant are ingested in parallel, but two jobs for the same
+      (tenant, filename) never overlap: a re-upload waits for the previous run.
+    - Finished jobs are forgotten beyond the `max_jobs` most recent ones.
+    Shared by all sessions in the process.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=1024):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ingestion")
+        self._jobs = OrderedDict()
+        self._file_locks = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tenant_id, filename, task, file_id=None):
+        """
+        Queue `task` as the ingestion of `filename` for `tenant_id`; returns the job.
+        """
+        job = IngestionJob(tenant_id=tenant_id, filename=filename, file_id=file_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            file_lock = self._file_locks.setdefault((tenant_id, filename), threading.Lock())
+            self._prune()
+        self._executor.submit(self._run, job, task, file_lock)
+        return job
+
+    def _run(self, job, task, file_lock):
+        with file_lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = task(lambda stats: job.progress.update(stats))
+                job.status = DONE
+            except Exception as e:
+                logger.exception(f"Ingestion of {job.filename} failed")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, tenant_id):
+        """
+        Jobs of a tenant, oldest first.
+        """
+        with self._lock:
+            return [job for job in self._jobs.values() if job.tenant_id == tenant_id]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+        active = {(job.tenant_id, job.filename) for job in self._jobs.values() if not job.finished}
+        self._file_locks = {key: lock for key, lock in self._file_locks.items() if key in active}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -43,3 +43,50 @@ def display_logs(log_stream):
     log_stream.seek(0)  
     logs = log_stream.read()  
     st.text(logs)  
+
+
+def display_debug_panel(tracer, session):
+    """
+    Display aggregated per-stage latencies and the session's last trace,
+    with JSON and Prometheus text exports. Other sessions' traces are never
+    shown: their spans name those sessions' files.
+    """
+    with st.expander("Debug: stage latencies"):
+        summary = tracer.summary()
+        if not summary:
+            st.caption("No timings recorded yet.")
+            return
+        st.dataframe(
+            [{"stage": name, **{key: round(value, 2) for key, value in stats.items()}} for name, stats in summary.items()],
+            hide_index=True,
+        )
+        traces = tracer.traces(session)
+        if traces:
+            last = traces[-1]
+            st.caption(f"Last trace: {last['name']} ({last['seconds'] * 1000:.0f}ms)")
+            st.json(last["spans"], expanded=False)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Export JSON", tracer.to_json(session), file_name="rag_timings.json", mime="application/json")
+        with col2:
+            st.download_button("Export Prometheus", tracer.to_prometheus(), file_name="rag_timings.prom", mime="text/plain")
+
+
+def display_memory_panel(attribution):
+    """
+    Display the process RSS split into per-session usage and the shared remainder.
+    """
+    with st.expander("Debug: memory"):
+        st.caption(f"Process RSS: {attribution['rss_bytes'] / 1024**2:.1f} MB (per-session figures are estimates)")
+        st.dataframe(
+            [
+                {
+                    "owner": row["owner"],
+                    "raw MB": round(row["raw_bytes"] / 1024**2, 2),
+                    "index MB": round(row["index_bytes"] / 1024**2, 2),
+                    "total MB": round(row["total_bytes"] / 1024**2, 2),
+                }
+                for row in attribution["sessions"]
+            ],
+            hide_index=True,
+        )
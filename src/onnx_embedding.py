@@ -0,0 +1,160 @@
+import argparse
+import os
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function running a Sentence Transformer exported to ONNX
+    (see `export`) on ONNX Runtime's CPU provider, without PyTorch.
+    Computes the same mean-pooled, normalized embeddings as
+    SentenceTransformerEmbeddingFunction.
+    - `quantized` loads the int8 model (dynamic quantization of the weights).
+    - `num_threads` bounds ONNX Runtime's intra-op threads (default: all cores).
+    - Texts are embedded in length-sorted batches, so each batch pads to similar lengths.
+    """
+
+    def __init__(self, model_dir, quantized=False, num_threads=None, batch_size=32, max_length=256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.num_threads = num_threads
+        self.batch_size = max(1, int(batch_size))
+        self.max_length = max_length
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def __call__(self, input):
+        order = sorted(range(len(input)), key=lambda i: len(input[i]))
+        embeddings = [None] * len(input)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed([input[i] for i in batch])):
+                embeddings[i] = vector
+        return embeddings
+
+    def _embed(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    @staticmethod
+    def name():
+        return "onnx_sentence_transformer"
+
+    def get_config(self):
+        return {
+            "model_dir": self.model_dir,
+            "quantized": self.quantized,
+            "num_threads": self.num_threads,
+            "batch_size": self.batch_size,
+            "max_length": self.max_length,
+        }
+
+    @staticmethod
+    def build_from_config(config):
+        return OnnxEmbeddingFunction(**config)
+
+    def default_space(self):
+        return "cosine"
+
+    def supported_spaces(self):
+        return ["cosine", "l2", "ip"]
+
+
+def export(model_name, output_dir, quantize=True, opset=17):
+    """
+    Export a Hugging Face Sentence Transformer to `output_dir`: the fp32 ONNX
+    model, its fast tokenizer and, with `quantize`, an int8 copy.
+    Needs torch, transformers and onnx, which are only
+    required at export time.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+    model = LastHiddenState(AutoModel.from_pretrained(model_name)).eval()
+
+    dummy = tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    dynamic_axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], torch.zeros_like(dummy["input_ids"])),
+            model_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic_axes,
+                "attention_mask": dynamic_axes,
+                "token_type_ids": dynamic_axes,
+                "last_hidden_state": dynamic_axes,
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+    print(f"Exported {model_name} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized to {quantized_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 and int8).")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--output", default=os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx"))
+    parser.add_argument("--no-quantize", action="store_true", help="Only export the fp32 model")
+    args = parser.parse_args()
+    export(args.model, args.output, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+
+@dataclass
+class RerankResult:
+    """
+    Outcome of a reranking pass.
+    `chunks` are scored chunks by descending score, followed by any chunks left
+    unscored (in retrieval order) when the time budget ran out.
+    """
+    chunks: list = field(default_factory=list)
+    scored: int = 0
+    cached: int = 0
+    elapsed_s: float = 0.0
+    budget_exceeded: bool = False
+
+
+class CrossEncoderReranker:
+    """
+    Rescore retrieved chunks against the question with a small cross-encoder on CPU.
+    - Candidates are scored in batches of `batch_size`, in retrieval order.
+    - Scores are cached per (query, chunk id), so re-asking a question only scores new chunks.
+    - Scoring stops before a batch that would overrun `budget_s` seconds;
+      the remaining candidates keep their retrieval order after the scored ones.
+    """
+
+    def __init__(self, model, batch_size=16, budget_s=0.5, cache_size=4096):
+        self.model = model
+        self.batch_size = max(1, int(batch_size))
+        self.budget_s = budget_s
+        self.cache_size = cache_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_pretrained(cls, name=RERANKER_MODEL, **kwargs):
+        from sentence_transformers import CrossEncoder
+        return cls(CrossEncoder(name, device="cpu"), **kwargs)
+
+    def rerank(self, query, chunks, top_n=None):
+        start = time.perf_counter()
+        scores = {}
+        with self._lock:
+            for chunk in chunks:
+                score = self._scores.get((query, chunk["id"]))
+                if score is not None:
+                    self._scores.move_to_end((query, chunk["id"]))
+                    scores[chunk["id"]] = score
+        cached = len(scores)
+
+        pending = [chunk for chunk in chunks if chunk["id"] not in scores]
+        budget_exceeded = False
+        batch_time = 0.0
+        for i in range(0, len(pending), self.batch_size):
+            elapsed = time.perf_counter() - start
+            # Skip a batch that would not finish in time, judging by the previous one
+            if self.budget_s is not None and elapsed + batch_time > self.budget_s:
+                budget_exceeded = True
+                break
+            batch = pending[i:i + self.batch_size]
+            batch_start = time.perf_counter()
+            batch_scores = self.model.predict([(query, chunk["document"]) for chunk in batch])
+            batch_time = time.perf_counter() - batch_start
+            for chunk, score in zip(batch, batch_scores):
+                scores[chunk["id"]] = float(score)
+            self._store(query, batch, batch_scores)
+
+        scored = sorted((chunk for chunk in chunks if chunk["id"] in scores), key=lambda chunk: -scores[chunk["id"]])
+        unscored = [chunk for chunk in chunks if chunk["id"] not in scores]
+        ranked = [{**chunk, "rerank_score": scores[chunk["id"]]} for chunk in scored] + unscored
+        if top_n is not None:
+            ranked = ranked[:top_n]
+
+        result = RerankResult(
+            chunks=ranked,
+            scored=len(scored) - cached,
+            cached=cached,
+            elapsed_s=time.perf_counter() - start,
+            budget_exceeded=budget_exceeded,
+        )
+        logger.debug(
+            f"Reranked {result.scored} chunks ({result.cached} cached, {len(unscored)} unscored) "
+            f"in {result.elapsed_s * 1000:.0f}ms"
+        )
+        return result
+
+    def _store(self, query, chunks, scores):
+        with self._lock:
+            for chunk, score in zip(chunks, scores):
+                self._scores[(query, chunk["id"])] = float(score)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=None)
+def load_reranker(name=RERANKER_MODEL):
+    """
+    Load the cross-encoder once per process (shared by all sessions), or
+    return None if it is unavailable, in which case retrieval order is kept.
+    """
+    try:
+        return CrossEncoderReranker.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"Could not load reranker {name} ({e}); keeping retrieval order.")
+        return None
@@ -0,0 +1,307 @@
+import threading
+
+import numpy as np
+
+
+class Retriever:
+    """
+    Interface between retrieval (`get_relevant_text`) and a vector index.
+    `query` returns a list of chunk dicts with the chunk id, document,
+    metadata and cosine distance, closest first.
+    """
+
+    def query(self, query_text=None, query_embedding=None, n_results=3):
+        raise NotImplementedError
+
+    def get(self, ids):
+        """
+        Fetch chunks by id (with no distance), e.g. for results of the sparse index.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def sync(self, collection):
+        """
+        Bring the index up to date with the collection after ingestion.
+        """
+
+
+class ChromaRetriever(Retriever):
+    """
+    Retriever backed directly by a Chroma collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def query(self, query_text=None, query_embedding=None, n_results=3):
+        if query_embedding is not None:
+            query_result = self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
+        else:
+            query_result = self.collection.query(query_texts=query_text, n_results=n_results)
+
+        return [
+            {"id": chunk_id, "document": doc, "metadata": metadata, "distance": distance}
+            for chunk_id, doc, metadata, distance in zip(
+                query_result.get("ids")[0],
+                query_result.get("documents")[0],
+                query_result.get("metadatas")[0],
+                query_result.get("distances")[0],
+            )
+            if doc is not None
+        ]
+
+    def get(self, ids):
+        if not ids:
+            return []
+        result = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return [
+            {"id": chunk_id, "document": doc, "metadata": metadata, "distance": None}
+            for chunk_id, doc, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+
+    def count(self):
+        return self.collection.count()
+
+    def sync(self, collection):
+        self.collection = collection
+
+
+class InProcessIndex(Retriever):
+    """
+    Base class for indexes that mirror a Chroma collection in process memory.
+    Chroma stays the source of truth; `sync` copies over new chunks and drops
+    deleted ones. Subclasses implement `_add_vectors`, `_remove_positions`
+    and `_search`.
+    """
+
+    def __init__(self, embedding_func):
+        self.embedding_func = embedding_func
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._positions = {}
+        # Ingestion syncs from a background thread while queries run on the script thread
+        self._lock = threading.RLock()
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, ids):
+        with self._lock:
+            return [
+                {
+                    "id": chunk_id,
+                    "document": self.documents[self._positions[chunk_id]],
+                    "metadata": self.metadatas[self._positions[chunk_id]],
+                    "distance": None,
+                }
+                for chunk_id in ids
+                if chunk_id in self._positions
+            ]
+
+    def add(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+            start = len(self.ids)
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            for offset, chunk_id in enumerate(ids):
+                self._positions[chunk_id] = start + offset
+            self._add_vectors(vectors, start)
+
+    def delete(self, ids):
+        with self._lock:
+            positions = sorted(self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions)
+            if not positions:
+                return
+            self._remove_positions(positions)
+            removed = set(positions)
+            keep = [i for i in range(len(self.ids)) if i not in removed]
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+    def sync(self, collection):
+        with self._lock:
+            current = collection.get(include=["metadatas"])
+            current_ids = set(current["ids"])
+
+            self.delete([chunk_id for chunk_id in self.ids if chunk_id not in current_ids])
+
+            # Part numbers of kept chunks may have been refreshed by a re-upload
+            for chunk_id, metadata in zip(current["ids"], current["metadatas"]):
+                position = self._positions.get(chunk_id)
+                if position is not None:
+                    self.metadatas[position] = metadata
+
+            new_ids = [chunk_id for chunk_id in current["ids"] if chunk_id not in self._positions]
+            if new_ids:
+                new = collection.get(ids=new_ids, include=["embeddings", "documents", "metadatas"])
+                self.add(new["ids"], new["embeddings"], new["documents"], new["metadatas"])
+
+    def query(self, query_text=None, query_embedding=None, n_results=3):
+        if not self.ids:
+            return []
+        if query_embedding is None:
+            query_embedding = self.embedding_func([query_text])[0]
+        query = _normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+
+        with self._lock:
+            if not self.ids:
+                return []
+            positions, distances = self._search(query, min(n_results, len(self.ids)))
+            return [
+                {
+                    "id": self.ids[position],
+                    "document": self.documents[position],
+                    "metadata": self.metadatas[position],
+                    "distance": float(distance),
+                }
+                for position, distance in zip(positions, distances)
+            ]
+
+    def _add_vectors(self, vectors, start):
+        raise NotImplementedError
+
+    def _remove_positions(self, positions):
+        raise NotImplementedError
+
+    def _search(self, query, k):
+        raise NotImplementedError
+
+
+class NumpyIndex(InProcessIndex):
+    """
+    Exact search over a contiguous float32 matrix of normalized vectors.
+    One matrix-vector product per query; for small per-session corpora this
+    avoids Chroma's per-query overhead entirely.
+    """
+
+    def __init__(self, embedding_func):
+        super().__init__(embedding_func)
+        self.matrix = None
+
+    def _add_vectors(self, vectors, start):
+        self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+
+    def _remove_positions(self, positions):
+        self.matrix = np.delete(self.matrix, positions, axis=0)
+
+    def _search(self, query, k):
+        similarities = self.matrix @ query
+        if k < len(similarities):
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(len(similarities))
+        top = top[np.argsort(-similarities[top])]
+        return top, 1.0 - similarities[top]
+
+
+class HNSWIndex(InProcessIndex):
+    """
+    Approximate search with hnswlib.
+    `M` and `ef_construction` trade build time and memory for graph quality,
+    `ef` trades query latency for recall.
+    """
+
+    def __init__(self, embedding_func, M=16, ef_construction=200, ef=50, initial_capacity=1024):
+        super().__init__(embedding_func)
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("The HNSW retriever backend requires `pip install hnswlib`.")
+        self._hnswlib = hnswlib
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.initial_capacity = initial_capacity
+        self.index = None
+        # hnswlib labels are stable integers; positions shift on delete
+        self._labels = []
+        self._label_positions = {}
+        self._next_label = 0
+
+    def _add_vectors(self, vectors, start):
+        if self.index is None:
+            self.index = self._hnswlib.Index(space="cosine", dim=vectors.shape[1])
+            self.index.init_index(
+                max_elements=max(self.initial_capacity, len(vectors)),
+                ef_construction=self.ef_construction,
+                M=self.M,
+            )
+            self.index.set_ef(self.ef)
+
+        required = self.index.get_current_count() + len(vectors)
+        if required > self.index.get_max_elements():
+            self.index.resize_index(max(required, 2 * self.index.get_max_elements()))
+
+        labels = np.arange(self._next_label, self._next_label + len(vectors))
+        self._next_label += len(vectors)
+        self.index.add_items(vectors, labels)
+        self._labels.extend(labels.tolist())
+        self._label_positions = {label: i for i, label in enumerate(self._labels)}
+
+    def _remove_positions(self, positions):
+        removed = set(positions)
+        for position in positions:
+            self.index.mark_deleted(self._labels[position])
+        self._labels = [label for i, label in enumerate(self._labels) if i not in removed]
+        self._label_positions = {label: i for i, label in enumerate(self._labels)}
+
+    def set_ef(self, ef):
+        self.ef = ef
+        if self.index is not None:
+            self.index.set_ef(ef)
+
+    def _search(self, query, k):
+        # ef must be at least k for hnswlib to return k results
+        if self.ef < k:
+            self.index.set_ef(k)
+        labels, distances = self.index.knn_query(query, k=k)
+        if self.ef < k:
+            self.index.set_ef(self.ef)
+        positions = [self._label_positions[label] for label in labels[0]]
+        return positions, distances[0]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several ranked lists of chunk ids with reciprocal rank fusion.
+    Returns (chunk id, fused score) pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+RETRIEVER_BACKENDS = ("chroma", "numpy", "hnsw")
+
+
+def build_retriever(collection, embedding_func, backend="chroma", **params):
+    """
+    Build a retriever over a collection with the given backend.
+    In-process backends are filled from the collection immediately.
+    """
+    if backend == "chroma":
+        return ChromaRetriever(collection)
+    if backend == "numpy":
+        retriever = NumpyIndex(embedding_func)
+    elif backend == "hnsw":
+        retriever = HNSWIndex(embedding_func, **params)
+    else:
+        raise ValueError(f"Unknown retriever backend: {backend}. Expected one of {RETRIEVER_BACKENDS}")
+    retriever.sync(collection)
+    return retriever
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -1,9 +1,15 @@
 import streamlit as st
 import os
-from utils import load_background_image, apply_style, configure_page, breaks, file_uploader, initialise_session_state
-from mylogging import configure_logging, toggle_logging, display_logs
-from collections_setup import initialize_chromadb, initialize_collection, update_collection
-from runpod_setup import get_relevant_text, generate_answer, get_contextual_prompt
+from utils import load_background_image, apply_style, configure_page, breaks, file_uploader, initialise_session_state, display_session_files
+from mylogging import configure_logging, toggle_logging, display_logs, display_debug_panel, display_memory_panel
+from collections_setup import start_chromadb_initialization, get_vector_store, ingest_in_background, collect_ingestion_results, display_ingestion_status, remove_file, session_tenant_id
+from runpod_setup import retrieve_chunks, stream_answer, get_contextual_input, PROMPT_TEMPLATE_TOKENS
+from answer_cache import get_answer_cache
+from token_chunking import load_tokenizer, context_token_budget
+from context_packing import pack_context
+from reranking import load_reranker
+from tracing import get_tracer
+from session_memory import PENDING, register_session, memory_attribution
 
 if __name__ == "__main__":
 
@@ -11,6 +17,8 @@ if __name__ == "__main__":
     apply_style()
     load_background_image()
     initialise_session_state()
+    # Attribute this session's files in the process-wide memory view
+    register_session(session_tenant_id(), st.session_state.session_files)
     breaks(2)
     st.write(
         """
@@ -45,16 +53,28 @@ if __name__ == "__main__":
 
     # ---- Logging Setup ----
     use_logging = False
+    # Per-stage latency panel (p50/p95, JSON / Prometheus export)
+    show_debug_panel = os.getenv("DEBUG_PANEL", "0") == "1"
+    tracer = get_tracer()
     if use_logging:
         logging_level = st.selectbox("Select logging level", ['INFO', 'DEBUG', 'WARNING'], index=2)
         toggle_logging(logging_level, logger)
 
     # ---- Vector Store Setup ----
-    # Initialize ChromaDB and collection
+    # The embedding model and ChromaDB client load in a background thread;
+    # the script only waits for them once there is something to index or query
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"  
-    client, embedding_func = initialize_chromadb(EMBEDDING_MODEL)
-    collection_name = "my_collection"
-    collection = initialize_collection(client, embedding_func, collection_name)
+    collection_name = "my_collection"  # prefix of the per-session collection names
+    retriever_backend = os.getenv("RETRIEVER_BACKEND", "chroma")
+    # Chunks retrieved per question before packing them into the token budget
+    CONTEXT_CANDIDATES = 20
+    # Opt-in: rescore the candidates with a CPU cross-encoder before packing
+    use_reranking = os.getenv("RERANKING", "0") == "1"
+    RERANK_CANDIDATES = 40
+    start_chromadb_initialization(EMBEDDING_MODEL)
+
+    # Process-wide answer cache, so repeated questions skip generation
+    answer_cache = get_answer_cache()
 
     # Upload files
     st.markdown(
@@ -69,25 +89,26 @@ if __name__ == "__main__":
         file_uploader()
 
     # Get the current uploaded filenames
-    logger.debug(f"\n\t-- Currently uploaded files: {st.session_state.get('uploaded_files_name', 'None')}")
+    session_files = st.session_state.session_files
+    logger.debug(f"\n\t-- Currently uploaded files: {session_files.names()}")
 
 
+    # Pick up files whose background ingestion finished since the last rerun
+    collect_ingestion_results()
+
     # Update collection with uploaded files
-    files_to_add_to_collection= [file_name for file_name in st.session_state.get("uploaded_files_name", []) if file_name not in st.session_state.get("collections_files_name", [])]
+    files_to_add_to_collection = session_files.names(PENDING)
     logger.debug(f"\n\t-- Files not in collection: {files_to_add_to_collection}")
 
     if files_to_add_to_collection:
-        collection = update_collection(collection, files_to_add_to_collection)
-
-    # Update the session state
-    logger.debug(f"Collection count: {collection.count()}")
-    logger.debug(f"\n\t-- Collection data currently uploaded:")
-    data_head = collection.get(limit=5)
-    for i, (metadata, document) in enumerate(zip(data_head["metadatas"], data_head["documents"]), start=1):
-        logger.debug(f"Item {i}:")
-        logger.debug(f"Metadata: {metadata}")
-        logger.debug(f"Document: {document}")
-        logger.debug("-" * 40)
+        # Extraction, chunking and embedding run on the ingestion service's threads;
+        # questions are answered from the files indexed so far in the meantime
+        ingest_in_background(EMBEDDING_MODEL, collection_name, files_to_add_to_collection, retriever_backend)
+    display_ingestion_status()
+    with col2_:
+        display_session_files(
+            on_remove=lambda filename: remove_file(EMBEDDING_MODEL, collection_name, filename, retriever_backend)
+        )
 
     # ---- Response Generation ----
     # Streamlit UI
@@ -99,30 +120,91 @@ if __name__ == "__main__":
         generate_clicked = st.button("Generate Response")
     if generate_clicked:
         if query.strip():
-            # Get the number of available documents in ChromaDB
-            available_docs = collection.count()
-
-            if available_docs > 0:
-                # Ensure n_results doesn't exceed available_docs
-                n_results = min(2, available_docs)
-                relevant_text = get_relevant_text(collection, query=query, nresults=n_results)
-            else:
-                relevant_text = ""  # No documents available, so no additional context
-                st.warning("No knowledge base available. Generating response based only on the prompt.")
-
-            logger.debug("\n\t-- Relevant text retrieved:")
-            logger.debug(relevant_text)
-
-            with st.spinner("Generating response..."):
-                context_query = get_contextual_prompt(query, relevant_text)
-                response = generate_answer(context_query, max_tokens=200)
-
-            with col2:
-                st.subheader("Response:")
-                st.text_area("", value=response, height=200)
+            with tracer.trace("question", session=session_tenant_id()):
+                with st.spinner("Loading embedding model..."):
+                    collection, embedding_func, retriever, sparse_index = get_vector_store(EMBEDDING_MODEL, collection_name, retriever_backend)
+
+                max_tokens, temperature = 200, 0.7
+
+                # Get the number of available documents in ChromaDB
+                available_docs = collection.count()
+
+                # Embed the query once, for both retrieval and the answer cache
+                # (bypassing the persistent embedding cache, which is for document chunks)
+                with tracer.span("query.embed"):
+                    query_embedding = embedding_func.embed_query([query])[0]
+
+                if available_docs > 0:
+                    # Over-fetch candidates, then pack the best ones into the prompt's token budget
+                    n_results = min(RERANK_CANDIDATES if use_reranking else CONTEXT_CANDIDATES, available_docs)
+                    # Vector results are fused with BM25 keyword matches when hybrid retrieval is on
+                    with tracer.span("retrieve"):
+                        candidates = retrieve_chunks(
+                            retriever, query=query, nresults=n_results, query_embedding=query_embedding,
+                            sparse_index=sparse_index,
+                        )
+
+                    reranker = load_reranker() if use_reranking else None
+                    rerank_result = None
+                    if reranker is not None:
+                        with tracer.span("rerank", candidates=len(candidates)):
+                            rerank_result = reranker.rerank(query, candidates)
+                    if rerank_result is not None:
+                        candidates = rerank_result.chunks
+
+                    with tracer.span("pack_context"):
+                        tokenizer = load_tokenizer()
+                        budget = context_token_budget(query, max_tokens, tokenizer, reserved_tokens=PROMPT_TEMPLATE_TOKENS)
+                        packed = pack_context(candidates, budget, tokenizer)
+                    chunks, relevant_text = packed.chunks, packed.text
+                    logger.debug(f"Packed {len(chunks)}/{len(candidates)} chunks into {packed.token_count}/{budget} tokens")
+                else:
+                    chunks, rerank_result = [], None
+                    relevant_text = ""  # No documents available, so no additional context
+                    st.warning("No knowledge base available. Generating response based only on the prompt.")
+
+                logger.debug("\n\t-- Relevant text retrieved:")
+                logger.debug(relevant_text)
+
+                # Same retrieved chunks + same params + a near-identical question -> reuse the answer
+                cache_key = answer_cache.make_key(
+                    [chunk["id"] for chunk in chunks], max_tokens=max_tokens, temperature=temperature
+                )
+                with tracer.span("answer_cache.lookup"):
+                    cached_response = answer_cache.get(cache_key, query_embedding)
+
+                with col2:
+                    st.subheader("Response:")
+                    if cached_response is not None:
+                        st.write(cached_response)
+                        st.caption("Served from answer cache")
+                    else:
+                        # The worker wraps the question and context in the prompt template
+                        job_input = get_contextual_input(query, relevant_text)
+                        token_stream = stream_answer(job_input, max_tokens=max_tokens, temperature=temperature)
+                        with st.spinner("Generating response..."):
+                            # Render tokens as they arrive instead of waiting for the full answer
+                            response = st.write_stream(token_stream)
+                        answer_cache.put(cache_key, query_embedding, response)
+                        if token_stream.time_to_first_token is not None:
+                            st.caption(
+                                f"Time to first token: {token_stream.time_to_first_token:.2f}s · "
+                                f"total: {token_stream.total_time:.2f}s"
+                            )
+                    if rerank_result is not None:
+                        st.caption(
+                            f"Reranked {rerank_result.scored + rerank_result.cached} chunks in "
+                            f"{rerank_result.elapsed_s * 1000:.0f}ms"
+                            + (" (time budget exceeded)" if rerank_result.budget_exceeded else "")
+                        )
+            logger.debug(f"Answer cache: {answer_cache.stats()}")
         else:
             logger.debug("No query provided; skipping relevant text retrieval.")
             st.warning("Please enter a prompt.")
 
+    if show_debug_panel:
+        display_debug_panel(tracer, session_tenant_id())
+        display_memory_panel(memory_attribution(session_tenant_id()))
+
     if use_logging:
         display_logs(log_stream)
@@ -1,7 +1,16 @@
 import requests
 import os
+import time
+import logging
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from retrievers import Retriever, ChromaRetriever, reciprocal_rank_fusion
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
 
 # Load .env from project root
 load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")
@@ -13,64 +22,397 @@ HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
     "Content-Type": "application/json"
 }
+
+FINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
     
 
-def get_relevant_text(collection, query='', nresults=3, sim_th=None):
+def retrieve_chunks(retriever, query='', nresults=3, sim_th=None, query_embedding=None, sparse_index=None,
+                    min_sparse_score=None):
     """
-    Get relevant text from a collection for a given query
+    Retrieve the most relevant chunks for a given query.
+    `retriever` is a Retriever backend or a plain Chroma collection.
+    Returns a list of dicts with the chunk id, document, metadata and distance.
+    Pass `query_embedding` to reuse an embedding computed elsewhere.
+    With a `sparse_index`, BM25 results for the query text are fused with the
+    dense results by reciprocal rank fusion; chunks found only by BM25 have
+    no distance.
+    `sim_th` (cosine similarity) and `min_sparse_score` (BM25 score) filter the
+    final results: a chunk is kept if it reaches either of the thresholds that
+    are set. Chunks found only by BM25 have no similarity, so with `sim_th`
+    alone they are dropped.
     """
-    query_result = collection.query(query_texts=query, n_results=nresults)
-    docs = query_result.get('documents')[0]
-    if sim_th is not None:
-        similarities = [1 - d for d in query_result.get("distances")[0]]
-        relevant_docs = [d for d, s in zip(docs, similarities) if s >= sim_th]
-        return ''.join(relevant_docs)
-    return ''.join([doc for doc in docs if doc is not None])
+    if not isinstance(retriever, Retriever):
+        retriever = ChromaRetriever(retriever)
+    tracer = get_tracer()
+
+    with tracer.span("retrieve.dense"):
+        chunks = retriever.query(query_text=query, query_embedding=query_embedding, n_results=nresults)
+
+    if sparse_index is None or not query:
+        return _filter_relevant(chunks, sim_th, min_sparse_score, {})
+
+    with tracer.span("retrieve.sparse"):
+        sparse_scores = dict(sparse_index.query(query, n_results=nresults))
+    fused = reciprocal_rank_fusion([[chunk["id"] for chunk in chunks], list(sparse_scores)])[:nresults]
+
+    by_id = {chunk["id"]: chunk for chunk in chunks}
+    with tracer.span("retrieve.fetch_sparse_only"):
+        for chunk in retriever.get([chunk_id for chunk_id, _ in fused if chunk_id not in by_id]):
+            by_id[chunk["id"]] = chunk
+    fused_chunks = [by_id[chunk_id] for chunk_id, _ in fused if chunk_id in by_id]
+    return _filter_relevant(fused_chunks, sim_th, min_sparse_score, sparse_scores)
 
 
-def get_contextual_prompt(question, context):
+def _filter_relevant(chunks, sim_th, min_sparse_score, sparse_scores):
     """
-    Optimized prompt format for Mistral 7B 
+    Keep the chunks whose similarity reaches `sim_th` or whose BM25 score
+    reaches `min_sparse_score`; no thresholds keeps every chunk.
     """
-    # Option 1: Mistral Chat Template (Recommended)
-    contextual_prompt = f"""<s>[INST] You are a helpful assistant that answers questions based on the provided context. Use only the information given in the context to answer the question. If the context doesn't contain enough information, say so clearly.
+    if sim_th is None and min_sparse_score is None:
+        return chunks
 
-Context:
-{context}
+    def relevant(chunk):
+        similar = chunk["distance"] is not None and (sim_th is None or 1 - chunk["distance"] >= sim_th)
+        matched = min_sparse_score is not None and sparse_scores.get(chunk["id"], 0.0) >= min_sparse_score
+        return similar or matched
 
-Question: {question} [/INST]"""
-    
-    return contextual_prompt
+    return [chunk for chunk in chunks if relevant(chunk)]
 
 
-def generate_answer(prompt, max_tokens=150, temperature=0.7, HEADERS=HEADERS, ENDPOINT=ENDPOINT):
+def get_relevant_text(retriever, query='', nresults=3, sim_th=None, sparse_index=None, min_sparse_score=None):
     """
-    Submit a prompt to the RunPod SYNC endpoint and get back a response string.
+    Get relevant text from a retriever (or collection) for a given query
     """
-    payload = {
-        "input": {
-            "prompt": prompt,
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
-    }
-
-    try:
-        # Use /runsync instead of /run - immediate response!
-        response = requests.post(f"{ENDPOINT}/runsync", headers=HEADERS, json=payload, timeout=65)
-        response.raise_for_status()
-        result = response.json()
-        
-        print(f"[RunPod] Request completed successfully")
-        
-        if result.get("status") == "COMPLETED":
-            return result["output"]["response"]
+    chunks = retrieve_chunks(retriever, query=query, nresults=nresults, sim_th=sim_th, sparse_index=sparse_index,
+                             min_sparse_score=min_sparse_score)
+    return ''.join(chunk["document"] for chunk in chunks)
+
+
+# Upper bound on the tokens the worker's RAG template (model_dockerfile/prompting.py)
+# adds around the question and context; reserved when budgeting the context
+PROMPT_TEMPLATE_TOKENS = 96
+
+
+def get_contextual_input(question, context):
+    """
+    Job input for a question over retrieved context.
+    The worker owns the Mistral prompt template, so the shared instructions
+    are never duplicated here and their KV cache can be reused on the worker.
+    """
+    return {"question": question, "context": context}
+
+
+def _prompt_input(prompt):
+    """
+    Accept either a raw prompt string or job input fields (see `get_contextual_input`).
+    """
+    return dict(prompt) if isinstance(prompt, dict) else {"prompt": prompt}
+
+
+def record_worker_timings(output):
+    """
+    Add the per-stage timings reported by the worker to the tracer.
+    """
+    tracer = get_tracer()
+    for name, seconds in (output.get("timings") or {}).items():
+        tracer.record(f"worker.{name}", seconds)
+
+
+def collect_output(output):
+    """
+    Normalize a job output into a single response dict.
+    The worker is a generator handler, so aggregated outputs arrive as a list of
+    yielded items: either one full response dict or `{"token": ...}` pieces
+    followed by a stats dict.
+    """
+    if isinstance(output, dict):
+        items = [output]
+    else:
+        items = list(output or [])
+
+    collected = {}
+    tokens = []
+    for item in items:
+        if "error" in item:
+            raise RuntimeError(f"RunPod job failed: {item['error']}")
+        if "token" in item:
+            tokens.append(item["token"])
         else:
-            error_msg = result.get("error", "Unknown error")
-            raise RuntimeError(f"RunPod job failed: {error_msg}")
-            
-    except requests.exceptions.Timeout:
-        raise RuntimeError("Request timed out (>60s). Try reducing prompt length or max_tokens.")
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"RunPod API error: {e}")
+            collected.update(item)
+
+    if tokens:
+        collected["response"] = "".join(tokens).strip()
+    collected.setdefault("response", "")
+    return collected
+
+
+@dataclass
+class JobResult:
+    """
+    Outcome of a RunPod job.
+    `queue_time` and `execution_time` come from RunPod's own accounting
+    (delayTime / executionTime), `total_time` is the client wall-clock time.
+    """
+    job_id: str
+    status: str
+    output: dict = field(default_factory=dict)
+    queue_time: float = None
+    execution_time: float = None
+    total_time: float = None
+
+    @property
+    def response(self):
+        return self.output.get("response", "")
+
+
+class TokenStream:
+    """
+    Iterable over generated text pieces, suitable for `st.write_stream`.
+    Records the client-side time to first token and total time once iterated,
+    and keeps the worker's final stats dict in `stats`.
+    """
+
+    def __init__(self, outputs):
+        self._outputs = outputs
+        self.time_to_first_token = None
+        self.total_time = None
+        self.stats = {}
+
+    def __iter__(self):
+        start = time.perf_counter()
+        try:
+            for output in self._outputs:
+                if "error" in output:
+                    raise RuntimeError(f"RunPod job failed: {output['error']}")
+                token = output.get("token")
+                if token is None:
+                    self.stats.update(output)
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - start
+                yield token
+        finally:
+            # Stopping early (e.g. a Streamlit rerun) must cancel the job now, not when garbage-collected
+            if hasattr(self._outputs, "close"):
+                self._outputs.close()
+        self.total_time = time.perf_counter() - start
+
+        tracer = get_tracer()
+        tracer.record("generate.time_to_first_token", self.time_to_first_token)
+        tracer.record("generate.total", self.total_time)
+        record_worker_timings(self.stats)
+
+
+class _RunPodRetry(Retry):
+    """
+    Retry GETs on any transient gateway error, but POSTs only on 429/503, when
+    the gateway turned the request away. After a 502/504 or a read error, /run
+    may already have queued the job, and sending it again would run it twice.
+    Connection errors are retried for every method: the request was never sent.
+    """
+    POST_RETRY_STATUSES = frozenset({429, 503})
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST":
+            return bool(self.total) and status_code in self.POST_RETRY_STATUSES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class RunPodClient:
+    """
+    Client for a RunPod serverless endpoint.
+    Jobs are submitted asynchronously to /run and polled on /status with
+    exponential backoff, so cold starts only cost waiting time instead of
+    failing a single long /runsync request. Connections are pooled in one
+    requests.Session and transient HTTP errors are retried.
+    """
+
+    def __init__(self, endpoint=ENDPOINT, headers=HEADERS, pool_size=10, retries=3,
+                 poll_initial=0.25, poll_max=5.0, poll_factor=2.0, request_timeout=30):
+        self.endpoint = endpoint
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.request_timeout = request_timeout
+
+        retry = _RunPodRetry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(
+                method, f"{self.endpoint}{path}", timeout=self.request_timeout, **kwargs
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"RunPod API error: {e}")
+
+    def submit(self, job_input):
+        """
+        Submit a job to /run and return its id.
+        """
+        result = self._request("POST", "/run", json={"input": job_input})
+        return result["id"]
+
+    def status(self, job_id):
+        """
+        Get the raw /status payload of a job.
+        """
+        return self._request("GET", f"/status/{job_id}")
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+        """
+        return self._request("POST", f"/cancel/{job_id}")
+
+    def wait(self, job_id, timeout=300):
+        """
+        Poll /status with exponential backoff until the job reaches a final status.
+        The job is cancelled if it does not finish within `timeout` seconds.
+        """
+        start = time.perf_counter()
+        delay = self.poll_initial
+        while True:
+            result = self.status(job_id)
+            status = result.get("status")
+            if status in FINAL_STATUSES:
+                break
+            elapsed = time.perf_counter() - start
+            if elapsed > timeout:
+                self.cancel(job_id)
+                raise RuntimeError(f"RunPod job {job_id} timed out after {timeout}s and was cancelled.")
+            time.sleep(min(delay, max(timeout - elapsed, 0)))
+            delay = min(delay * self.poll_factor, self.poll_max)
+
+        if status != "COMPLETED":
+            raise RuntimeError(f"RunPod job failed: {result.get('error', status)}")
+
+        return JobResult(
+            job_id=job_id,
+            status=status,
+            output=collect_output(result.get("output")),
+            queue_time=_seconds(result.get("delayTime")),
+            execution_time=_seconds(result.get("executionTime")),
+            total_time=time.perf_counter() - start
+        )
+
+    def run(self, job_input, timeout=300):
+        """
+        Submit a job and wait for its result.
+        """
+        start = time.perf_counter()
+        job_result = self.wait(self.submit(job_input), timeout=timeout)
+        job_result.total_time = time.perf_counter() - start
+        return job_result
+
+    def generate(self, prompt, max_tokens=150, temperature=0.7, timeout=300):
+        """
+        Generate a response for a prompt (string or job input fields) and return the JobResult.
+        """
+        return self.run(
+            {**_prompt_input(prompt), "max_tokens": max_tokens, "temperature": temperature},
+            timeout=timeout
+        )
+
+    def stream_outputs(self, prompt, max_tokens=150, temperature=0.7, poll_interval=0.1, timeout=300):
+        """
+        Submit a streaming job to /run and yield each item the worker produces,
+        polling the /stream endpoint until the job reaches a final status.
+        The job is cancelled if the consumer stops early.
+        """
+        job_id = self.submit({
+            **_prompt_input(prompt),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        })
+
+        finished = False
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                result = self._request("GET", f"/stream/{job_id}")
 
+                for item in result.get("stream", []):
+                    yield item["output"]
+
+                status = result.get("status")
+                if status in FINAL_STATUSES:
+                    finished = True
+                    if status != "COMPLETED":
+                        raise RuntimeError(f"RunPod job failed: {result.get('error', status)}")
+                    return
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Streaming timed out (>{timeout}s).")
+                time.sleep(poll_interval)
+        finally:
+            if not finished:
+                try:
+                    self.cancel(job_id)
+                except RuntimeError:
+                    pass
+
+    def stream(self, prompt, max_tokens=150, temperature=0.7, timeout=300):
+        """
+        Stream a response from the /stream endpoint.
+        Returns a TokenStream exposing `time_to_first_token` after iteration.
+        """
+        return TokenStream(self.stream_outputs(prompt, max_tokens, temperature, timeout=timeout))
+
+    def close(self):
+        self.session.close()
+
+
+def _seconds(milliseconds):
+    return milliseconds / 1000 if milliseconds is not None else None
+
+
+_default_client = None
+
+
+def get_runpod_client():
+    """
+    Get the process-wide RunPod client, so connections are reused across reruns.
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = RunPodClient()
+    return _default_client
+
+
+def generate_answer(prompt, max_tokens=150, temperature=0.7, client=None):
+    """
+    Submit a prompt (string or job input fields) to the RunPod endpoint and get back a response string.
+    """
+    client = client or get_runpod_client()
+    tracer = get_tracer()
+    with tracer.span("generate.total"):
+        job_result = client.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+    tracer.record("runpod.queue", job_result.queue_time)
+    tracer.record("runpod.execution", job_result.execution_time)
+    record_worker_timings(job_result.output)
+
+    logger.info(f"RunPod request completed (queue: {job_result.queue_time}s, execution: {job_result.execution_time}s)")
+
+    return job_result.response
+
+
+def stream_answer(prompt, max_tokens=150, temperature=0.7, client=None):
+    """
+    Stream a response from the RunPod endpoint.
+    Returns a TokenStream exposing `time_to_first_token` after iteration.
+    """
+    client = client or get_runpod_client()
+    return client.stream(prompt, max_tokens=max_tokens, temperature=temperature)
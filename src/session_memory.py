@@ -0,0 +1,161 @@
+import os
+import resource
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+
+from text_processing import content_hash
+
+# Upper bound on what one session may hold: raw bytes of files waiting to be
+# indexed plus the estimated size of its indexed chunks
+SESSION_MAX_MB = int(os.getenv("SESSION_MAX_MB", "200"))
+
+# File states
+PENDING, INDEXING, INDEXED = "pending", "indexing", "indexed"
+
+
+class BudgetExceeded(ValueError):
+    pass
+
+
+@dataclass
+class FileRecord:
+    """
+    An uploaded file. `data` holds the raw bytes only until the file is indexed.
+    """
+    name: str
+    file_type: str
+    size: int
+    file_hash: str
+    data: bytes = None
+    status: str = PENDING
+    job_id: str = None
+    uploaded_at: float = field(default_factory=time.time)
+
+
+class SessionFiles:
+    """
+    A session's uploaded files, by name, within a byte budget.
+    - Raw bytes are kept only until the file is indexed (`mark_indexed`).
+    - `index_bytes` is the estimated size of the session's indexed chunks
+      (see TenantStore.refresh_usage), set after each ingestion.
+    - `add` raises BudgetExceeded when a file would take the session over `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=SESSION_MAX_MB * 1024**2):
+        self.max_bytes = max_bytes
+        self.files = {}
+        self.index_bytes = 0
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __iter__(self):
+        return iter(list(self.files.values()))
+
+    def get(self, name):
+        return self.files.get(name)
+
+    def names(self, status=None):
+        return [name for name, record in self.files.items() if status is None or record.status == status]
+
+    def raw_bytes(self):
+        return sum(len(record.data) for record in self.files.values() if record.data is not None)
+
+    def used_bytes(self):
+        return self.raw_bytes() + self.index_bytes
+
+    def add(self, name, file_type, data):
+        """
+        Record an upload. Returns the new record, or None if the same content
+        is already recorded under this name.
+        A new version of a file replaces the old one and is indexed again.
+        """
+        file_hash = content_hash(data)
+        existing = self.files.get(name)
+        if existing is not None and existing.file_hash == file_hash:
+            return None
+
+        # A pending old version is replaced; an indexed one stays counted until re-indexed
+        used = self.used_bytes() - (len(existing.data) if existing is not None and existing.data is not None else 0)
+        if used + len(data) > self.max_bytes:
+            raise BudgetExceeded(
+                f"'{name}' ({format_bytes(len(data))}) exceeds this session's memory budget: "
+                f"{format_bytes(used)} of {format_bytes(self.max_bytes)} already in use."
+            )
+
+        record = FileRecord(name=name, file_type=file_type, size=len(data), file_hash=file_hash, data=data)
+        self.files[name] = record
+        return record
+
+    def mark_indexing(self, name, job_id):
+        self.files[name].status = INDEXING
+        self.files[name].job_id = job_id
+
+    def mark_indexed(self, name):
+        record = self.files[name]
+        record.status = INDEXED
+        record.job_id = None
+        record.data = None
+
+    def remove(self, name):
+        return self.files.pop(name, None)
+
+    def clear(self):
+        self.files.clear()
+        self.index_bytes = 0
+
+
+# Every live session's files, for process-wide memory attribution
+_sessions = weakref.WeakValueDictionary()
+_sessions_lock = threading.Lock()
+
+
+def register_session(session_id, session_files):
+    with _sessions_lock:
+        _sessions[session_id] = session_files
+
+
+def session_memory_usage():
+    """
+    Bytes attributed to each live session: {session_id: (raw_bytes, index_bytes)}.
+    """
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {session_id: (files.raw_bytes(), files.index_bytes) for session_id, files in sessions.items()}
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def memory_attribution(current_session=None):
+    """
+    Split the process RSS into per-session usage and the shared remainder
+    (models, ChromaDB, the Python runtime). Per-session numbers are estimates.
+    """
+    rss = current_rss_bytes()
+    rows = []
+    for session_id, (raw, index) in sorted(session_memory_usage().items()):
+        label = session_id[:8] + (" (this session)" if session_id == current_session else "")
+        rows.append({"owner": label, "raw_bytes": raw, "index_bytes": index, "total_bytes": raw + index})
+    attributed = sum(row["total_bytes"] for row in rows)
+    rows.append({"owner": "shared", "raw_bytes": 0, "index_bytes": 0, "total_bytes": max(0, rss - attributed)})
+    return {"rss_bytes": rss, "sessions": rows}
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
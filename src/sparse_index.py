@@ -0,0 +1,154 @@
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+
+# Terms keep codes like "E-4012", "PN-88731" or "config.yaml" whole;
+# their components are indexed as well
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[-_./:]")
+
+# Postings store doc numbers as uint32 and term frequencies as uint16
+assert array("I").itemsize == 4 and array("H").itemsize == 2
+MAX_TF = 2**16 - 1
+
+# Rebuild postings once this fraction of documents has been deleted
+COMPACTION_THRESHOLD = 0.25
+
+
+def tokenize(text):
+    """
+    Lowercase terms for the sparse index.
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(part for part in COMPOUND_SEPARATORS.split(term) if part)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring, built incrementally as chunks
+    are ingested.
+    Each term's postings are two compact arrays (doc numbers, term
+    frequencies) that are scored with vectorized NumPy at query time.
+    Deleted chunks are tombstoned and purged by periodic compaction.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> (array("I") doc numbers, array("H") term frequencies)
+        self._doc_ids = []  # doc number -> chunk id
+        self._doc_numbers = {}  # chunk id -> doc number
+        self._doc_lengths = array("I")
+        self._alive = bytearray()
+        self._alive_count = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._alive_count
+
+    def add(self, chunk_ids, texts):
+        """
+        Index chunks; re-adding an existing chunk id replaces it.
+        """
+        with self._lock:
+            for chunk_id, text in zip(chunk_ids, texts):
+                if chunk_id in self._doc_numbers:
+                    self._remove(chunk_id)
+                doc_number = len(self._doc_ids)
+                terms = tokenize(text)
+                for term, tf in Counter(terms).items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(doc_number)
+                    postings[1].append(min(tf, MAX_TF))
+                self._doc_ids.append(chunk_id)
+                self._doc_numbers[chunk_id] = doc_number
+                self._doc_lengths.append(len(terms))
+                self._alive.append(1)
+                self._alive_count += 1
+                self._total_length += len(terms)
+
+    def delete(self, chunk_ids):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._doc_numbers:
+                    self._remove(chunk_id)
+            dead = len(self._doc_ids) - self._alive_count
+            if dead > COMPACTION_THRESHOLD * len(self._doc_ids):
+                self._compact()
+
+    def _remove(self, chunk_id):
+        doc_number = self._doc_numbers.pop(chunk_id)
+        self._alive[doc_number] = 0
+        self._alive_count -= 1
+        self._total_length -= self._doc_lengths[doc_number]
+
+    def _compact(self):
+        """
+        Drop tombstoned documents and renumber the remaining ones.
+        """
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(alive, dtype=np.int64) - 1
+
+        postings = {}
+        for term, (docs, tfs) in self._postings.items():
+            doc_numbers = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[doc_numbers]
+            if not keep.any():
+                continue
+            postings[term] = (
+                array("I", renumber[doc_numbers[keep]].astype(np.uint32).tobytes()),
+                array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+            )
+        self._postings = postings
+
+        self._doc_ids = [chunk_id for chunk_id, is_alive in zip(self._doc_ids, alive) if is_alive]
+        self._doc_numbers = {chunk_id: i for i, chunk_id in enumerate(self._doc_ids)}
+        self._doc_lengths = array("I", np.frombuffer(self._doc_lengths, dtype=np.uint32)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(self._doc_ids))
+
+    def query(self, text, n_results=10):
+        """
+        Return up to `n_results` (chunk id, BM25 score) pairs, best first.
+        """
+        with self._lock:
+            if not self._alive_count:
+                return []
+            n_docs = self._alive_count
+            avg_length = self._total_length / n_docs
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                live = alive[docs].astype(bool)
+                df = int(live.sum())
+                if not df:
+                    continue
+                docs, tfs = docs[live], tfs[live]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > n_results:
+                candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            return [(self._doc_ids[i], float(scores[i])) for i in candidates]
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from retrievers import InProcessIndex, build_retriever
+from sparse_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+class UsageCounter:
+    """
+    Running size of a collection's content, kept in step with its adds and
+    deletes so that it never has to be read back: document and metadata bytes
+    per chunk, plus one float32 vector per chunk.
+    """
+
+    def __init__(self):
+        self._sizes = {}
+        self._vector_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, ids, documents, metadatas=None, embeddings=None):
+        with self._lock:
+            if embeddings is not None and len(embeddings):
+                self._vector_bytes = len(embeddings[0]) * 4
+            for i, (chunk_id, document) in enumerate(zip(ids, documents)):
+                metadata = metadatas[i] if metadatas else None
+                self._sizes[chunk_id] = len(document.encode("utf-8")) + (len(str(metadata)) if metadata else 0)
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                self._sizes.pop(chunk_id, None)
+
+    @property
+    def count(self):
+        return len(self._sizes)
+
+    def text_bytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def vector_bytes(self):
+        return self.count * self._vector_bytes
+
+
+@dataclass
+class Tenant:
+    """
+    Per-tenant state: its own collection plus the retriever and sparse index
+    built over it. `usage_bytes` is an estimate, refreshed after ingestion from
+    the running totals in `usage`. `pending_jobs` counts queued or running
+    ingestion jobs; a tenant is never evicted while it has any.
+    """
+    tenant_id: str
+    collection: object
+    retriever: object
+    sparse_index: object = None
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.monotonic)
+    usage_bytes: int = 0
+    usage: UsageCounter = field(default_factory=UsageCounter)
+    pending_jobs: int = 0
+
+
+class TenantStore:
+    """
+    Multi-tenant vector store over one shared Chroma client and embedding function.
+    - Each tenant (browser session) gets its own collection, so documents are never shared.
+    - Tenants idle for more than `idle_ttl` seconds are evicted.
+    - Beyond `max_tenants` tenants or `max_bytes` of estimated usage, the least
+      recently used tenants are evicted (never the one being accessed).
+    Evicting a tenant deletes its collection; `get` then recreates it empty,
+    and the caller can detect this from `Tenant.created_at`.
+    """
+
+    def __init__(self, client, embedding_func, collection_prefix="tenant", retriever_backend="chroma",
+                 hybrid=True, max_tenants=64, max_bytes=2 * 1024**3, idle_ttl=3600):
+        self.client = client
+        self.embedding_func = embedding_func
+        self.collection_prefix = collection_prefix
+        self.retriever_backend = retriever_backend
+        self.hybrid = hybrid
+        self.max_tenants = max_tenants
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._tenants = OrderedDict()
+        self._lock = threading.RLock()
+
+    def collection_name(self, tenant_id):
+        return f"{self.collection_prefix}-{tenant_id}"
+
+    def get(self, tenant_id):
+        """
+        Get (or create) a tenant and mark it as recently used.
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                tenant = self._create(tenant_id)
+                self._tenants[tenant_id] = tenant
+            tenant.last_access = time.monotonic()
+            self._tenants.move_to_end(tenant_id)
+            self._evict(keep=tenant_id)
+            return tenant
+
+    def _create(self, tenant_id):
+        # A collection left over from an earlier store (e.g. after a cache clear) is discarded
+        name = self.collection_name(tenant_id)
+        try:
+            self.client.delete_collection(name)
+        except Exception:
+            pass
+        collection = self.client.create_collection(
+            name=name,
+            embedding_function=self.embedding_func,
+            metadata={"hnsw:space": "cosine"},
+        )
+        retriever = build_retriever(collection, self.embedding_func, backend=self.retriever_backend)
+        return Tenant(
+            tenant_id=tenant_id,
+            collection=collection,
+            retriever=retriever,
+            sparse_index=BM25Index() if self.hybrid else None,
+        )
+
+    def refresh_usage(self, tenant_id):
+        """
+        Re-estimate a tenant's memory after its collection changed, from the
+        running totals of `Tenant.usage`: documents, metadata and float32
+        vectors in Chroma, plus the copies held by an in-process retriever
+        and the sparse index.
+        Returns the estimate in bytes, then evicts other tenants if over budget.
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            return 0
+
+        text_bytes = tenant.usage.text_bytes()
+        vector_bytes = tenant.usage.vector_bytes()
+        usage = text_bytes + vector_bytes
+        if isinstance(tenant.retriever, InProcessIndex):
+            usage += text_bytes + vector_bytes
+        if tenant.sparse_index is not None:
+            # Postings are about one uint32 + uint16 per distinct term per chunk
+            usage += text_bytes
+
+        with self._lock:
+            tenant.usage_bytes = usage
+            self._evict(keep=tenant_id)
+        return usage
+
+    def hold(self, tenant_id):
+        """
+        Mark an ingestion job as pending for the tenant, protecting it from eviction until `release`.
+        """
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                tenant.pending_jobs += 1
+
+    def release(self, tenant_id):
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                tenant.pending_jobs = max(0, tenant.pending_jobs - 1)
+
+    def remove(self, tenant_id):
+        with self._lock:
+            tenant = self._tenants.pop(tenant_id, None)
+            if tenant is not None:
+                self._drop(tenant)
+
+    def _evict(self, keep):
+        # Tenants with pending ingestion jobs stay: the jobs would write into a dropped collection
+        now = time.monotonic()
+        for tenant_id, tenant in list(self._tenants.items()):
+            if tenant_id != keep and not tenant.pending_jobs and now - tenant.last_access > self.idle_ttl:
+                logger.info(f"Evicting idle tenant {tenant_id}")
+                self._drop(self._tenants.pop(tenant_id))
+
+        # Least recently used first
+        for tenant_id in list(self._tenants):
+            if len(self._tenants) <= self.max_tenants and self._total_bytes() <= self.max_bytes:
+                break
+            if tenant_id == keep or self._tenants[tenant_id].pending_jobs:
+                continue
+            logger.info(f"Evicting tenant {tenant_id} to stay within limits")
+            self._drop(self._tenants.pop(tenant_id))
+
+    def _drop(self, tenant):
+        try:
+            self.client.delete_collection(self.collection_name(tenant.tenant_id))
+        except Exception as e:
+            logger.warning(f"Could not delete collection of tenant {tenant.tenant_id}: {e}")
+
+    def _total_bytes(self):
+        return sum(tenant.usage_bytes for tenant in self._tenants.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "usage_bytes": self._total_bytes(),
+                "max_tenants": self.max_tenants,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,7 +1,38 @@
-import nltk
-from nltk.tokenize import sent_tokenize
-nltk.download('punkt_tab')
-nltk.download("punkt")  
+import functools
+import hashlib
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_punkt():
+    """
+    Make sure the NLTK sentence tokenizer data is available, once per process.
+    The Docker image bundles it at build time, so this only downloads in
+    environments where it is missing.
+    """
+    import nltk
+    for resource in ("punkt_tab", "punkt"):
+        try:
+            nltk.data.find(f"tokenizers/{resource}")
+        except LookupError:
+            nltk.download(resource, quiet=True)
+
+
+def sent_tokenize(text):
+    """
+    NLTK sentence tokenizer, imported and initialized on first use.
+    """
+    ensure_punkt()
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+    return nltk_sent_tokenize(text)
+
+
+def content_hash(data):
+    """
+    SHA-256 hex digest of file bytes or chunk text, used as a stable content identity.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
 
 
 def paragraphs_chunking(text, max_words=200, max_sentence_words=50):
@@ -46,47 +77,75 @@ def paragraphs_chunking(text, max_words=200, max_sentence_words=50):
     return chunks
 
 
-def lines_chunking(text, max_words=200):
+def iter_text_lines(pieces, separator="\n"):
     """
-    Splits text into structured chunks, preserving paragraph integrity and avoiding unnatural breaks.
-    - Uses paragraph-based splitting first.
-    - Splits long paragraphs into smaller chunks based on sentence boundaries.
+    Lazily yield the lines of `separator.join(pieces)`, without building the joined string.
     """
-    # Split text into lines
-    lines = text.splitlines()
+    pending = ""
+    for i, piece in enumerate(pieces):
+        buffer = pending + (separator if i else "") + piece
+        lines = buffer.splitlines(keepends=True)
+        # The last line may continue in the next piece, and so may a bare "\r"
+        # (it and a leading "\n" there are a single "\r\n" line break)
+        carry = lines and (lines[-1] == lines[-1].rstrip("\r\n") or lines[-1].endswith("\r"))
+        pending = lines.pop() if carry else ""
+        for line in lines:
+            yield line.rstrip("\r\n")
+    if pending:
+        yield pending.rstrip("\r\n")
+
+
+def _split_paragraph(para, max_words):
+    """
+    Yield sentence-based chunks of a paragraph longer than `max_words`.
+    """
+    sentences = sent_tokenize(para)
+    chunk, chunk_word_count = [], 0
+    for sentence in sentences:
+        sentence_word_count = len(sentence.split())
+        if chunk_word_count + sentence_word_count <= max_words:
+            chunk.append(sentence)
+            chunk_word_count += sentence_word_count
+        else:
+            yield " ".join(chunk)
+            chunk = [sentence]
+            chunk_word_count = sentence_word_count
+    if chunk:
+        yield " ".join(chunk)
 
-    # Group lines into paragraphs
-    paragraphs = []
+
+def iter_paragraphs(lines):
+    """
+    Group an iterable of lines into paragraphs separated by empty lines.
+    Lines are stripped and joined with single spaces.
+    """
     current_paragraph = []
     for line in lines:
-        if line.strip():  
+        if line.strip():
             current_paragraph.append(line.strip())
-        else:  # Empty line indicates end of paragraph
-            if current_paragraph:
-                paragraphs.append(" ".join(current_paragraph))
-                current_paragraph = []
-    if current_paragraph: 
-        paragraphs.append(" ".join(current_paragraph))
-
-    # Process paragraphs
-    chunks = []
-    for para in paragraphs:
-        words = para.split()
-        if len(words) <= max_words:
-            chunks.append(para)
+        elif current_paragraph:  # Empty line indicates end of paragraph
+            yield " ".join(current_paragraph)
+            current_paragraph = []
+    if current_paragraph:
+        yield " ".join(current_paragraph)
+
+
+def iter_lines_chunking(lines, max_words=200):
+    """
+    Generator version of `lines_chunking` over an iterable of lines.
+    Chunks are yielded as soon as their paragraph is complete.
+    """
+    for para in iter_paragraphs(lines):
+        if len(para.split()) <= max_words:
+            yield para
         else:
-            sentences = sent_tokenize(para)
-            chunk, chunk_word_count = [], 0
-            for sentence in sentences:
-                sentence_word_count = len(sentence.split())
-                if chunk_word_count + sentence_word_count <= max_words:
-                    chunk.append(sentence)
-                    chunk_word_count += sentence_word_count
-                else:
-                    chunks.append(" ".join(chunk))
-                    chunk = [sentence]
-                    chunk_word_count = sentence_word_count
-            if chunk:
-                chunks.append(" ".join(chunk))
+            yield from _split_paragraph(para, max_words)
 
-    return chunks
\ No newline at end of file
+
+def lines_chunking(text, max_words=200):
+    """
+    Splits text into structured chunks, preserving paragraph integrity and avoiding unnatural breaks.
+    - Uses paragraph-based splitting first.
+    - Splits long paragraphs into smaller chunks based on sentence boundaries.
+    """
+    return list(iter_lines_chunking(text.splitlines(), max_words=max_words))
@@ -0,0 +1,186 @@
+import bisect
+import functools
+import hashlib
+import logging
+import os
+import re
+
+from text_processing import iter_paragraphs
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer of the model served on RunPod; only tokenizer.json is downloaded
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "TheBloke/Mistral-7B-Instruct-v0.1-GPTQ")
+# A local copy of that tokenizer.json (bundled in the Docker image), used instead of the Hub when present
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH")
+
+# The worker truncates prompts to this many tokens (see handler.py)
+MAX_INPUT_TOKENS = 2048
+# Mistral-7B v0.1 sliding attention window
+MODEL_CONTEXT_TOKENS = 4096
+
+# Sentence ends: terminal punctuation (optionally closed by quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r"""[.!?]["')\]]*\s+""")
+
+
+class Chunk(str):
+    """
+    Chunk text that records `overlap`: how many of its leading characters
+    repeat the end of the previous chunk (0 when the chunker made no overlap),
+    and the `identity` of the tokenizer that cut it.
+    """
+    overlap = 0
+    tokenizer = None
+
+    def __new__(cls, text, overlap=0, tokenizer=None):
+        chunk = super().__new__(cls, text)
+        chunk.overlap = overlap
+        chunk.tokenizer = tokenizer
+        return chunk
+
+
+class FastTokenizer:
+    """
+    Wrapper around a Hugging Face `tokenizers.Tokenizer` (Rust, fast),
+    exposing token character offsets and counts.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        # Where it was loaded from does not matter, only its vocabulary and rules
+        self.identity = "hf:" + hashlib.sha256(tokenizer.to_str().encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_pretrained(cls, name):
+        from tokenizers import Tokenizer
+        if os.path.isfile(name):
+            return cls(Tokenizer.from_file(name))
+        return cls(Tokenizer.from_pretrained(name))
+
+    def offsets(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False).offsets
+
+    def count(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class ApproximateTokenizer:
+    """
+    Dependency-free stand-in when the real tokenizer cannot be loaded:
+    one token per word piece of at most 4 characters and per punctuation mark,
+    which over-counts slightly for English and keeps budgets on the safe side.
+    """
+
+    PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+    identity = "approximate"
+
+    def offsets(self, text):
+        return [match.span() for match in self.PATTERN.finditer(text)]
+
+    def count(self, text):
+        return sum(1 for _ in self.PATTERN.finditer(text))
+
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(name=None):
+    """
+    Load the fast tokenizer once per process, falling back to an
+    approximate tokenizer if it is unavailable (e.g. offline).
+    By default it is read from TOKENIZER_PATH when that file exists, and
+    fetched from the Hub as TOKENIZER_NAME otherwise.
+    """
+    if name is None:
+        name = TOKENIZER_PATH if TOKENIZER_PATH and os.path.isfile(TOKENIZER_PATH) else TOKENIZER_NAME
+    try:
+        return FastTokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {name} ({e}); using approximate token counts. "
+                       "Chunks cut with it are stored apart from those of the real tokenizer.")
+        return ApproximateTokenizer()
+
+
+def context_token_budget(prompt_without_context, max_tokens, tokenizer,
+                         max_input_tokens=MAX_INPUT_TOKENS, model_context_tokens=MODEL_CONTEXT_TOKENS,
+                         margin=16, reserved_tokens=0):
+    """
+    Number of context tokens that fit in the prompt without being truncated by
+    the worker. `prompt_without_context` is the full prompt with an empty context
+    (instructions + question), and `max_tokens` the generation length.
+    `reserved_tokens` accounts for template text added by the worker.
+    """
+    input_limit = min(max_input_tokens, model_context_tokens - max_tokens)
+    return max(0, input_limit - tokenizer.count(prompt_without_context) - reserved_tokens - margin)
+
+
+def truncate_to_tokens(text, budget, tokenizer):
+    """
+    Cut text to at most `budget` tokens, at a token boundary.
+    """
+    offsets = tokenizer.offsets(text)
+    if len(offsets) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    return text[:offsets[budget - 1][1]]
+
+
+def split_token_windows(text, offsets, max_tokens, overlap_tokens=0, tokenizer_identity=None):
+    """
+    Split one text into windows of at most `max_tokens` tokens given its token
+    offsets. Windows end at the last sentence boundary that fits when there is
+    one, and consecutive windows overlap by up to `overlap_tokens` tokens
+    (starting at a sentence boundary inside the overlap when possible).
+    Windows are yielded as Chunks whose `overlap` is the length of that repeated text,
+    tagged with `tokenizer_identity`.
+    Runs in O(n log n) over the tokens; the text is tokenized only once.
+    """
+    n = len(offsets)
+    if n == 0:
+        return
+    starts = [start for start, _ in offsets]
+    # Token index at which each sentence after the first begins
+    boundaries = sorted({bisect.bisect_left(starts, match.end()) for match in SENTENCE_END.finditer(text)})
+
+    start, previous_end = 0, 0
+    while start < n:
+        limit = start + max_tokens
+        if limit >= n:
+            end = n
+        else:
+            j = bisect.bisect_right(boundaries, limit) - 1
+            end = boundaries[j] if j >= 0 and boundaries[j] > start else limit
+        overlap = offsets[previous_end - 1][1] - offsets[start][0] if start < previous_end else 0
+        yield Chunk(text[offsets[start][0]:offsets[end - 1][1]], overlap=overlap, tokenizer=tokenizer_identity)
+        if end >= n:
+            return
+        previous_end = end
+
+        next_start = end - overlap_tokens
+        if overlap_tokens:
+            # Prefer to start the overlap at a sentence boundary
+            j = bisect.bisect_left(boundaries, next_start)
+            if j < len(boundaries) and boundaries[j] < end:
+                next_start = boundaries[j]
+        start = max(next_start, start + 1)
+
+
+def iter_token_chunking(lines, tokenizer, max_tokens=256, overlap_tokens=32):
+    """
+    Token-aware counterpart of `iter_lines_chunking`.
+    Paragraphs that fit in `max_tokens` real tokens are kept whole; longer ones
+    are split into sentence-aligned windows overlapping by `overlap_tokens`.
+    Each paragraph is tokenized exactly once; chunks are tagged with the tokenizer's identity.
+    """
+    for para in iter_paragraphs(lines):
+        offsets = tokenizer.offsets(para)
+        if len(offsets) <= max_tokens:
+            yield Chunk(para, tokenizer=tokenizer.identity)
+        else:
+            yield from split_token_windows(para, offsets, max_tokens, overlap_tokens, tokenizer.identity)
+
+
+def token_chunking(text, tokenizer, max_tokens=256, overlap_tokens=32):
+    """
+    Split text into chunks of at most `max_tokens` tokens, with overlap.
+    """
+    return list(iter_token_chunking(text.splitlines(), tokenizer, max_tokens, overlap_tokens))
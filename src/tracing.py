@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# Latency samples kept per stage; older ones are dropped
+MAX_SAMPLES = 1000
+
+
+class Tracer:
+    """
+    Collect per-stage latencies of the RAG pipeline.
+    - `span(name)` times a block; spans opened inside another span on the
+      same thread are recorded as "parent/child" only in the trace, while
+      the aggregated stats are keyed by the span's own name.
+    - `record(name, seconds)` adds a duration measured elsewhere (e.g. the worker's timings).
+    - `trace(name, session)` groups the spans of one request; the last
+      `max_traces` are kept, tagged with the session they belong to.
+    Shared by all sessions in the process: the stage stats are aggregated over
+    all of them, but a session should only be shown its own traces, whose
+    spans carry details such as filenames.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES, max_traces=20):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._traces = deque(maxlen=max_traces)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        stack = self._stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.record(name, time.perf_counter() - start, **attributes)
+
+    def record(self, name, seconds, **attributes):
+        if seconds is None:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+        current = getattr(self._local, "trace", None)
+        if current is not None:
+            current["spans"].append({"name": name, "seconds": seconds, "parent": "/".join(self._stack()) or None,
+                                     **attributes})
+
+    @contextmanager
+    def trace(self, name, session=None):
+        current = {"name": name, "session": session, "started_at": time.time(), "spans": []}
+        self._local.trace = current
+        start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            current["seconds"] = time.perf_counter() - start
+            self._local.trace = None
+            with self._lock:
+                self._traces.append(current)
+
+    def timed_iter(self, name, iterable):
+        """
+        Yield from `iterable`, recording the total time spent producing items
+        (e.g. lazy extraction and chunking) as one span once it is exhausted.
+        """
+        total = 0.0
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                total += time.perf_counter() - start
+                break
+            total += time.perf_counter() - start
+            yield item
+        self.record(name, total)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def summary(self):
+        """
+        Per-stage count, p50/p95/mean/max in milliseconds and total seconds.
+        """
+        with self._lock:
+            samples = {name: np.asarray(values, dtype=np.float64) for name, values in self._samples.items()}
+        return {
+            name: {
+                "count": int(len(values)),
+                "p50_ms": float(np.percentile(values, 50) * 1000),
+                "p95_ms": float(np.percentile(values, 95) * 1000),
+                "mean_ms": float(values.mean() * 1000),
+                "max_ms": float(values.max() * 1000),
+                "sum_s": float(values.sum()),
+            }
+            for name, values in sorted(samples.items())
+            if len(values)
+        }
+
+    def traces(self, session=None):
+        """
+        The kept traces, only those of `session` when given.
+        """
+        with self._lock:
+            traces = list(self._traces)
+        if session is None:
+            return traces
+        return [trace for trace in traces if trace["session"] == session]
+
+    def to_json(self, session=None):
+        return json.dumps({"stages": self.summary(), "traces": self.traces(session)}, indent=2)
+
+    def to_prometheus(self, metric="rag_stage_latency_seconds"):
+        """
+        Prometheus text exposition of the stage latencies as a summary metric.
+        """
+        lines = [
+            f"# HELP {metric} Latency of RAG pipeline stages (last {self.max_samples} samples per stage).",
+            f"# TYPE {metric} summary",
+        ]
+        for name, stats in self.summary().items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric}{{stage="{label}",quantile="0.5"}} {stats["p50_ms"] / 1000:.6f}')
+            lines.append(f'{metric}{{stage="{label}",quantile="0.95"}} {stats["p95_ms"] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {stats["sum_s"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._traces.clear()
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """
+    Get the process-wide tracer.
+    """
+    return _tracer
+
+
+def span(name, **attributes):
+    return _tracer.span(name, **attributes)
@@ -1,14 +1,17 @@
 import streamlit as st
 import os
+import copy
 import sqlite3
 import base64
+from session_memory import BudgetExceeded, SessionFiles, INDEXED, format_bytes
 
 
 DEFAULT_SESSION_STATE = {
-    # PDF Upload
-    'uploaded_files_name': [],
-    'collections_files_name': [],
-    'uploaded_files_raw': [],
+    # PDF Upload: filename -> FileRecord, within the session's byte budget
+    'session_files': SessionFiles(),
+    # Bumped to reset the uploader widget once its files are copied
+    'uploader_generation': 0,
+    'upload_messages': [],
 }
 
 
@@ -162,24 +165,65 @@ def initialise_session_state():
     """
     for key, default_val in DEFAULT_SESSION_STATE.items():
         if key not in st.session_state:
-            st.session_state[key] = default_val
+            # Copy so that sessions never share the same mutable default
+            st.session_state[key] = copy.deepcopy(default_val)
 
 
 def file_uploader():
+    """
+    Upload files into the session's file table.
+    Accepted uploads are copied into `session_files` and the widget is reset,
+    so Streamlit does not keep a second copy of the bytes for the whole session.
+    Files that would exceed the session's memory budget are rejected.
+    """
+    session_files = st.session_state.session_files
     uploaded_files = st.file_uploader(
         "",
         type=["txt", "pdf"], 
-        accept_multiple_files=True)  
+        accept_multiple_files=True,
+        key=f"file_uploader_{st.session_state.uploader_generation}")
     
     if uploaded_files:  # Check if list is not empty
+        messages = st.session_state.upload_messages
         for file in uploaded_files:  # Process each file
-            if file.name not in st.session_state.uploaded_files_name:
-                # Append to session state lists safely
-                st.session_state.uploaded_files_name.append(file.name)
-                st.session_state.uploaded_files_raw.append(file)
-                st.success(f"Added new file: {file.name}")
-   
-    else:
+            existing = file.name in session_files
+            try:
+                record = session_files.add(file.name, file.type, file.getvalue())
+            except BudgetExceeded as e:
+                messages.append(("error", f"Rejected {file.name}: {e}"))
+                continue
+            if record is None:
+                messages.append(("info", f"Unchanged file: {file.name}"))
+            elif existing:
+                # Same name re-uploaded: the collection re-syncs its chunks
+                messages.append(("success", f"Updated file: {file.name}"))
+            else:
+                messages.append(("success", f"Added new file: {file.name}"))
+        # Rerun with a fresh widget; the old one's files are released
+        st.session_state.uploader_generation += 1
+        st.rerun()
+
+    for level, message in st.session_state.upload_messages:
+        getattr(st, level)(message)
+    st.session_state.upload_messages = []
+
+    if not session_files.files:
         st.info("Please upload a PDF file to proceed.")
 
 
+def display_session_files(on_remove=None):
+    """
+    List the session's files with their status, and the session's memory use.
+    Indexed files can be removed with `on_remove(filename)`.
+    """
+    session_files = st.session_state.session_files
+    if not session_files.files:
+        return
+    for record in session_files:
+        col1, col2 = st.columns([.8, .2])
+        col1.caption(f"{record.name} · {format_bytes(record.size)} · {record.status}")
+        if on_remove is not None and record.status == INDEXED:
+            col2.button("Remove", key=f"remove_{record.name}", on_click=on_remove, args=(record.name,))
+    st.caption(
+        f"Session memory: {format_bytes(session_files.used_bytes())} of {format_bytes(session_files.max_bytes)}"
+    )
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Never wait on the Hugging Face Hub: without a network, loading the chunking
+# tokenizer falls back to approximate counts at once instead of after retries
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+# Tests import the app modules the same way run.py does (flat, from src/)
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for path in ("src", "model_dockerfile", "benchmarks"):
+    path = os.path.join(ROOT_DIR, path)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory):
+    """
+    A 2-layer Llama model and its tokenizer (see bench_worker_startup.make_tiny_model).
+    """
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from bench_worker_startup import make_tiny_model
+
+    path = str(tmp_path_factory.mktemp("tiny-llama"))
+    # Fixed random weights, so the generated tokens are the same on every run
+    torch.manual_seed(0)
+    make_tiny_model(path)
+    model = transformers.AutoModelForCausalLM.from_pretrained(path).eval()
+    tokenizer = transformers.AutoTokenizer.from_pretrained(path)
+    return model, tokenizer
@@ -0,0 +1,73 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from batching import BatchScheduler, GenerationRequest, PaddedRepetitionPenalty
+
+PROMPTS = [
+    "what is this document about ?",
+    "context : a short warm-up . question : what is this ?",
+    "you are a helpful assistant that answers questions based on the provided context",
+]
+
+
+def _requests(tokenizer, max_tokens):
+    # top_k=1 makes sampling greedy, so batched and unbatched runs are comparable
+    return [
+        GenerationRequest(input_ids=tokenizer(prompt).input_ids, max_tokens=n, temperature=1.0, top_p=1.0, top_k=1)
+        for prompt, n in zip(PROMPTS, max_tokens)
+    ]
+
+
+def test_padded_batch_matches_unbatched_generation(tiny_model):
+    model, tokenizer = tiny_model
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=len(PROMPTS))
+    requests = _requests(tokenizer, [6, 6, 6])
+
+    batched = scheduler.generate_batch(requests)
+    unbatched = [scheduler.generate_batch([request])[0] for request in requests]
+
+    assert [result["response"] for result in batched] == [result["response"] for result in unbatched]
+    assert [result["output_tokens"] for result in batched] == [result["output_tokens"] for result in unbatched]
+    assert all(result["batch_size"] == len(PROMPTS) for result in batched)
+
+
+def test_per_job_token_counts_under_left_padding(tiny_model):
+    model, tokenizer = tiny_model
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=len(PROMPTS))
+    requests = _requests(tokenizer, [2, 5, 8])
+
+    results = scheduler.generate_batch(requests)
+
+    # Prompts have different lengths: padding must not count as input
+    assert len({len(request.input_ids) for request in requests}) > 1
+    for request, result in zip(requests, results):
+        assert result["input_tokens"] == len(request.input_ids)
+        assert result["prefill_tokens"] == len(request.input_ids)
+        assert 1 <= result["output_tokens"] <= request.max_tokens
+
+
+def test_scheduler_thread_coalesces_submitted_jobs(tiny_model):
+    model, tokenizer = tiny_model
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=len(PROMPTS), batch_window_ms=500).start()
+    try:
+        futures = [scheduler.submit(request) for request in _requests(tokenizer, [4, 4, 4])]
+        results = [future.result(timeout=60) for future in futures]
+    finally:
+        scheduler.stop(timeout=10)
+
+    assert [result["batch_size"] for result in results] == [len(PROMPTS)] * len(PROMPTS)
+    assert all(result["queue_s"] >= 0 for result in results)
+
+
+
+def test_repetition_penalty_skips_padding():
+    eos, pad_mask = 2, torch.tensor([[False, False, True], [True, True, True]])
+    input_ids = torch.tensor([[eos, eos, 5, 6], [eos, 3, 5, 6]])
+    scores = torch.ones(2, 8)
+
+    penalized = PaddedRepetitionPenalty(2.0, pad_mask)(input_ids, scores)
+
+    assert penalized[0].tolist() == [1, 1, 1, 1, 1, 0.5, 0.5, 1]
+    assert penalized[1].tolist() == [1, 1, 0.5, 0.5, 1, 0.5, 0.5, 1]
@@ -0,0 +1,31 @@
+from context_packing import pack_context
+from token_chunking import ApproximateTokenizer, split_token_windows
+
+
+def _chunk(part, document, overlap=0):
+    return {"id": f"doc.txt#{part}", "document": document,
+            "metadata": {"source": "doc.txt", "part": part, "overlap": overlap}}
+
+
+def _packed_text(chunks):
+    return pack_context(chunks, 10_000, ApproximateTokenizer()).text.split("\n", 1)[1]
+
+
+def test_adjacent_chunks_without_overlap_are_joined_whole():
+    assert _packed_text([_chunk(0, "The result is a"), _chunk(1, "apple pie recipe follows.")]) == (
+        "The result is a apple pie recipe follows."
+    )
+    assert _packed_text([_chunk(0, "See Section 3"), _chunk(1, "3.1 Installation steps")]) == (
+        "See Section 3 3.1 Installation steps"
+    )
+
+
+def test_recorded_overlap_is_cut_exactly():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    tokenizer = ApproximateTokenizer()
+    windows = list(split_token_windows(text, tokenizer.offsets(text), max_tokens=8, overlap_tokens=4))
+    assert len(windows) > 1
+    assert any(window.overlap for window in windows[1:])
+
+    chunks = [_chunk(part, str(window), window.overlap) for part, window in enumerate(windows)]
+    assert _packed_text(chunks) == text
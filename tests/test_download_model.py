@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+import download_model
+from download_model import download_files, fetch_manifest, part_paths, plan_segments
+
+MODEL = "org/model"
+
+
+class FakeHub:
+    """
+    Local stand-in for the Hub API: a manifest per revision and file
+    downloads honouring Range requests.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.corrupt_once = set()
+        # name -> error statuses returned by the next requests of that file
+        self.errors = {}
+        self.requests = []
+
+    def set_file(self, revision, name, data):
+        self.files.setdefault(revision, {})[name] = data
+
+    def manifest(self, revision):
+        return {"siblings": [
+            {"rfilename": name, "lfs": {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}}
+            for name, data in self.files[revision].items()
+        ]}
+
+
+@pytest.fixture
+def hub():
+    fake = FakeHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path = unquote(self.path.split("?")[0])
+            fake.requests.append((path, self.headers.get("Range")))
+            if path.startswith(f"/api/models/{MODEL}/revision/"):
+                body = json.dumps(fake.manifest(path.rsplit("/", 1)[1])).encode()
+                self.send_response(200)
+            else:
+                revision, name = path[len(f"/{MODEL}/resolve/"):].split("/", 1)
+                if fake.errors.get(name):
+                    self.send_error(fake.errors[name].pop(0))
+                    return
+                data = fake.files[revision][name]
+                if name in fake.corrupt_once:
+                    fake.corrupt_once.discard(name)
+                    data = bytes(len(data))
+                start, end = 0, len(data)
+                if self.headers.get("Range"):
+                    first, last = self.headers["Range"][len("bytes="):].split("-")
+                    start, end = int(first), int(last) + 1 if last else len(data)
+                    self.send_response(206)
+                else:
+                    self.send_response(200)
+                body = data[start:end]
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.endpoint = f"http://127.0.0.1:{server.server_port}"
+    yield fake
+    server.shutdown()
+
+
+def _download(hub, revision, model_dir):
+    manifest = fetch_manifest(MODEL, revision, endpoint=hub.endpoint)
+    return download_files(MODEL, revision, str(model_dir), manifest, workers=4, endpoint=hub.endpoint,
+                          segment_bytes=1000)
+
+
+def test_segmented_download_is_verified_and_skipped_next_time(hub, tmp_path):
+    data = os.urandom(3500)
+    hub.set_file("main", "model.safetensors", data)
+
+    assert _download(hub, "main", tmp_path) == (["model.safetensors"], [])
+    assert (tmp_path / "model.safetensors").read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ["model.safetensors"]
+    assert _download(hub, "main", tmp_path) == ([], ["model.safetensors"])
+
+
+def test_parts_of_another_revision_are_not_resumed(hub, tmp_path):
+    old, new = os.urandom(3500), os.urandom(3500)
+    hub.set_file("main", "model.safetensors", old)
+    hub.set_file("fallback", "model.safetensors", new)
+
+    # An interrupted download of "main" leaves complete parts behind
+    entry = fetch_manifest(MODEL, "main", endpoint=hub.endpoint)[0]
+    segments = plan_segments(entry, 1000)
+    for (start, end), part_path in zip(segments, part_paths(str(tmp_path / "model.safetensors"), entry, len(segments))):
+        with open(part_path, "wb") as f:
+            f.write(old[start:end])
+
+    _download(hub, "fallback", tmp_path)
+    assert (tmp_path / "model.safetensors").read_bytes() == new
+    assert sorted(os.listdir(tmp_path)) == ["model.safetensors"]
+
+
+def test_checksum_mismatch_downloads_again(hub, tmp_path):
+    data = os.urandom(2500)
+    hub.set_file("main", "model.safetensors", data)
+    hub.corrupt_once.add("model.safetensors")
+
+    _download(hub, "main", tmp_path)
+    assert (tmp_path / "model.safetensors").read_bytes() == data
+
+
+def test_persistent_checksum_mismatch_fails(hub, tmp_path, monkeypatch):
+    hub.set_file("main", "model.safetensors", os.urandom(500))
+    monkeypatch.setattr(download_model, "verify_file", lambda path, entry: False)
+
+    with pytest.raises(download_model.DownloadError):
+        _download(hub, "main", tmp_path)
+    assert not (tmp_path / "model.safetensors").exists()
+
+
+def test_client_errors_are_not_retried(hub, tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(download_model.time, "sleep", sleeps.append)
+    hub.set_file("main", "model.safetensors", os.urandom(500))
+    hub.errors["model.safetensors"] = [404]
+
+    with pytest.raises(download_model.DownloadError):
+        _download(hub, "main", tmp_path)
+    assert sleeps == []
+    assert sum(path.endswith("/model.safetensors") for path, _ in hub.requests) == 1
+
+
+def test_server_errors_and_rate_limits_are_retried(hub, tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(download_model.time, "sleep", sleeps.append)
+    data = os.urandom(500)
+    hub.set_file("main", "model.safetensors", data)
+    hub.errors["model.safetensors"] = [503, 429]
+
+    _download(hub, "main", tmp_path)
+    assert (tmp_path / "model.safetensors").read_bytes() == data
+    assert len(sleeps) == 2
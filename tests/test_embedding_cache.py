@@ -0,0 +1,76 @@
+import sys
+
+import numpy as np
+
+import collections_setup
+import embedding_cache
+from embedding_cache import EmbeddingStore
+from text_processing import content_hash
+
+
+class FakeEmbedding(embedding_cache.EmbeddingFunction):
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.full(4, len(text), dtype=np.float32) for text in input]
+
+
+def test_warm_cli_keys_vectors_like_the_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(collections_setup, "EMBEDDING_BACKEND", "onnx-int8")
+    monkeypatch.setattr(collections_setup, "CHUNKING", "words")
+    monkeypatch.setattr(embedding_cache, "load_embedding_function", lambda model: FakeEmbedding())
+    document = tmp_path / "doc.txt"
+    document.write_text("A short document.\n\nWith two paragraphs.")
+    db = tmp_path / "cache.sqlite3"
+    monkeypatch.setattr(sys, "argv", ["embedding_cache.py", str(document), "--db", str(db)])
+
+    embedding_cache.main()
+
+    store = EmbeddingStore(str(db))
+    chunks = list(collections_setup.iter_file_chunks(document.read_bytes(), "text/plain"))
+    hashes = {content_hash(chunk) for chunk in chunks}
+    assert collections_setup.embedding_cache_key("all-MiniLM-L6-v2") == "all-MiniLM-L6-v2:onnx-int8"
+    assert set(store.get_many("all-MiniLM-L6-v2:onnx-int8", hashes)) == hashes
+    assert store.get_many("all-MiniLM-L6-v2", hashes) == {}
+    store.close()
+
+
+def _stored_bytes(store):
+    return store._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+
+def test_size_total_follows_inserts_replacements_and_evictions(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"), max_bytes=10 * 4 * 4)
+    store.put_many("m", {f"h{i}": np.zeros(4) for i in range(8)})
+    store.put_many("m", {"h0": np.zeros(8)})
+    assert store.size_bytes() == _stored_bytes(store) == 9 * 16
+
+    store.put_many("m", {f"g{i}": np.zeros(4) for i in range(4)})
+    assert store.size_bytes() == _stored_bytes(store) <= 10 * 16
+    store.close()
+
+    # Reopening counts nothing again; the total persists with the vectors
+    reopened = EmbeddingStore(str(tmp_path / "cache.sqlite3"))
+    assert reopened.size_bytes() == _stored_bytes(reopened)
+    reopened.close()
+
+
+def test_cache_hits_are_kept_at_the_next_eviction(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"), max_bytes=4 * 16)
+    store.put_many("m", {"old": np.zeros(4)})
+    store.put_many("m", {f"h{i}": np.zeros(4) for i in range(3)})
+
+    assert set(store.get_many("m", {"old"})) == {"old"}
+    store.put_many("m", {"new": np.zeros(4)})
+    assert set(store.get_many("m", {"old", "new"})) == {"old", "new"}
+    store.close()
+
+
+def test_queries_are_not_persisted(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite3"))
+    cached = embedding_cache.CachedEmbeddingFunction(FakeEmbedding(), store, "m")
+
+    cached.embed_query(["what is this about?"])
+    assert store.size_bytes() == 0
+    store.close()
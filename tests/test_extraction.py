@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import extraction
+from extraction import iter_pdf_pages
+
+
+def _pdf(pages):
+    document = fitz.open()
+    for i in range(pages):
+        document.new_page().insert_text((72, 72), f"page {i}")
+    return document.tobytes()
+
+
+class CountingPool(ThreadPoolExecutor):
+    """
+    Stands in for the process pool, counting the tasks submitted.
+    """
+    submitted = 0
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers)
+        initializer(*initargs)
+
+    def submit(self, fn, *args):
+        CountingPool.submitted += 1
+        return super().submit(fn, *args)
+
+
+def test_pooled_extraction_keeps_few_ranges_in_flight(monkeypatch):
+    monkeypatch.setattr(extraction, "MIN_PAGES_FOR_POOL", 0)
+    monkeypatch.setattr(extraction, "ProcessPoolExecutor", CountingPool)
+    CountingPool.submitted = 0
+
+    pages = iter_pdf_pages(_pdf(40), max_workers=2, pages_per_task=2)
+    assert next(pages).strip() == "page 0"
+    assert CountingPool.submitted == extraction.TASKS_PER_WORKER * 2
+
+    rest = list(pages)
+    assert [page.strip() for page in rest] == [f"page {i}" for i in range(1, 40)]
+    assert CountingPool.submitted == 20
+
+
+def test_small_pdfs_are_extracted_without_a_pool(monkeypatch):
+    monkeypatch.setattr(extraction, "ProcessPoolExecutor", None)
+
+    assert [page.strip() for page in iter_pdf_pages(_pdf(3), max_workers=4)] == ["page 0", "page 1", "page 2"]
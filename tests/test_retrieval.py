@@ -0,0 +1,54 @@
+from retrievers import Retriever
+from runpod_setup import retrieve_chunks
+
+
+class FakeRetriever(Retriever):
+    def __init__(self, distances):
+        self.distances = distances
+
+    def query(self, query_text=None, query_embedding=None, n_results=3):
+        ranked = sorted(self.distances.items(), key=lambda item: item[1])[:n_results]
+        return [self._chunk(chunk_id, distance) for chunk_id, distance in ranked]
+
+    def get(self, ids):
+        return [self._chunk(chunk_id, None) for chunk_id in ids]
+
+    @staticmethod
+    def _chunk(chunk_id, distance):
+        return {"id": chunk_id, "document": chunk_id, "metadata": {}, "distance": distance}
+
+
+class FakeSparseIndex:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def query(self, text, n_results=10):
+        return sorted(self.scores.items(), key=lambda item: -item[1])[:n_results]
+
+
+RETRIEVER = FakeRetriever({"close": 0.2, "far": 0.9})
+SPARSE = FakeSparseIndex({"keyword": 7.5, "noise": 0.3})
+
+
+def _ids(chunks):
+    return sorted(chunk["id"] for chunk in chunks)
+
+
+def test_similarity_threshold_applies_to_fused_results():
+    chunks = retrieve_chunks(RETRIEVER, query="q", nresults=4, sim_th=0.5, sparse_index=SPARSE)
+
+    # Unrelated BM25-only hits no longer slip past the threshold
+    assert _ids(chunks) == ["close"]
+
+
+def test_sparse_only_hits_need_the_minimum_bm25_score():
+    chunks = retrieve_chunks(RETRIEVER, query="q", nresults=4, sim_th=0.5, sparse_index=SPARSE, min_sparse_score=5.0)
+    assert _ids(chunks) == ["close", "keyword"]
+
+    chunks = retrieve_chunks(RETRIEVER, query="q", nresults=4, sparse_index=SPARSE, min_sparse_score=5.0)
+    assert _ids(chunks) == ["close", "far", "keyword"]
+
+
+def test_no_thresholds_keep_every_fused_result():
+    chunks = retrieve_chunks(RETRIEVER, query="q", nresults=4, sparse_index=SPARSE)
+    assert _ids(chunks) == ["close", "far", "keyword", "noise"]
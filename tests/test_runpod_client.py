@@ -0,0 +1,127 @@
+import dataclasses
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from mock_runpod import CANCELLED, PROFILES, start_server
+from runpod_setup import RunPodClient
+
+
+@pytest.fixture
+def mock_endpoint():
+    """
+    A mock RunPod endpoint (see benchmarks/mock_runpod.py) and a client for it.
+    Returns a function taking Profile overrides.
+    """
+    servers = []
+
+    def start(**overrides):
+        server, endpoint = start_server(dataclasses.replace(PROFILES["fast"], jitter=0.0, **overrides), seed=0)
+        servers.append((server, endpoint))
+        client = RunPodClient(endpoint=f"http://127.0.0.1:{server.server_port}", headers={},
+                              poll_initial=0.01, poll_max=0.05)
+        return client, endpoint
+
+    yield start
+    for server, endpoint in servers:
+        server.shutdown()
+        endpoint.shutdown()
+
+
+def _wait_for_status(endpoint, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(job.status == status for job in endpoint._jobs.values()):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_closing_a_stream_early_cancels_the_job(mock_endpoint):
+    client, endpoint = mock_endpoint(tokens_per_s=20.0)
+    tokens = iter(client.stream({"prompt": "hello there"}, max_tokens=100))
+    assert next(tokens) == "hello"
+    tokens.close()
+    assert _wait_for_status(endpoint, CANCELLED)
+
+
+def test_submit_and_poll_until_completed(mock_endpoint):
+    client, endpoint = mock_endpoint()
+    job_id = client.submit({"question": "What is E-4012?", "context": "Error E-4012 means the cache is full.",
+                            "max_tokens": 6})
+    assert endpoint.get(job_id) is not None
+
+    result = client.wait(job_id, timeout=10)
+    assert result.status == "COMPLETED"
+    assert result.response == "Error E-4012 means the cache is"
+    assert result.output["output_tokens"] == 6
+    assert result.queue_time is not None and result.execution_time is not None
+
+
+def test_wait_timeout_cancels_the_job(mock_endpoint):
+    client, endpoint = mock_endpoint(tokens_per_s=5.0)
+    job_id = client.submit({"prompt": "hello there", "max_tokens": 100})
+    with pytest.raises(RuntimeError, match="timed out"):
+        client.wait(job_id, timeout=0.2)
+    assert _wait_for_status(endpoint, CANCELLED)
+
+
+def test_error_yielded_by_the_worker_raises(mock_endpoint):
+    client, _ = mock_endpoint(error_rate=1.0)
+    with pytest.raises(RuntimeError, match="Injected failure"):
+        client.run({"prompt": "hello there", "max_tokens": 20}, timeout=10)
+
+
+def test_stream_yields_tokens_then_stats(mock_endpoint):
+    client, _ = mock_endpoint()
+    stream = client.stream({"prompt": "one two three"}, max_tokens=5)
+    assert "".join(stream) == "one two three one two"
+    assert stream.stats["output_tokens"] == 5
+    assert stream.time_to_first_token is not None
+
+
+@pytest.fixture
+def scripted_endpoint():
+    """
+    An endpoint answering POST /run with the given status codes in turn
+    (then 200), counting the requests.
+    """
+    state = {"statuses": [], "posts": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            state["posts"] += 1
+            code = state["statuses"].pop(0) if state["statuses"] else 200
+            body = json.dumps({"id": "job-1"} if code == 200 else {"error": "gateway"}).encode()
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["client"] = RunPodClient(endpoint=f"http://127.0.0.1:{server.server_port}", headers={})
+    yield state
+    server.shutdown()
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_submit_is_retried_when_the_gateway_rejects_it(scripted_endpoint, status):
+    scripted_endpoint["statuses"] = [status]
+    assert scripted_endpoint["client"].submit({"prompt": "hi"}) == "job-1"
+    assert scripted_endpoint["posts"] == 2
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_submit_is_not_retried_when_the_job_may_be_queued(scripted_endpoint, status):
+    scripted_endpoint["statuses"] = [status]
+    with pytest.raises(RuntimeError):
+        scripted_endpoint["client"].submit({"prompt": "hi"})
+    assert scripted_endpoint["posts"] == 1
@@ -0,0 +1,22 @@
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from startup import StartupProfiler
+
+
+def test_step_time_includes_pending_gpu_work(monkeypatch):
+    # Stand-in for asynchronous GPU work that only completes at synchronize()
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: True)
+    monkeypatch.setattr(torch.cuda, "synchronize", lambda: time.sleep(0.05))
+    monkeypatch.setattr(torch.cuda, "memory_allocated", lambda: 0)
+    monkeypatch.setattr(torch.cuda, "memory_reserved", lambda: 0)
+    profiler = StartupProfiler()
+
+    with profiler.step("load_weights"):
+        pass
+
+    assert profiler.steps[0]["seconds"] >= 0.05
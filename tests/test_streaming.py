@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from batching import GenerationRequest
+from streaming import stream_generate
+
+
+def _request(tokenizer, max_tokens):
+    return GenerationRequest(
+        input_ids=tokenizer("what is this document about ?").input_ids, max_tokens=max_tokens,
+        temperature=1.0, top_p=1.0, top_k=1,
+    )
+
+
+def _generation_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "stream-generate"]
+
+
+def test_closing_the_stream_stops_the_generation(tiny_model):
+    model, tokenizer = tiny_model
+    pieces = stream_generate(model, tokenizer, _request(tokenizer, 1000))
+
+    assert isinstance(next(pieces), str)
+    start = time.perf_counter()
+    pieces.close()
+
+    # The generation thread has ended well before it could reach max_tokens
+    assert not _generation_threads()
+    assert time.perf_counter() - start < 1.0
+
+
+def test_stop_event_ends_the_stream_early(tiny_model):
+    model, tokenizer = tiny_model
+    stop = threading.Event()
+    stop.set()
+
+    stats = list(stream_generate(model, tokenizer, _request(tokenizer, 50), stop_event=stop))[-1]
+    assert stats["output_tokens"] == 1
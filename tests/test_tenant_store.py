@@ -0,0 +1,49 @@
+import uuid
+
+import chromadb
+import pytest
+
+from bench_pipeline import HashingEmbedding
+from collections_setup import ingest_file
+from tenant_store import TenantStore
+
+TEXT = "\n\n".join(f"Paragraph {i} talks about topic {i} at some length." for i in range(40)).encode()
+
+
+@pytest.fixture
+def store():
+    return TenantStore(chromadb.EphemeralClient(), HashingEmbedding(), collection_prefix=f"test-{uuid.uuid4().hex[:8]}",
+                       max_tenants=1)
+
+
+def _collection_text_bytes(collection):
+    data = collection.get(include=["documents", "metadatas"])
+    return (sum(len(doc.encode("utf-8")) for doc in data["documents"])
+            + sum(len(str(metadata)) for metadata in data["metadatas"]))
+
+
+def test_usage_is_tracked_on_add_and_delete(store):
+    tenant = store.get("a")
+    ingest_file(tenant.collection, store.embedding_func, "a.txt", TEXT, "text/plain", usage=tenant.usage)
+    ingest_file(tenant.collection, store.embedding_func, "b.txt", TEXT + b"\n\nOne more.", "text/plain",
+                usage=tenant.usage)
+    assert tenant.usage.count == tenant.collection.count()
+    assert tenant.usage.text_bytes() == _collection_text_bytes(tenant.collection)
+
+    # A revised file drops its stale chunks
+    ingest_file(tenant.collection, store.embedding_func, "b.txt", b"Completely different.", "text/plain",
+                usage=tenant.usage)
+    assert tenant.usage.count == tenant.collection.count()
+    # Hybrid retrieval: the sparse index is counted at the size of the text
+    assert store.refresh_usage("a") == 2 * tenant.usage.text_bytes() + tenant.usage.vector_bytes()
+
+
+def test_tenant_with_pending_jobs_is_not_evicted(store):
+    store.get("a")
+    store.hold("a")
+    store.get("b")
+    assert store.stats()["tenants"] == 2
+
+    store.release("a")
+    store.get("b")
+    assert store.stats()["tenants"] == 1
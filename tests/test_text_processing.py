@@ -0,0 +1,15 @@
+import pytest
+
+from text_processing import iter_text_lines
+
+
+@pytest.mark.parametrize("pieces", [
+    ["a\r", "b"],
+    ["a\r", "\nb"],
+    ["a\r\n", "b\r"],
+    ["line one\nline", " two\r", "", "\r\nend"],
+    ["x\r\r", "y"],
+    ["\r", "\r", "z"],
+])
+def test_lines_match_splitlines_of_the_joined_text(pieces):
+    assert list(iter_text_lines(pieces)) == "\n".join(pieces).splitlines()
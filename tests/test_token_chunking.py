@@ -0,0 +1,43 @@
+import pytest
+
+import token_chunking
+from collections_setup import chunk_content_hash
+from text_processing import content_hash
+from token_chunking import ApproximateTokenizer, iter_token_chunking, load_tokenizer
+
+TEXT = "First paragraph, short.\n\n" + " ".join(f"Sentence number {i} is here." for i in range(80))
+
+
+def _word_level_tokenizer_file(path):
+    tokenizers = pytest.importorskip("tokenizers")
+    words = sorted(set(TEXT.replace(",", " ").replace(".", " ").split())) + ["[UNK]"]
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="[UNK]"))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    backend.save(str(path))
+    return str(path)
+
+
+def test_load_tokenizer_reads_the_configured_file(tmp_path, monkeypatch):
+    path = _word_level_tokenizer_file(tmp_path / "tokenizer.json")
+    monkeypatch.setattr(token_chunking, "TOKENIZER_PATH", path)
+    load_tokenizer.cache_clear()
+    try:
+        tokenizer = load_tokenizer()
+    finally:
+        load_tokenizer.cache_clear()
+    assert isinstance(tokenizer, token_chunking.FastTokenizer)
+    assert tokenizer.identity.startswith("hf:")
+
+
+def test_chunk_hash_depends_on_the_tokenizer(tmp_path):
+    fast = token_chunking.FastTokenizer.from_pretrained(_word_level_tokenizer_file(tmp_path / "tokenizer.json"))
+    approximate = ApproximateTokenizer()
+
+    fast_chunks = list(iter_token_chunking(TEXT.splitlines(), fast, max_tokens=64, overlap_tokens=8))
+    approximate_chunks = list(iter_token_chunking(TEXT.splitlines(), approximate, max_tokens=64, overlap_tokens=8))
+
+    # The short paragraph is cut identically, but its identity differs with the tokenizer
+    assert fast_chunks[0] == approximate_chunks[0]
+    assert chunk_content_hash(fast_chunks[0]) != chunk_content_hash(approximate_chunks[0])
+    # Plain strings (e.g. from the words chunker) keep their content hash
+    assert chunk_content_hash("plain text") == content_hash("plain text")
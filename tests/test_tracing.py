@@ -0,0 +1,18 @@
+import json
+
+from tracing import Tracer
+
+
+def test_sessions_only_see_their_own_traces():
+    tracer = Tracer()
+    with tracer.trace("ingest", session="a"):
+        with tracer.span("ingest.file", file="a-private.pdf"):
+            pass
+    with tracer.trace("question", session="b"):
+        with tracer.span("retrieve"):
+            pass
+
+    assert [trace["name"] for trace in tracer.traces("b")] == ["question"]
+    assert "a-private.pdf" not in tracer.to_json("b")
+    assert json.loads(tracer.to_json("b"))["stages"].keys() == {"ingest.file", "retrieve"}
+    assert len(tracer.traces()) == 2